@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+网页服务的准入控制与过载保护
+功能：/api/analyze 每个请求都会花配额、占线程。按客户端（IP）和登记过的调用方密钥（X-API-Key）做令牌桶限流，
+      全局并发闸门只允许有限个分析同时执行，多出的在短队列里等待，队列满或等待超时立即拒绝；
+      拒绝时返回 429（限流）/ 503（过载）并带 Retry-After。各类放行与拒绝都有计数，可通过接口查看
+"""
+
+import asyncio
+import functools
+import ipaddress
+import math
+import os
+import threading
+import time
+from collections import Counter, OrderedDict, deque
+from contextlib import asynccontextmanager, contextmanager
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+# 每个客户端：平均每秒请求数与突发上限
+DEFAULT_CLIENT_RATE = 1.0
+DEFAULT_CLIENT_BURST = 10
+# 每个调用方密钥（多个客户端共用一个密钥时合计）
+DEFAULT_KEY_RATE = 5.0
+DEFAULT_KEY_BURST = 30
+# 每个进程同时执行的分析数、排队上限与排队最长等待（秒）
+DEFAULT_MAX_ACTIVE = 8
+DEFAULT_MAX_QUEUE = 16
+DEFAULT_QUEUE_TIMEOUT = 2.0
+# 单个请求最多花费的配额单位
+DEFAULT_REQUEST_QUOTA_CAP = 2000
+# 最多跟踪的客户端/密钥数（超出时淘汰最久未出现的，被淘汰的重新从满桶开始）
+MAX_TRACKED = 10000
+
+
+class Rejected(Exception):
+    """准入被拒绝（status 为 429 或 503）"""
+
+    def __init__(self, status: int, reason: str, retry_after: float):
+        super().__init__(reason)
+        self.status = status
+        self.reason = reason
+        self.retry_after = max(1, math.ceil(retry_after))
+
+    def response(self):
+        """(响应体, 状态码, 响应头)，与 web_app.analyze_request 的返回形式一致"""
+        message = "请求过于频繁，请稍后再试" if self.status == 429 else "服务繁忙，请稍后再试"
+        return ({"error": message, "reason": self.reason, "retry_after": self.retry_after},
+                self.status, {"Retry-After": str(self.retry_after)})
+
+
+class TokenBucket:
+    """令牌桶：以 rate 个/秒补充，最多积攒 burst 个"""
+
+    def __init__(self, rate: float, burst: float, now: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = now
+
+    def wait_time(self, now: float, n: float = 1.0) -> float:
+        """还要等多少秒才够 n 个令牌（0 表示现在就够）"""
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        return 0.0 if self.tokens >= n else (n - self.tokens) / self.rate
+
+    def take(self, n: float = 1.0):
+        self.tokens -= n
+
+
+def _resolve(future: asyncio.Future):
+    if not future.done():
+        future.set_result(None)
+
+
+class AdmissionController:
+    """
+    限流 + 并发闸门（线程安全；同一个实例可同时用于线程和协程入口）
+
+    用法:
+        admission = AdmissionController(max_active=8, max_queue=16)
+        try:
+            with admission.admit(client_ip, api_key):
+                ...
+        except Rejected as e:
+            body, status, headers = e.response()
+    """
+
+    def __init__(self, client_rate: float = DEFAULT_CLIENT_RATE, client_burst: float = DEFAULT_CLIENT_BURST,
+                 key_rate: float = DEFAULT_KEY_RATE, key_burst: float = DEFAULT_KEY_BURST,
+                 max_active: int = DEFAULT_MAX_ACTIVE, max_queue: int = DEFAULT_MAX_QUEUE,
+                 queue_timeout: float = DEFAULT_QUEUE_TIMEOUT, max_tracked: int = MAX_TRACKED,
+                 trusted_proxies: Iterable[str] = (), forwarded_hops: int = 1,
+                 api_keys: Iterable[str] = (), clock: Callable[[], float] = time.monotonic):
+        """
+        Args:
+            client_rate / client_burst: 每个客户端的令牌桶（每秒请求数 / 突发上限），rate 为0不限
+            key_rate / key_burst: 每个调用方密钥的令牌桶，rate 为0不限
+            max_active: 同时执行的请求数，0 不限
+            max_queue: 排队上限（超出直接 503）
+            queue_timeout: 排队最长等待秒数（超时 503）
+            max_tracked: 最多跟踪的客户端/密钥数
+            trusted_proxies: 受信任的反向代理地址（IP 或网段）；只有来自它们的请求才读 X-Forwarded-For
+            forwarded_hops: 受信任代理的层数，客户端地址取 X-Forwarded-For 从右数第 N 个
+            api_keys: 登记的调用方密钥；不在其中的密钥忽略（按匿名客户端限流），为空则不按密钥限流
+            clock: 单调时钟（测试注入）
+        """
+        self.client_rate = client_rate
+        self.client_burst = client_burst
+        self.key_rate = key_rate
+        self.key_burst = key_burst
+        self.max_active = max_active
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.max_tracked = max_tracked
+        self.trusted_proxies = [ipaddress.ip_network(p.strip(), strict=False) for p in trusted_proxies if p.strip()]
+        self.forwarded_hops = max(1, forwarded_hops)
+        self.api_keys = frozenset(api_keys)
+        self.clock = clock
+        self.counters: Counter = Counter()
+        self._buckets: Dict[str, 'OrderedDict[str, TokenBucket]'] = {'client': OrderedDict(), 'key': OrderedDict()}
+        self._active = 0
+        self._waiters: deque = deque()
+        self._lock = threading.Lock()
+
+    def _bucket(self, kind: str, name: str, rate: float, burst: float, now: float) -> TokenBucket:
+        buckets = self._buckets[kind]
+        bucket = buckets.get(name)
+        if bucket is None:
+            bucket = buckets[name] = TokenBucket(rate, burst, now)
+            if len(buckets) > self.max_tracked:
+                buckets.popitem(last=False)
+        else:
+            buckets.move_to_end(name)
+        return bucket
+
+    def _trusted(self, addr: Optional[str]) -> bool:
+        try:
+            ip = ipaddress.ip_address(addr or '')
+        except ValueError:
+            return False
+        return any(ip in network for network in self.trusted_proxies)
+
+    def identify(self, headers, remote_addr: Optional[str], args=None) -> Tuple[str, Optional[str]]:
+        """
+        (客户端标识, 调用方密钥)
+
+        客户端默认是连接的对端地址；只有对端是受信任代理时，才取 X-Forwarded-For 从右数第 forwarded_hops 个
+        （更左边的条目由客户端自己填写，可以伪造）。密钥取 X-API-Key 请求头或 api_key 参数，
+        未登记的密钥不算数，避免随意换密钥拿到新的令牌桶或耗尽别人的桶
+        """
+        client = remote_addr or 'unknown'
+        forwarded = headers.get('X-Forwarded-For', '')
+        if forwarded and self._trusted(remote_addr):
+            hops = [hop.strip() for hop in forwarded.split(',') if hop.strip()]
+            if hops:
+                client = hops[max(0, len(hops) - self.forwarded_hops)]
+        api_key = headers.get('X-API-Key') or (args.get('api_key') if args is not None else None)
+        return client, (api_key if api_key in self.api_keys else None)
+
+    def check_rate(self, client: str, api_key: Optional[str] = None):
+        """客户端与密钥的令牌桶都有余量时各扣一个令牌，否则抛出 429（不扣任何令牌）"""
+        with self._lock:
+            now = self.clock()
+            limits = []
+            if self.client_rate > 0:
+                limits.append(('client', self._bucket('client', client, self.client_rate, self.client_burst, now)))
+            if api_key and self.key_rate > 0:
+                limits.append(('key', self._bucket('key', api_key, self.key_rate, self.key_burst, now)))
+            for kind, bucket in limits:
+                wait = bucket.wait_time(now)
+                if wait > 0:
+                    self.counters[f'rejected_{kind}_rate'] += 1
+                    raise Rejected(429, f'{kind}_rate_limited', wait)
+            for _, bucket in limits:
+                bucket.take()
+
+    def _try_enter(self, grant: Callable[[], None]) -> bool:
+        """有空位直接占用返回 True；否则排队返回 False；队列已满抛出 503（调用方持有锁）"""
+        if not self.max_active or (self._active < self.max_active and not self._waiters):
+            self._active += 1
+            self.counters['admitted'] += 1
+            self.counters['peak_active'] = max(self.counters['peak_active'], self._active)
+            return True
+        if len(self._waiters) >= self.max_queue:
+            self.counters['rejected_queue_full'] += 1
+            raise Rejected(503, 'queue_full', self.queue_timeout)
+        self._waiters.append(grant)
+        self.counters['queued'] += 1
+        self.counters['peak_queue'] = max(self.counters['peak_queue'], len(self._waiters))
+        return False
+
+    def _leave_queue(self, grant: Callable[[], None]) -> bool:
+        """放弃排队：仍在队列里则移除并返回 True；已被唤醒（名额已转给自己）返回 False"""
+        with self._lock:
+            if grant in self._waiters:
+                self._waiters.remove(grant)
+                return True
+            return False
+
+    def release(self):
+        """释放一个名额：有人排队时直接转给队首，否则空出"""
+        with self._lock:
+            if not self._waiters:
+                self._active -= 1
+                return
+            grant = self._waiters.popleft()
+            self.counters['admitted'] += 1
+        grant()
+
+    def _timed_out(self):
+        with self._lock:
+            self.counters['rejected_queue_timeout'] += 1
+        return Rejected(503, 'queue_timeout', self.queue_timeout)
+
+    @contextmanager
+    def slot(self):
+        """占用一个执行名额（线程入口，排队时阻塞当前线程）"""
+        event = threading.Event()
+        grant = event.set
+        with self._lock:
+            entered = self._try_enter(grant)
+        if not entered and not event.wait(self.queue_timeout) and self._leave_queue(grant):
+            raise self._timed_out()
+        try:
+            yield
+        finally:
+            self.release()
+
+    @asynccontextmanager
+    async def slot_async(self):
+        """占用一个执行名额（协程入口，排队时只挂起当前协程）"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        grant = functools.partial(loop.call_soon_threadsafe, _resolve, future)
+        with self._lock:
+            entered = self._try_enter(grant)
+        if not entered:
+            try:
+                await asyncio.wait_for(asyncio.shield(future), self.queue_timeout)
+            except asyncio.TimeoutError:
+                if self._leave_queue(grant):
+                    raise self._timed_out()
+            except asyncio.CancelledError:
+                # 客户端断开：还在排队就离开队列，已拿到名额就还回去
+                if not self._leave_queue(grant):
+                    self.release()
+                raise
+        try:
+            yield
+        finally:
+            self.release()
+
+    @contextmanager
+    def admit(self, client: str, api_key: Optional[str] = None):
+        """限流检查 + 占用执行名额"""
+        self.check_rate(client, api_key)
+        with self.slot():
+            yield
+
+    def stats(self) -> Dict:
+        """当前执行/排队数与各类放行、拒绝计数"""
+        with self._lock:
+            counters = dict(self.counters)
+            active, waiting = self._active, len(self._waiters)
+            tracked = {kind: len(buckets) for kind, buckets in self._buckets.items()}
+        rejected = {name: counters.get(name, 0) for name in
+                    ('rejected_client_rate', 'rejected_key_rate', 'rejected_queue_full', 'rejected_queue_timeout')}
+        return {
+            'active': active,
+            'waiting': waiting,
+            'max_active': self.max_active,
+            'max_queue': self.max_queue,
+            'admitted': counters.get('admitted', 0),
+            'queued': counters.get('queued', 0),
+            **rejected,
+            'rejected': sum(rejected.values()),
+            'peak_active': counters.get('peak_active', 0),
+            'peak_queue': counters.get('peak_queue', 0),
+            'tracked_clients': tracked['client'],
+            'tracked_keys': tracked['key'],
+        }
+
+
+def admission_from_config(config: Dict) -> AdmissionController:
+    """
+    按 config.json 构建准入控制：rate_limit_per_client / rate_limit_burst、
+    rate_limit_per_key / rate_limit_key_burst、max_concurrent_analyses、analyze_queue_size、analyze_queue_timeout、
+    trusted_proxies（也可用环境变量 TRUSTED_PROXIES，逗号分隔）/ forwarded_hops、client_api_keys
+    """
+    trusted = os.getenv('TRUSTED_PROXIES')
+    return AdmissionController(
+        client_rate=config.get('rate_limit_per_client', DEFAULT_CLIENT_RATE),
+        client_burst=config.get('rate_limit_burst', DEFAULT_CLIENT_BURST),
+        key_rate=config.get('rate_limit_per_key', DEFAULT_KEY_RATE),
+        key_burst=config.get('rate_limit_key_burst', DEFAULT_KEY_BURST),
+        max_active=config.get('max_concurrent_analyses', DEFAULT_MAX_ACTIVE),
+        max_queue=config.get('analyze_queue_size', DEFAULT_MAX_QUEUE),
+        queue_timeout=config.get('analyze_queue_timeout', DEFAULT_QUEUE_TIMEOUT),
+        trusted_proxies=trusted.split(',') if trusted else config.get('trusted_proxies', []),
+        forwarded_hops=config.get('forwarded_hops', 1),
+        api_keys=config.get('client_api_keys', []),
+    )
+
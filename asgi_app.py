@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""网页版的 ASGI 入口 (Starlette)
+与 web_app 相同的 /、/api/analyze、/api/suggestions、/health 接口，共用同一套密钥池、缓存与连接池传输；
+事件循环承载大量慢连接，分析在有界线程池里执行，执行期间到达的相同查询合并成一次分析
+运行: uvicorn asgi_app:app --workers 2
+访问: http://localhost:8000
+"""
+import os
+from contextlib import asynccontextmanager
+from typing import Mapping, Optional, Tuple
+
+try:
+    from starlette.applications import Starlette
+    from starlette.requests import Request
+    from starlette.responses import HTMLResponse, Response
+    from starlette.routing import Route
+except ImportError:  # Starlette 是可选依赖，只有 ASGI 部署才需要
+    Starlette = None
+
+import web_app
+from admission import Rejected
+from async_analyzer import DEFAULT_MAX_WORKERS, AsyncAnalyzeRunner
+
+RUNNER = AsyncAnalyzeRunner(max_workers=web_app.CONFIG.get("asgi_max_workers", DEFAULT_MAX_WORKERS))
+
+INDEX_HTML = web_app.render_index()
+
+
+def _json(body, status: int = 200, headers: Optional[Mapping[str, str]] = None) -> "Response":
+    # 用 Flask 应用的 JSON 序列化，日期等字段的格式与 Flask 入口一致
+    return Response(web_app.app.json.dumps(body), status_code=status, headers=dict(headers or {}),
+                    media_type="application/json")
+
+
+def coalesce_key(args: Mapping[str, str]) -> Optional[Tuple]:
+    """合并键：完全相同的查询参数（调用方密钥除外）；带 profile 的请求各自剖析，不合并"""
+    if args.get("profile"):
+        return None
+    return tuple(sorted((k, v) for k, v in args.items() if k != "api_key"))
+
+
+async def index(request: "Request"):
+    return HTMLResponse(INDEX_HTML)
+
+
+async def api_analyze(request: "Request"):
+    args = dict(request.query_params)
+    client, api_key = web_app.ADMISSION.identify(request.headers, request.client.host if request.client else None,
+                                                 args)
+    key = coalesce_key(args)
+    try:
+        web_app.ADMISSION.check_rate(client, api_key)
+        if RUNNER.running(key):
+            # 合并到执行中的相同查询，不再占用执行名额
+            body, status, headers = await RUNNER.run(key, web_app.analyze_request, args, api_key)
+        else:
+            async with web_app.ADMISSION.slot_async():
+                body, status, headers = await RUNNER.run(key, web_app.analyze_request, args, api_key)
+    except Rejected as e:
+        body, status, headers = e.response()
+    return _json(body, status, headers)
+
+
+async def api_suggestions(request: "Request"):
+    """返回关键词建议列表"""
+    return _json({"suggestions": web_app.SUGGESTIONS})
+
+
+async def api_admission_stats(request: "Request"):
+    """准入控制的执行/排队数与限流、过载拒绝计数"""
+    return _json(web_app.ADMISSION.stats())
+
+
+async def api_async_stats(request: "Request"):
+    """分析线程池的执行中 / 排队 / 合并请求数"""
+    return _json(RUNNER.stats())
+
+
+async def health(request: "Request"):
+    return _json({"status": "ok"})
+
+
+@asynccontextmanager
+async def lifespan(app):
+    yield
+    RUNNER.close()
+
+
+def create_app() -> "Starlette":
+    if Starlette is None:
+        raise RuntimeError("ASGI 入口需要 Starlette：pip install starlette uvicorn")
+    return Starlette(routes=[
+        Route("/", index),
+        Route("/api/analyze", api_analyze, methods=["GET"]),
+        Route("/api/suggestions", api_suggestions, methods=["GET"]),
+        Route("/api/admission/stats", api_admission_stats, methods=["GET"]),
+        Route("/api/async/stats", api_async_stats, methods=["GET"]),
+        Route("/health", health),
+    ], lifespan=lifespan)
+
+
+app = create_app() if Starlette is not None else None
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    uvicorn.run("asgi_app:app", host="0.0.0.0", port=int(os.getenv("PORT", 8000)))
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+分析的异步执行路径
+功能：ASGI 入口的事件循环只负责收发连接，阻塞的分析（API调用、评分、缓存读写）放进有界线程池执行；
+      等待中的请求只占一个协程，不占线程。完全相同的查询在执行期间到达时合并成一次分析（single-flight），
+      所有等待者拿到同一份结果。统计执行中/排队/合并的请求数
+"""
+
+import asyncio
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Hashable, Optional
+
+# 每个进程同时执行的分析数（分析大部分时间在等API响应，线程数可以远大于CPU核数）
+DEFAULT_MAX_WORKERS = 32
+
+
+class AsyncAnalyzeRunner:
+    """
+    把阻塞的分析函数变成可 await 的调用（同一事件循环内使用）
+
+    用法:
+        runner = AsyncAnalyzeRunner(max_workers=32)
+        body = await runner.run(('life hacks', 30), analyze_request, args)
+    """
+
+    def __init__(self, max_workers: int = DEFAULT_MAX_WORKERS):
+        """
+        Args:
+            max_workers: 线程池大小，超出的请求在事件循环里排队等待
+        """
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='analyze')
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self.counters: Counter = Counter()
+        self._active = 0
+        self._lock = threading.Lock()
+
+    def _call(self, fn: Callable, args: tuple) -> Any:
+        with self._lock:
+            self._active += 1
+            self.counters['peak_active'] = max(self.counters['peak_active'], self._active)
+        try:
+            return fn(*args)
+        finally:
+            with self._lock:
+                self._active -= 1
+
+    def _finished(self, key: Optional[Hashable], future: asyncio.Future):
+        if key is not None and self._inflight.get(key) is future:
+            del self._inflight[key]
+        # 发起者被取消时异常没人取，这里取一次，避免事件循环报"异常未被获取"
+        failed = future.cancelled() or future.exception() is not None
+        with self._lock:
+            self.counters['failed' if failed else 'completed'] += 1
+
+    async def run(self, key: Optional[Hashable], fn: Callable, *args) -> Any:
+        """
+        在线程池里执行 fn(*args) 并等待结果
+
+        Args:
+            key: 合并键，执行期间相同键的调用共享同一次执行；None 表示不合并
+        """
+        future = self._inflight.get(key) if key is not None else None
+        coalesced = future is not None
+        if not coalesced:
+            future = asyncio.get_running_loop().run_in_executor(self._executor, self._call, fn, args)
+            if key is not None:
+                self._inflight[key] = future
+            future.add_done_callback(lambda f: self._finished(key, f))
+        with self._lock:
+            self.counters['coalesced' if coalesced else 'submitted'] += 1
+        # 客户端断开只取消自己的等待，共享的执行继续（其他等待者还要结果，线程也无法中断）
+        return await asyncio.shield(future)
+
+    def running(self, key: Optional[Hashable]) -> bool:
+        """相同键的分析是否正在执行（此时 run 会直接合并上去）"""
+        return key is not None and key in self._inflight
+
+    def stats(self) -> Dict:
+        """执行中 / 排队 / 合并 / 完成的请求数"""
+        with self._lock:
+            counters = dict(self.counters)
+            active = self._active
+        finished = counters.get('completed', 0) + counters.get('failed', 0)
+        return {
+            'max_workers': self.max_workers,
+            'active': active,
+            'queued': max(0, counters.get('submitted', 0) - finished - active),
+            'inflight_keys': len(self._inflight),
+            'submitted': counters.get('submitted', 0),
+            'coalesced': counters.get('coalesced', 0),
+            'completed': counters.get('completed', 0),
+            'failed': counters.get('failed', 0),
+            'peak_active': counters.get('peak_active', 0),
+        }
+
+    def close(self):
+        """关闭线程池（不等待执行中的分析）"""
+        self._executor.shutdown(wait=False)
@@ -4,7 +4,9 @@
 YouTube分析工具 - 批量关键词分析示例
 """
 
+from batch_workbook import BatchWorkbook
 from youtube_analyzer import YouTubeAnalyzer
+from datetime import datetime
 import os
 
 def batch_analyze_keywords():
@@ -45,6 +47,9 @@ def batch_analyze_keywords():
     print(f"{'='*60}\n")
     
     all_results = {}
+    # 所有关键词写进同一个工作簿：每个关键词一个工作表 + 汇总表
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    workbook = BatchWorkbook(f"output/batch_analysis_{timestamp}.xlsx")
     
     for i, keyword in enumerate(keywords, 1):
         print(f"\n[{i}/{len(keywords)}] 正在分析: {keyword}")
@@ -58,10 +63,11 @@ def batch_analyze_keywords():
                 max_results=30,  # 每个关键词分析30个视频
                 min_views=500000,  # 降低到50万，找更多候选
                 min_engagement=2.5,
-                export=True
+                export=False
             )
             
             all_results[keyword] = results
+            workbook.add(keyword, results)
             
             # 显示该关键词的Top 3
             if results:
@@ -86,7 +92,7 @@ def batch_analyze_keywords():
     
     total_videos = sum(len(v) for v in all_results.values())
     print(f"\n✅ 总计发现 {total_videos} 个可搬运的优质视频!")
-    print(f"💾 所有数据已保存到 output/ 目录\n")
+    print(f"💾 所有数据已保存到: {workbook.close()}\n")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+批量分析的合并工作簿
+功能：一个批次的所有关键词写进同一个 Excel：每个关键词一个工作表，外加一个跨关键词汇总表。
+      使用 openpyxl 只写模式，视频行逐行写进临时文件，内存只保留汇总所需的少量数值，
+      汇总表在关闭时用一次 groupby 算出
+"""
+
+import os
+import re
+import threading
+from typing import Dict, List
+
+import pandas as pd
+from openpyxl import Workbook
+
+from youtube_analyzer import EXPORT_COLUMN_WIDTHS, export_columns
+
+SUMMARY_SHEET = '汇总'
+# Excel 工作表名最长31个字符，且不能包含这些字符
+_SHEET_NAME_MAX = 31
+_SHEET_NAME_INVALID = re.compile(r'[\[\]:*?/\\]')
+
+# 汇总表（字段名, 中文列名）
+SUMMARY_COLUMNS = [
+    ('keyword', '关键词'),
+    ('sheet', '工作表'),
+    ('videos', '视频数'),
+    ('total_views', '总播放量'),
+    ('avg_heat', '平均热度'),
+    ('max_heat', '最高热度'),
+    ('avg_engagement', '平均互动率(%)'),
+    ('revenue_mid', '预估收益合计(中值$)'),
+    ('channels', '频道数'),
+    ('shared', '与其他关键词重复'),
+    ('top_title', '最热视频'),
+]
+SUMMARY_COLUMN_WIDTHS = {'A': 24, 'B': 24, 'K': 50}
+
+
+def _cell(value):
+    """单元格值（列表类字段拼成文本）"""
+    if isinstance(value, (list, tuple, set)):
+        return ', '.join(str(v) for v in value)
+    return value
+
+
+class BatchWorkbook:
+    """
+    流式写入的合并工作簿（线程安全，可在并行任务里直接 add）
+
+    用法:
+        with BatchWorkbook('output/batch.xlsx') as workbook:
+            for keyword in keywords:
+                workbook.add(keyword, analyzer.analyze('keyword', keyword, export=False))
+    """
+
+    def __init__(self, filename: str):
+        self.filename = os.path.abspath(filename)
+        os.makedirs(os.path.dirname(self.filename), exist_ok=True)
+        self._lock = threading.Lock()
+        self._workbook = Workbook(write_only=True)
+        # 汇总表先建，保证它是第一个工作表；行在 close 时写入
+        self._summary_sheet = self._workbook.create_sheet(SUMMARY_SHEET)
+        self._sheet_names = {SUMMARY_SHEET.lower()}
+        self._keywords: List[Dict] = []
+        # 每个视频只保留汇总需要的字段
+        self._rows: List[tuple] = []
+        self.closed = False
+
+    def _sheet_name(self, keyword: str) -> str:
+        base = _SHEET_NAME_INVALID.sub('_', keyword).strip().strip("'") or 'sheet'
+        name = base[:_SHEET_NAME_MAX]
+        suffix = 2
+        while name.lower() in self._sheet_names:
+            tag = f" ({suffix})"
+            name = base[:_SHEET_NAME_MAX - len(tag)] + tag
+            suffix += 1
+        self._sheet_names.add(name.lower())
+        return name
+
+    def add(self, keyword: str, videos: List[Dict]) -> str:
+        """把一个关键词的结果写成一个工作表（按传入顺序），返回工作表名"""
+        columns = export_columns(videos[0].keys()) if videos else export_columns(())
+        with self._lock:
+            if self.closed:
+                raise ValueError("工作簿已关闭")
+            name = self._sheet_name(keyword)
+            sheet = self._workbook.create_sheet(name)
+            for col, width in EXPORT_COLUMN_WIDTHS.items():
+                sheet.column_dimensions[col].width = width
+            sheet.append([title for _, title in columns])
+            top = None
+            for video in videos:
+                sheet.append([_cell(video.get(col)) for col, _ in columns])
+                self._rows.append((len(self._keywords), video.get('video_id'), video.get('channel_title'),
+                                   video.get('heat_score', 0.0), video.get('view_count', 0),
+                                   video.get('engagement_rate', 0.0), video.get('revenue_mid', 0.0)))
+                if top is None or video.get('heat_score', 0.0) > top.get('heat_score', 0.0):
+                    top = video
+            self._keywords.append({'keyword': keyword, 'sheet': name,
+                                   'top_title': top.get('title') if top else None})
+        return name
+
+    def summary(self) -> pd.DataFrame:
+        """跨关键词汇总（每个关键词一行，没有结果的关键词计为0）"""
+        with self._lock:
+            rows, keywords = list(self._rows), list(self._keywords)
+        df = pd.DataFrame(rows, columns=['position', 'video_id', 'channel_title', 'heat_score',
+                                         'view_count', 'engagement_rate', 'revenue_mid'])
+        # 同一视频出现在多个关键词里（同一关键词内的重复不算）
+        df['shared'] = df.drop_duplicates(['position', 'video_id']).duplicated('video_id', keep=False) \
+            .reindex(df.index, fill_value=False)
+        stats = df.groupby('position').agg(
+            videos=('video_id', 'size'),
+            total_views=('view_count', 'sum'),
+            avg_heat=('heat_score', 'mean'),
+            max_heat=('heat_score', 'max'),
+            avg_engagement=('engagement_rate', 'mean'),
+            revenue_mid=('revenue_mid', 'sum'),
+            channels=('channel_title', 'nunique'),
+            shared=('shared', 'sum'),
+        ).reindex(range(len(keywords)))
+        counts = ['videos', 'total_views', 'channels', 'shared']
+        stats[counts] = stats[counts].fillna(0).astype('int64')
+        stats['revenue_mid'] = stats['revenue_mid'].fillna(0.0)
+        averages = ['avg_heat', 'max_heat', 'avg_engagement', 'revenue_mid']
+        stats[averages] = stats[averages].round(2)
+        stats = pd.concat([pd.DataFrame(keywords), stats.reset_index(drop=True)], axis=1)
+        return stats[[col for col, _ in SUMMARY_COLUMNS]]
+
+    def close(self) -> str:
+        """写入汇总表并保存，返回文件绝对路径"""
+        if self.closed:
+            return self.filename
+        summary = self.summary()
+        with self._lock:
+            for col, width in SUMMARY_COLUMN_WIDTHS.items():
+                self._summary_sheet.column_dimensions[col].width = width
+            self._summary_sheet.append([title for _, title in SUMMARY_COLUMNS])
+            for row in summary.itertuples(index=False):
+                self._summary_sheet.append([None if pd.isna(v) else (v.item() if hasattr(v, 'item') else v)
+                                            for v in row])
+            self._workbook.save(self.filename)
+            self.closed = True
+        return self.filename
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,314 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+离线性能基准
+功能：用 youtube_stub 回放录制/合成的API响应，不联网、不需要API密钥，
+      测量 _parse_video_data / filter_videos / export_to_excel / analyze 在不同数据量下的
+      耗时与内存峰值，与基线对比，超过阈值视为性能回退（退出码1）
+
+运行:
+    python benchmark.py                              # 默认 1k/10k/100k，与基线对比
+    python benchmark.py --sizes 1000,1000000         # 指定数据量
+    python benchmark.py --save-baseline              # 保存当前结果为基线
+    python benchmark.py --transport --calls 500      # 对比 httplib2 与连接池传输的单次调用耗时（本地模拟API）
+"""
+
+import argparse
+import gc
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+from fake_youtube_server import FakeYouTubeServer
+from http_transport import PooledTransport
+from resilience import CircuitBreaker
+from youtube_analyzer import YouTubeAnalyzer
+from video_table import VideoTable, dicts_nbytes
+from youtube_stub import StubYouTube, synthetic_video_item, video_id_for
+
+DEFAULT_SIZES = [1000, 10000, 100000]
+STAGES = ['_parse_video_data', 'filter_videos', 'export_to_excel', 'analyze']
+DEFAULT_BASELINE = 'benchmark_baseline.json'
+# 模板条数：更大的数据量循环复用模板，避免生成输入本身占满内存
+TEMPLATE_COUNT = 10000
+# 绝对容差：小数据量下的计时/内存抖动不算回退
+MIN_WALL_DELTA_S = 0.005
+MIN_PEAK_DELTA_MB = 1.0
+
+
+def _make_analyzer(corpus_size: int = 0) -> YouTubeAnalyzer:
+    return YouTubeAnalyzer('BENCHMARK', quiet=True, youtube=StubYouTube(corpus_size))
+
+
+def load_templates(fixture: Optional[str] = None, count: int = TEMPLATE_COUNT) -> List[Dict]:
+    """原始视频数据模板：录制文件中的 videos.list 响应，或合成数据"""
+    if fixture:
+        with open(fixture, 'r', encoding='utf-8') as f:
+            records = json.load(f).get('records', [])
+        items = [item for rec in records if rec['method'] == 'videos.list'
+                 for item in rec['response'].get('items', [])]
+        if items:
+            return items
+    return [synthetic_video_item(i) for i in range(count)]
+
+
+def _cycle(items: List, n: int) -> List:
+    """按引用循环复用，得到长度为n的列表"""
+    return [items[i % len(items)] for i in range(n)]
+
+
+def _stage_setup(stage: str, n: int, templates: List[Dict]) -> Tuple[Callable, Callable]:
+    """返回 (setup, run)：setup 准备输入（不计时），run 执行被测阶段"""
+    analyzer = _make_analyzer(n)
+
+    def parsed_templates():
+        return [analyzer._parse_video_data(item) for item in templates[:n]]
+
+    if stage == '_parse_video_data':
+        def setup():
+            return _cycle(templates, n)
+
+        def run(items):
+            parse = analyzer._parse_video_data
+            return [parse(item) for item in items]
+    elif stage == 'filter_videos':
+        def setup():
+            return _cycle(parsed_templates(), n)
+
+        def run(videos):
+            return analyzer.filter_videos(videos, min_views=10000, min_engagement=1.0, max_days=30)
+    elif stage == 'export_to_excel':
+        tmpdir = tempfile.mkdtemp(prefix='yt_bench_')
+
+        def setup():
+            return _cycle(parsed_templates(), n)
+
+        def run(videos):
+            path = analyzer.export_to_excel(videos, os.path.join(tmpdir, 'bench.xlsx'))
+            os.remove(path)
+    elif stage == 'analyze':
+        def setup():
+            return None
+
+        def run(_):
+            return analyzer.analyze('channel', f"UC{0:022d}", max_results=n,
+                                    min_views=10000, min_engagement=1.0, export=False)
+    else:
+        raise ValueError(f"未知阶段: {stage}")
+    return setup, run
+
+
+def measure(stage: str, n: int, templates: List[Dict], repeat: int = 1,
+            memory: bool = True) -> Dict:
+    """测量一个阶段：耗时取多次最优；内存峰值单独跑一次（tracemalloc 会拖慢计时）"""
+    setup, run = _stage_setup(stage, n, templates)
+    walls = []
+    for _ in range(max(1, repeat)):
+        data = setup()
+        gc.collect()
+        start = time.perf_counter()
+        run(data)
+        walls.append(time.perf_counter() - start)
+        del data
+
+    peak_mb = None
+    if memory:
+        data = setup()
+        gc.collect()
+        tracemalloc.start()
+        base = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        run(data)
+        peak_mb = round((tracemalloc.get_traced_memory()[1] - base) / 1024 / 1024, 2)
+        tracemalloc.stop()
+        del data
+    return {'stage': stage, 'n': n, 'wall_s': round(min(walls), 4), 'peak_mb': peak_mb}
+
+
+def table_memory(n: int, templates: List[Dict]) -> Dict:
+    """n 条视频以 dict 列表和 VideoTable 存储的占用对比（深度计算，同一对象只算一次）"""
+    analyzer = _make_analyzer()
+    parsed = [analyzer._parse_video_data(item) for item in templates[:n]]
+    videos = []
+    for i in range(n):
+        # 每行独立的ID/列表/数值对象，和真实批量结果一样不共享
+        t = parsed[i % len(parsed)]
+        video_id = f"v{i:010d}"
+        videos.append(dict(t, video_id=video_id, view_count=t['view_count'] + i,
+                           url=f"https://www.youtube.com/watch?v={video_id}",
+                           thumbnail=f"https://i.ytimg.com/vi/{video_id}/hqdefault.jpg",
+                           hot_reasons=list(t['hot_reasons']), trend_points=list(t['trend_points'])))
+    dict_bytes = dicts_nbytes(videos)
+    start = time.perf_counter()
+    table = VideoTable.from_dicts(videos)
+    build_s = time.perf_counter() - start
+    table_bytes = table.nbytes()
+    return {'n': n, 'dict_mb': round(dict_bytes / 1024 / 1024, 1), 'table_mb': round(table_bytes / 1024 / 1024, 1),
+            'ratio': round(dict_bytes / table_bytes, 2), 'build_s': round(build_s, 2)}
+
+
+def transport_latency(calls: int = 200, latency_ms: float = 0.0, workers: int = 1,
+                      connect_latency_ms: float = 0.0, corpus_size: int = 1000) -> List[Dict]:
+    """
+    默认 httplib2 传输与连接池传输的单次 videos.list 调用耗时对比（本地模拟API）
+
+    和网页服务、命令行一样每次调用新建分析器：httplib2 的连接跟着服务对象走，
+    连接池传输在分析器之间共用长连接。connect_latency_ms 模拟每个新连接的握手开销；
+    connections 为模拟服务器接受的TCP连接数
+    """
+    results = []
+    with FakeYouTubeServer(corpus_size=corpus_size, latency_ms=latency_ms,
+                           connect_latency_ms=connect_latency_ms) as server:
+        for name in ('httplib2', 'pooled'):
+            server.reset()
+            transport = PooledTransport(maxsize=workers) if name == 'pooled' else None
+            # 构建服务对象较耗CPU，提前建好，只计API调用本身
+            analyzers = [YouTubeAnalyzer('BENCHMARK_TRANSPORT', quiet=True, api_endpoint=server.url,
+                                         transport=transport, breaker=CircuitBreaker()) for _ in range(calls)]
+
+            def call(i: int) -> float:
+                ids = [video_id_for((i * 50 + k) % corpus_size) for k in range(50)]
+                start = time.perf_counter()
+                analyzers[i].get_video_details(ids)
+                return time.perf_counter() - start
+
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                latencies = sorted(pool.map(call, range(calls)))
+            results.append({
+                'transport': name, 'calls': calls,
+                'p50_ms': round(latencies[len(latencies) // 2] * 1000, 2),
+                'p95_ms': round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000, 2),
+                'mean_ms': round(sum(latencies) / len(latencies) * 1000, 2),
+                'connections': server.stats()['connections'],
+            })
+            if transport is not None:
+                transport.close()
+    return results
+
+
+def compare(results: List[Dict], baseline: Dict[str, Dict], threshold: float) -> List[str]:
+    """与基线对比，返回回退描述列表"""
+    regressions = []
+    for r in results:
+        base = baseline.get(f"{r['stage']}@{r['n']}")
+        if not base:
+            continue
+        if (r['wall_s'] > base['wall_s'] * (1 + threshold)
+                and r['wall_s'] - base['wall_s'] > MIN_WALL_DELTA_S):
+            regressions.append(f"{r['stage']}@{r['n']} 耗时 {base['wall_s']}s → {r['wall_s']}s")
+        if (r['peak_mb'] is not None and base.get('peak_mb') is not None
+                and r['peak_mb'] > base['peak_mb'] * (1 + threshold)
+                and r['peak_mb'] - base['peak_mb'] > MIN_PEAK_DELTA_MB):
+            regressions.append(f"{r['stage']}@{r['n']} 内存 {base['peak_mb']}MB → {r['peak_mb']}MB")
+    return regressions
+
+
+def load_baseline(path: str) -> Dict[str, Dict]:
+    if os.path.exists(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f).get('results', {})
+    return {}
+
+
+def save_baseline(path: str, results: List[Dict], merge: Dict[str, Dict]):
+    merged = dict(merge)
+    for r in results:
+        merged[f"{r['stage']}@{r['n']}"] = {'wall_s': r['wall_s'], 'peak_mb': r['peak_mb']}
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'python': sys.version.split()[0], 'results': merged}, f, indent=2, sort_keys=True)
+
+
+def _parse_sizes(text: str) -> List[int]:
+    sizes = []
+    for part in text.split(','):
+        part = part.strip().lower()
+        if not part:
+            continue
+        mult = 1
+        if part.endswith('k'):
+            mult, part = 1000, part[:-1]
+        elif part.endswith('m'):
+            mult, part = 1000000, part[:-1]
+        sizes.append(int(float(part) * mult))
+    return sizes
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="YouTube分析工具离线性能基准")
+    parser.add_argument("--sizes", default=','.join(str(s) for s in DEFAULT_SIZES),
+                        help="数据量列表，支持 1k/1m 写法")
+    parser.add_argument("--stages", default=','.join(STAGES), help="要测的阶段")
+    parser.add_argument("--fixture", help="录制的响应文件（用其中 videos.list 数据作模板）")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="基线文件")
+    parser.add_argument("--save-baseline", action="store_true", help="把本次结果写入基线")
+    parser.add_argument("--threshold", type=float, default=0.25, help="回退阈值（0.25=慢25%%）")
+    parser.add_argument("--repeat", type=int, default=1, help="计时重复次数（取最优）")
+    parser.add_argument("--no-memory", action="store_true", help="不测内存峰值")
+    parser.add_argument("--json", help="把结果另存为JSON")
+    parser.add_argument("--table-memory", action="store_true",
+                        help="只对比 dict 列表与 VideoTable 的内存占用")
+    parser.add_argument("--transport", action="store_true",
+                        help="只对比 httplib2 与连接池传输的单次调用耗时（启动本地模拟API）")
+    parser.add_argument("--calls", type=int, default=200, help="--transport 的调用次数")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="--transport 模拟API的延迟（毫秒）")
+    parser.add_argument("--workers", type=int, default=1, help="--transport 的并发线程数")
+    parser.add_argument("--connect-latency-ms", type=float, default=30.0,
+                        help="--transport 模拟每个新连接的握手开销（毫秒）")
+    args = parser.parse_args(argv)
+
+    if args.transport:
+        print(f"{'传输':<10}{'调用数':>8}{'p50(ms)':>10}{'p95(ms)':>10}{'平均(ms)':>10}{'TCP连接':>10}")
+        for r in transport_latency(args.calls, args.latency_ms, args.workers, args.connect_latency_ms):
+            print(f"{r['transport']:<10}{r['calls']:>8}{r['p50_ms']:>10.2f}{r['p95_ms']:>10.2f}"
+                  f"{r['mean_ms']:>10.2f}{r['connections']:>10}", flush=True)
+        return 0
+
+    templates = load_templates(args.fixture)
+    if args.table_memory:
+        print(f"{'数据量':>10}{'dict(MB)':>12}{'VideoTable(MB)':>16}{'压缩比':>8}{'建表(s)':>10}")
+        for n in _parse_sizes(args.sizes):
+            r = table_memory(n, templates)
+            print(f"{n:>10,}{r['dict_mb']:>12.1f}{r['table_mb']:>16.1f}{r['ratio']:>8.2f}{r['build_s']:>10.2f}",
+                  flush=True)
+        return 0
+    stages = [s.strip() for s in args.stages.split(',') if s.strip()]
+    results = []
+    print(f"{'阶段':<20}{'数据量':>10}{'耗时(s)':>12}{'内存峰值(MB)':>14}")
+    print('-' * 58)
+    for n in _parse_sizes(args.sizes):
+        for stage in stages:
+            r = measure(stage, n, templates, repeat=args.repeat, memory=not args.no_memory)
+            results.append(r)
+            peak = '-' if r['peak_mb'] is None else f"{r['peak_mb']:.2f}"
+            print(f"{stage:<20}{n:>10,}{r['wall_s']:>12.4f}{peak:>14}", flush=True)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+    baseline = load_baseline(args.baseline)
+    if args.save_baseline:
+        save_baseline(args.baseline, results, baseline)
+        print(f"\n💾 基线已保存: {os.path.abspath(args.baseline)}")
+        return 0
+
+    if not baseline:
+        print("\n⚠️ 没有基线，跳过对比（使用 --save-baseline 创建）")
+        return 0
+    regressions = compare(results, baseline, args.threshold)
+    if regressions:
+        print(f"\n❌ 发现 {len(regressions)} 项性能回退（阈值 {args.threshold:.0%}）:")
+        for line in regressions:
+            print(f"   {line}")
+        return 1
+    print(f"\n✅ 未发现性能回退（阈值 {args.threshold:.0%}）")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+频道相对爆款检测
+功能：heat_score 是绝对值，同样6万播放对5千粉和500万粉的频道意义完全不同。
+      这里按频道拉取近期上传，用每个频道自身“日均播放”的中位数和MAD作为基线，
+      计算稳健z分数，标记明显高于本频道常态的视频；所有频道一次性向量化计算
+
+运行:
+    python breakout.py https://www.youtube.com/@TEDEd UCxxxxxxxxxxxxxxxxxxxxxx --max-per-channel 100
+"""
+
+import argparse
+import json
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+import numpy as np
+
+from youtube_analyzer import YouTubeAnalyzer
+
+# 修正z分数（Iglewicz-Hoaglin）：0.6745*(x-中位数)/MAD，超过3.5视为离群
+DEFAULT_THRESHOLD = 3.5
+# 频道至少有这么多条近期视频才建立基线
+MIN_HISTORY = 5
+# 对数尺度下MAD的下限，避免频道数据几乎一致时分母为0（约等于±12%的波动）
+MAD_FLOOR = 0.05
+
+
+def group_medians(codes: np.ndarray, values: np.ndarray, n_groups: int) -> np.ndarray:
+    """
+    向量化求每组中位数：按(组, 值)排序一次，再按组起点和组大小取中间位置
+
+    Args:
+        codes: 每个元素所属的组号（0..n_groups-1）
+        values: 元素值
+        n_groups: 组数
+
+    Returns:
+        长度为 n_groups 的中位数数组（空组为 nan）
+    """
+    order = np.lexsort((values, codes))
+    sorted_values = values[order]
+    counts = np.bincount(codes, minlength=n_groups)
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    medians = np.full(n_groups, np.nan)
+    present = counts > 0
+    lo = starts[present] + (counts[present] - 1) // 2
+    hi = starts[present] + counts[present] // 2
+    medians[present] = (sorted_values[lo] + sorted_values[hi]) / 2
+    return medians
+
+
+def score_breakouts(videos: List[Dict], threshold: float = DEFAULT_THRESHOLD,
+                    min_history: int = MIN_HISTORY) -> List[Dict]:
+    """
+    为每个视频计算相对本频道的爆款程度（原地补充字段）
+
+    新增字段:
+        channel_median_daily_views: 本频道日均播放中位数
+        breakout_ratio: 本视频日均播放 / 频道中位数
+        breakout_z: 对数日均播放的修正z分数（频道样本不足时为 None）
+        is_breakout: 是否离群（z 超过阈值）
+
+    Returns:
+        被标记为爆款的视频，按 breakout_z 降序
+    """
+    if not videos:
+        return []
+    channels, codes = np.unique([v.get('channel_id') or v['channel_title'] for v in videos],
+                                return_inverse=True)
+    n_groups = len(channels)
+    views = np.fromiter((v['view_count'] for v in videos), dtype=np.float64, count=len(videos))
+    days = np.fromiter((v['days_since_published'] for v in videos), dtype=np.float64, count=len(videos))
+    daily = views / np.maximum(days, 1)
+    log_daily = np.log1p(daily)
+
+    median = group_medians(codes, log_daily, n_groups)
+    mad = group_medians(codes, np.abs(log_daily - median[codes]), n_groups)
+    mad = np.maximum(mad, MAD_FLOOR)
+    z = 0.6745 * (log_daily - median[codes]) / mad[codes]
+
+    enough = np.bincount(codes, minlength=n_groups)[codes] >= min_history
+    z = np.where(enough, z, np.nan)
+    baseline = np.expm1(median)[codes]
+    ratio = daily / np.maximum(baseline, 1)
+    flagged = enough & (z > threshold)
+
+    for i, video in enumerate(videos):
+        video['channel_median_daily_views'] = round(float(baseline[i]), 2)
+        video['breakout_ratio'] = round(float(ratio[i]), 2)
+        video['breakout_z'] = None if np.isnan(z[i]) else round(float(z[i]), 2)
+        video['is_breakout'] = bool(flagged[i])
+
+    return sorted((videos[i] for i in np.flatnonzero(flagged)),
+                  key=lambda v: v['breakout_z'], reverse=True)
+
+
+class BreakoutAnalyzer:
+    """按频道上传历史检测相对爆款"""
+
+    def __init__(self, analyzer: YouTubeAnalyzer, threshold: float = DEFAULT_THRESHOLD,
+                 min_history: int = MIN_HISTORY, window_days: int = 90, max_workers: int = 8):
+        """
+        Args:
+            analyzer: 分析器（复用频道、详情接口与容错层）
+            threshold: 修正z分数阈值
+            min_history: 建立基线所需的最少视频数
+            window_days: 只用最近多少天内发布的视频
+            max_workers: 并发拉取频道上传列表的线程数
+        """
+        self.analyzer = analyzer
+        self.threshold = threshold
+        self.min_history = min_history
+        self.window_days = window_days
+        self.max_workers = max_workers
+
+    def collect(self, channels: List[str], max_per_channel: int = 50) -> List[Dict]:
+        """
+        并发拉取各频道上传列表，合并后统一按50个一批获取详情（跨频道凑满批次）
+
+        Returns:
+            窗口期内的视频详情
+        """
+        with ThreadPoolExecutor(max_workers=max(1, min(self.max_workers, len(channels)))) as pool:
+            id_lists = list(pool.map(lambda c: self.analyzer.get_channel_videos(c, max_per_channel),
+                                     channels))
+        video_ids = list(dict.fromkeys(vid for ids in id_lists for vid in ids))
+        videos = self.analyzer.get_video_details(video_ids)
+        return [v for v in videos if v['days_since_published'] <= self.window_days]
+
+    def run(self, channels: List[str], max_per_channel: int = 50) -> List[Dict]:
+        """拉取并计算，返回爆款视频（按z分数降序）"""
+        videos = self.collect(channels, max_per_channel)
+        with self.analyzer.tracer.span('score_breakouts', count=len(videos)):
+            return score_breakouts(videos, self.threshold, self.min_history)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="频道相对爆款检测")
+    parser.add_argument("channels", nargs="+", help="频道URL或ID")
+    parser.add_argument("--max-per-channel", type=int, default=50, help="每个频道最多拉取的上传数")
+    parser.add_argument("--window-days", type=int, default=90, help="只用最近多少天的视频")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="修正z分数阈值")
+    args = parser.parse_args()
+
+    api_key = os.getenv('YOUTUBE_API_KEY')
+    if not api_key and os.path.exists('config.json'):
+        with open('config.json', 'r', encoding='utf-8') as f:
+            api_key = json.load(f).get('youtube_api_key')
+    if not api_key:
+        print("⚠️ 请先设置 YOUTUBE_API_KEY 或 config.json")
+        return 1
+
+    detector = BreakoutAnalyzer(YouTubeAnalyzer(api_key, quiet=True), threshold=args.threshold,
+                                window_days=args.window_days)
+    breakouts = detector.run(args.channels, args.max_per_channel)
+    print(f"🚀 发现 {len(breakouts)} 个相对本频道的爆款:")
+    for video in breakouts[:20]:
+        print(f"  z={video['breakout_z']:.1f} x{video['breakout_ratio']:.1f} "
+              f"[{video['channel_title']}] {video['title'][:50]}")
+        print(f"     {video['url']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
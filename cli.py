@@ -0,0 +1,340 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+非交互命令行
+功能：按关键词 / 频道 / 本地索引 / 任务文件批量分析，任务并行执行，
+      结果以 NDJSON 逐行写到标准输出（每个任务完成即输出，--stream 时边抓边输出），进度写到标准错误；
+      退出码区分全部成功、部分失败与全部失败，便于放进管道和定时任务
+
+运行:
+    python cli.py keyword "life hacks" "cooking tips" --min-views 100000 -j 2 > out.ndjson
+    python cli.py channel https://www.youtube.com/@xxxx
+    python cli.py batch jobs.txt -j 4 | jq 'select(.record == "video") | .url'
+    python cli.py local "air fryer" --max-days 30
+    python cli.py batch jobs.txt -j 4 --workbook output/batch.xlsx > out.ndjson
+
+任务文件（- 表示标准输入）每行一个任务：
+    life hacks                      # 默认为关键词
+    channel: https://www.youtube.com/@xxxx
+    {"type": "keyword", "value": "diy", "min_views": 200000, "region": "GB"}
+也可以是 .json 文件中的任务数组
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import IO, Callable, Dict, List, Optional
+
+from batch_workbook import BatchWorkbook
+from http_transport import transport_from_config
+from key_pool import load_key_pool
+from local_index import DEFAULT_INDEX_PATH, LocalIndex
+from run_history import DEFAULT_HISTORY_PATH, RunHistory
+from search_cache import DEFAULT_FRESHNESS, DEFAULT_SEARCH_CACHE_PATH, SearchCache
+from youtube_analyzer import YouTubeAnalyzer
+
+# 退出码
+EXIT_OK = 0            # 全部任务成功（没有结果也算成功）
+EXIT_FAILED = 1        # 全部任务失败
+EXIT_USAGE = 2         # 参数/配置错误（与 argparse 一致）
+EXIT_PARTIAL = 3       # 部分任务失败，或有API调用失败导致结果不完整
+
+INPUT_TYPES = ('keyword', 'channel', 'local')
+
+
+def _bool(value) -> bool:
+    return value if isinstance(value, bool) else str(value).strip().lower() in ('1', 'true', 'yes')
+
+
+# 任务可单独覆盖的参数（其余沿用命令行）
+JOB_OPTIONS = {
+    'max_results': int, 'min_views': int, 'min_engagement': float, 'max_days': int,
+    'min_duration': int, 'max_duration': int, 'language': str, 'region': str,
+    'cpm_low': float, 'cpm_high': float, 'dedup': _bool, 'comments_top_k': int, 'only_new': _bool,
+}
+ANALYZE_OPTIONS = ('max_results', 'min_views', 'min_engagement', 'max_days', 'min_duration',
+                   'max_duration', 'language', 'region', 'dedup', 'comments_top_k', 'only_new')
+# 流式模式（analyze_iter）不支持需要完整结果的去重、评论抽样与历史对比
+STREAM_OPTIONS = ANALYZE_OPTIONS[:-3]
+
+_PREFIX_RE = re.compile(r'^(keyword|channel|local)\s*:\s*(.+)$', flags=re.IGNORECASE)
+
+
+def parse_job_line(line: str) -> Optional[Dict]:
+    """解析任务文件的一行；空行与 # 注释返回 None"""
+    line = line.strip()
+    if not line or line.startswith('#'):
+        return None
+    if line.startswith('{'):
+        return normalize_job(json.loads(line))
+    match = _PREFIX_RE.match(line)
+    if match:
+        return {'type': match.group(1).lower(), 'value': match.group(2).strip()}
+    return {'type': 'keyword', 'value': line}
+
+
+def normalize_job(job: Dict) -> Dict:
+    """校验任务字段并转换类型，非法时抛出 ValueError"""
+    job = dict(job)
+    job.setdefault('type', 'keyword')
+    if job['type'] not in INPUT_TYPES:
+        raise ValueError(f"不支持的任务类型: {job['type']}")
+    if not str(job.get('value', '')).strip():
+        raise ValueError("任务缺少 value")
+    job['value'] = str(job['value']).strip()
+    for key in list(job):
+        if key in ('type', 'value', 'id'):
+            continue
+        if key not in JOB_OPTIONS:
+            raise ValueError(f"未知的任务参数: {key}")
+        job[key] = JOB_OPTIONS[key](job[key])
+    return job
+
+
+def load_jobs(path: str) -> List[Dict]:
+    """读取任务文件（'-' 为标准输入）"""
+    if path == '-':
+        text = sys.stdin.read()
+    else:
+        with open(path, 'r', encoding='utf-8') as f:
+            text = f.read()
+    if path.endswith('.json') or text.lstrip().startswith('['):
+        return [normalize_job(job) for job in json.loads(text)]
+    jobs = []
+    for number, line in enumerate(text.splitlines(), 1):
+        try:
+            job = parse_job_line(line)
+        except ValueError as e:
+            raise ValueError(f"{path}:{number}: {e}") from e
+        if job:
+            jobs.append(job)
+    return jobs
+
+
+def _slug(text: str) -> str:
+    return re.sub(r'[^\w-]+', '_', text).strip('_')[:40] or 'job'
+
+
+class NdjsonWriter:
+    """线程安全的 NDJSON 输出；下游提前关闭管道（如 head）后静默丢弃"""
+
+    def __init__(self, stream: IO[str]):
+        self.stream = stream
+        self.closed = False
+        self._lock = threading.Lock()
+
+    def write(self, record: Dict):
+        line = json.dumps(record, ensure_ascii=False, default=str)
+        with self._lock:
+            if self.closed:
+                return
+            try:
+                self.stream.write(line + '\n')
+                self.stream.flush()
+            except BrokenPipeError:
+                self.closed = True
+
+
+def run_job(index: int, job: Dict, options: Dict, make_analyzer: Callable[[Dict], YouTubeAnalyzer],
+            writer: NdjsonWriter, export_dir: Optional[str] = None, stream: bool = False,
+            workbook: Optional[BatchWorkbook] = None) -> Dict:
+    """
+    执行一个任务，逐条输出视频记录，最后输出任务汇总记录并返回它
+
+    stream=True 时用 analyze_iter 边抓边输出（发现顺序，没有 rank），否则结果按热度排好后输出；
+    给了 workbook 时结果另写成合并工作簿里的一个工作表
+    """
+    settings = {**options, **{k: v for k, v in job.items() if k in JOB_OPTIONS}}
+    started = time.perf_counter()
+    summary = {'record': 'job', 'job': index, 'input_type': job['type'], 'input_value': job['value']}
+    try:
+        analyzer = make_analyzer(settings)
+        count = 0
+        results = []
+        if stream:
+            # 只有需要导出时才保留结果，否则内存与频道大小无关
+            for video in analyzer.analyze_iter(job['type'], job['value'],
+                                               **{k: settings[k] for k in STREAM_OPTIONS if k in settings}):
+                writer.write({'record': 'video', 'job': index, 'input_value': job['value'], **video})
+                count += 1
+                if export_dir or workbook is not None:
+                    results.append(video)
+        else:
+            results = analyzer.analyze(job['type'], job['value'], export=False,
+                                       **{k: settings[k] for k in ANALYZE_OPTIONS if k in settings})
+            for rank, video in enumerate(results, 1):
+                writer.write({'record': 'video', 'job': index, 'input_value': job['value'], 'rank': rank,
+                              **video})
+            count = len(results)
+        if export_dir and results:
+            filename = os.path.join(export_dir, f"{index:03d}_{_slug(job['value'])}_"
+                                                f"{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx")
+            summary['export'] = analyzer.export_to_excel(results, filename)
+        if workbook is not None:
+            summary['sheet'] = workbook.add(job['value'], results)
+        summary.update(status='partial' if analyzer.errors else 'ok', count=count,
+                       errors=analyzer.errors)
+        if analyzer.last_diff:
+            summary['diff'] = {k: analyzer.last_diff[k] for k in ('previous_run', 'new', 'dropped')}
+            summary['diff']['movers'] = len(analyzer.last_diff['movers'])
+    except Exception as e:  # 单个任务失败不影响其他任务
+        summary.update(status='failed', count=0, errors=[{'kind': 'exception', 'message': str(e)}])
+    summary['elapsed_s'] = round(time.perf_counter() - started, 3)
+    writer.write(summary)
+    return summary
+
+
+def run_jobs(jobs: List[Dict], options: Dict, make_analyzer: Callable[[Dict], YouTubeAnalyzer],
+             stdout: IO[str], parallel: int = 1, export_dir: Optional[str] = None,
+             progress: Optional[IO[str]] = None, stream: bool = False,
+             workbook: Optional[BatchWorkbook] = None) -> int:
+    """并行执行任务，返回退出码（工作簿由调用方关闭）"""
+    writer = NdjsonWriter(stdout)
+
+    def worker(item):
+        index, job = item
+        summary = run_job(index, job, options, make_analyzer, writer, export_dir, stream, workbook)
+        if progress is not None:
+            icon = {'ok': '✅', 'partial': '⚠️', 'failed': '❌'}[summary['status']]
+            print(f"{icon} [{index}/{len(jobs)}] {job['type']}: {job['value']} → "
+                  f"{summary['count']} 个视频 ({summary['elapsed_s']}s)", file=progress, flush=True)
+        return summary
+
+    with ThreadPoolExecutor(max_workers=max(1, min(parallel, len(jobs) or 1))) as pool:
+        summaries = list(pool.map(worker, enumerate(jobs, 1)))
+
+    statuses = [s['status'] for s in summaries]
+    if statuses and all(s == 'failed' for s in statuses):
+        return EXIT_FAILED
+    if any(s != 'ok' for s in statuses):
+        return EXIT_PARTIAL
+    return EXIT_OK
+
+
+def _load_config(path: str) -> Dict:
+    if path and os.path.exists(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    return {}
+
+
+def build_parser() -> argparse.ArgumentParser:
+    common = argparse.ArgumentParser(add_help=False)
+    group = common.add_argument_group("筛选与估算")
+    group.add_argument("--max-results", type=int, default=50, help="每个任务最多分析视频数")
+    group.add_argument("--min-views", type=int, default=50000, help="最低播放量")
+    group.add_argument("--min-engagement", type=float, default=2.0, help="最低互动率(%%)")
+    group.add_argument("--max-days", type=int, default=14, help="最多发布天数")
+    group.add_argument("--min-duration", type=int, default=60, help="最短时长（秒）")
+    group.add_argument("--max-duration", type=int, default=900, help="最长时长（秒）")
+    group.add_argument("--cpm-low", type=float, default=2.0, help="CPM下限（美元）")
+    group.add_argument("--cpm-high", type=float, default=4.0, help="CPM上限（美元）")
+    group.add_argument("--language", default=None, help="搜索语言（默认 en）")
+    group.add_argument("--region", default=None, help="搜索地区（默认 US）")
+    group.add_argument("--dedup", action="store_true", help="合并近重复/重传视频")
+    group.add_argument("--comments", type=int, default=0, dest="comments_top_k",
+                       help="对前K个结果抽样评论")
+    group.add_argument("--only-new", action="store_true",
+                       help="只输出上一次同样查询之后新上榜的视频（需要运行历史）")
+    run = common.add_argument_group("运行")
+    run.add_argument("-j", "--parallel", type=int, default=1, help="并行任务数")
+    run.add_argument("--export", metavar="DIR", help="每个任务另存一个Excel到该目录")
+    run.add_argument("--workbook", metavar="PATH",
+                     help="所有任务写进同一个Excel：每个任务一个工作表（按完成顺序）+ 汇总表")
+    run.add_argument("--stream", action="store_true",
+                     help="边翻页边抓详情边输出（首条结果更快、内存有界；不排序，不支持 --dedup/--comments）")
+    run.add_argument("--config", default="config.json", help="配置文件（读取密钥）")
+    run.add_argument("--index", default=None,
+                     help="本地视频索引路径（默认 video_index.db，设为空字符串则不使用）")
+    run.add_argument("--history", default=None,
+                     help="运行历史路径（默认 run_history.db，设为空字符串则不记录、不对比）")
+    run.add_argument("--search-cache", default=None,
+                     help="搜索结果缓存路径（默认 search_cache.db，设为空字符串则不缓存）")
+    run.add_argument("--batch-requests", action="store_true",
+                     help="批量模式：一个任务内互不依赖的API调用合并成一次HTTP往返")
+    run.add_argument("--http-pool", type=int, default=None,
+                     help="每个主机的长连接数（默认 config.json 的 http_pool_maxsize 或16，0 用 httplib2）")
+    run.add_argument("--no-progress", action="store_true", help="不在标准错误输出进度")
+
+    parser = argparse.ArgumentParser(description="YouTube热门视频分析（非交互，NDJSON输出）")
+    sub = parser.add_subparsers(dest="command", required=True)
+    for name, help_text in (('keyword', "按关键词搜索"), ('channel', "分析频道"), ('local', "查询本地索引")):
+        p = sub.add_parser(name, parents=[common], help=help_text)
+        p.add_argument("values", nargs="+", help="关键词 / 频道URL或ID / 检索词（可多个）")
+    p = sub.add_parser('batch', parents=[common], help="执行任务文件")
+    p.add_argument("job_file", help="任务文件（每行一个任务或 .json 数组，- 为标准输入）")
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    progress = None if args.no_progress else sys.stderr
+
+    if args.command == 'batch':
+        try:
+            jobs = load_jobs(args.job_file)
+        except (OSError, ValueError) as e:
+            print(f"❌ 任务文件无效: {e}", file=sys.stderr)
+            return EXIT_USAGE
+    else:
+        jobs = [{'type': args.command, 'value': value} for value in args.values]
+
+    config = _load_config(args.config)
+    key_pool = load_key_pool(config)
+    if key_pool is None and any(job['type'] != 'local' for job in jobs):
+        print("❌ 未找到API密钥：设置 YOUTUBE_API_KEY / YOUTUBE_API_KEYS 或 config.json", file=sys.stderr)
+        return EXIT_USAGE
+
+    index_path = DEFAULT_INDEX_PATH if args.index is None else args.index
+    local_index = LocalIndex(index_path) if index_path else None
+    history_path = DEFAULT_HISTORY_PATH if args.history is None else args.history
+    history = RunHistory(history_path) if history_path else None
+    if args.only_new and history is None:
+        print("❌ --only-new 需要运行历史（不要把 --history 设为空）", file=sys.stderr)
+        return EXIT_USAGE
+    cache_path = DEFAULT_SEARCH_CACHE_PATH if args.search_cache is None else args.search_cache
+    search_cache = SearchCache(cache_path, freshness=config.get('search_cache_ttl', DEFAULT_FRESHNESS)) \
+        if cache_path else None
+    transport = transport_from_config(config, args.http_pool)
+    options = {name: getattr(args, name) for name in JOB_OPTIONS}
+
+    def make_analyzer(settings: Dict) -> YouTubeAnalyzer:
+        return YouTubeAnalyzer(None, key_pool=key_pool, local_index=local_index, run_history=history,
+                               search_cache=search_cache, transport=transport,
+                               batch_requests=args.batch_requests, quiet=True,
+                               cpm_low=settings['cpm_low'], cpm_high=settings['cpm_high'])
+
+    workbook = BatchWorkbook(args.workbook) if args.workbook else None
+
+    if progress is not None:
+        print(f"🚀 共 {len(jobs)} 个任务，并行 {args.parallel}", file=progress, flush=True)
+    code = run_jobs(jobs, options, make_analyzer, sys.stdout, parallel=args.parallel,
+                    export_dir=args.export, progress=progress, stream=args.stream, workbook=workbook)
+    if workbook is not None:
+        path = workbook.close()
+        if progress is not None:
+            print(f"💾 合并工作簿: {path}", file=progress, flush=True)
+    if local_index is not None:
+        local_index.close()
+    if history is not None:
+        history.close()
+    if search_cache is not None:
+        stats = search_cache.stats()
+        if progress is not None and stats['hits']:
+            print(f"💾 搜索缓存命中 {stats['hits']} 页，节省 {stats['quota_saved']} 配额",
+                  file=progress, flush=True)
+        search_cache.close()
+    if transport is not None:
+        transport.close()
+    return code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+评论抽样的流式词法统计
+功能：逐条喂入评论，只保留计数器和有界的高频词草图，不保存评论原文；
+      输出高频词/二元词组、语言构成、提问比例、平均长度等廉价指标
+"""
+
+import re
+from collections import Counter
+from typing import Dict, List, Tuple
+
+# 高频词草图容量（Misra-Gries，内存上限与评论数量无关）
+SKETCH_CAPACITY = 256
+TOP_TERMS = 10
+
+_WORD_RE = re.compile(r"[^\W\d_]+(?:'[^\W\d_]+)?", flags=re.UNICODE)
+
+# 拉丁字母语言按常见虚词粗分（命中最多的一种）
+LATIN_STOPWORDS = {
+    'en': {'the', 'and', 'is', 'you', 'this', 'to', 'it', 'of', 'that', 'was', 'my', 'for', 'so', 'i'},
+    'es': {'el', 'la', 'que', 'de', 'es', 'y', 'los', 'muy', 'por', 'con', 'para', 'una', 'lo'},
+    'pt': {'que', 'não', 'muito', 'você', 'é', 'de', 'o', 'com', 'uma', 'isso', 'para', 'eu'},
+    'fr': {'le', 'les', 'est', 'je', 'et', 'des', 'une', 'pas', 'c\'est', 'du', 'trop', 'vous'},
+    'de': {'der', 'die', 'und', 'ist', 'das', 'ich', 'nicht', 'ein', 'zu', 'mit', 'sehr', 'du'},
+}
+STOPWORDS = set().union(*LATIN_STOPWORDS.values()) | {
+    'a', 'an', 'in', 'on', 'at', 'be', 'are', 'i\'m', 'me', 'we', 'they', 'he', 'she', 'just',
+    'but', 'what', 'have', 'can', 'with', 'all', 'your', 'if', 'not', 'how', 'do', 'like', 'his',
+    'her', 'its', 'or', 'from', 'will', 'one', 'who', 'when', 'more', 'them', 'no', 'yes', 'en',
+    'un', 'se', 'da', 'em', 'te', 'mi', 'al', 'le', 'il', 'qui', 'es',
+}
+
+# 非拉丁文字按 Unicode 区段判断
+_SCRIPT_RANGES: List[Tuple[str, int, int]] = [
+    ('zh', 0x4E00, 0x9FFF),
+    ('ja', 0x3040, 0x30FF),
+    ('ko', 0xAC00, 0xD7AF),
+    ('ru', 0x0400, 0x04FF),
+    ('ar', 0x0600, 0x06FF),
+    ('hi', 0x0900, 0x097F),
+]
+
+
+class TopKSketch:
+    """
+    Misra-Gries 频繁项草图：最多保存 capacity 个计数，满了就整体减一并丢掉归零项
+
+    计数是下界估计，真实高频项不会被漏掉
+    """
+
+    def __init__(self, capacity: int = SKETCH_CAPACITY):
+        self.capacity = capacity
+        self.counts: Dict[str, int] = {}
+
+    def add(self, item: str):
+        counts = self.counts
+        if item in counts:
+            counts[item] += 1
+        elif len(counts) < self.capacity:
+            counts[item] = 1
+        else:
+            for key in list(counts):
+                counts[key] -= 1
+                if counts[key] == 0:
+                    del counts[key]
+
+    def top(self, n: int = TOP_TERMS) -> List[Tuple[str, int]]:
+        return sorted(self.counts.items(), key=lambda kv: (-kv[1], kv[0]))[:n]
+
+
+def detect_language(text: str, words: List[str]) -> str:
+    """廉价的语言判断：先看文字区段，拉丁文字再看虚词"""
+    for ch in text:
+        code = ord(ch)
+        if code < 0x0370:
+            continue
+        for lang, low, high in _SCRIPT_RANGES:
+            if low <= code <= high:
+                return lang
+    best, hits = 'other', 0
+    for lang, stopwords in LATIN_STOPWORDS.items():
+        count = sum(1 for w in words if w in stopwords)
+        if count > hits:
+            best, hits = lang, count
+    return best
+
+
+class CommentStats:
+    """单个视频的评论流式统计"""
+
+    def __init__(self, capacity: int = SKETCH_CAPACITY):
+        self.total = 0
+        self.questions = 0
+        self.chars = 0
+        self.likes = 0
+        self.languages: Counter = Counter()
+        self.terms = TopKSketch(capacity)
+        self.bigrams = TopKSketch(capacity)
+
+    def add(self, text: str, like_count: int = 0):
+        """喂入一条评论（处理完即可丢弃原文）"""
+        self.total += 1
+        self.chars += len(text)
+        self.likes += like_count
+        if '?' in text or '？' in text:
+            self.questions += 1
+        words = _WORD_RE.findall(text.lower())
+        self.languages[detect_language(text, words)] += 1
+        previous = None
+        for word in words:
+            if word in STOPWORDS or len(word) < 2:
+                previous = None
+                continue
+            self.terms.add(word)
+            if previous is not None:
+                self.bigrams.add(f"{previous} {word}")
+            previous = word
+
+    def to_dict(self) -> Dict:
+        total = max(1, self.total)
+        return {
+            'sample_size': self.total,
+            'question_ratio': round(self.questions / total, 3),
+            'avg_length': round(self.chars / total, 1),
+            'avg_likes': round(self.likes / total, 1),
+            'languages': {lang: round(count / total, 3) for lang, count in self.languages.most_common()},
+            'top_terms': [term for term, _ in self.terms.top()],
+            'top_bigrams': [term for term, _ in self.bigrams.top(5)],
+        }
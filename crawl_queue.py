@@ -0,0 +1,371 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+并行抓取：基于租约的共享任务队列
+功能：单个批量进程跑不完全部关键词时，由协调端把关键词 / 频道写进共享的 SQLite 队列，
+      同一台机器上的多个 worker 进程领取任务执行现有分析阶段：发现任务（搜索 / 频道翻页）把找到的
+      视频ID按50个一批拆成详情任务再入队，详情任务抓取解析后写入共用的本地视频索引。
+      领取任务即获得租约，执行期间定期心跳续约；worker 崩溃后租约过期，任务自动被其他
+      worker 重新领取，失败按退避重试，超过次数标记失败
+
+运行:
+    python crawl_queue.py seed jobs.txt --queue crawl_queue.db          # 协调端：写入任务
+    python crawl_queue.py worker --queue crawl_queue.db --index video_index.db
+    python crawl_queue.py status --queue crawl_queue.db
+
+队列和索引只能在同一台机器的本地磁盘上由多个进程共用：WAL 模式依赖同机共享内存，
+NFS / SMB 等网络文件系统上的 SQLite 文件锁也不可靠，租约可能被重复领取甚至损坏数据库
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import socket
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+from typing import Callable, Dict, List, Optional
+
+from cli import load_jobs
+from key_pool import load_key_pool
+from local_index import DEFAULT_INDEX_PATH, LocalIndex
+from youtube_analyzer import YouTubeAnalyzer
+
+DEFAULT_QUEUE_PATH = 'crawl_queue.db'
+DEFAULT_LEASE_SECONDS = 120.0
+DEFAULT_MAX_ATTEMPTS = 4
+RETRY_BACKOFF_SECONDS = 30.0
+# 同一批视频详情多久之后允许重新入队刷新（秒）
+DETAILS_REFRESH_AFTER = 6 * 3600
+
+# 任务类型与优先级（数字小的先领取：先把已发现的详情抓完，再继续发现）
+KIND_PRIORITY = {'details': 0, 'channel': 1, 'keyword': 1}
+DETAILS_BATCH = 50
+
+PENDING, LEASED, DONE, FAILED = 'pending', 'leased', 'done', 'failed'
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    id INTEGER PRIMARY KEY,
+    kind TEXT NOT NULL,
+    task_key TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    priority INTEGER NOT NULL DEFAULT 1,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL,
+    available_at REAL NOT NULL,
+    lease_owner TEXT,
+    lease_expires REAL,
+    last_error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    UNIQUE(kind, task_key)
+);
+CREATE INDEX IF NOT EXISTS idx_tasks_claim ON tasks(status, priority, available_at);
+"""
+
+
+class CrawlTaskError(Exception):
+    """任务执行失败（可重试）"""
+
+
+class LeaseQueue:
+    """SQLite 租约队列（同一文件可被多个进程 / 线程同时使用）"""
+
+    def __init__(self, path: str = DEFAULT_QUEUE_PATH, clock: Callable[[], float] = time.time,
+                 max_attempts: int = DEFAULT_MAX_ATTEMPTS):
+        """
+        Args:
+            path: SQLite 数据库文件路径（':memory:' 仅限单进程测试）
+            clock: 时间函数（测试可注入）
+            max_attempts: 新任务的最多尝试次数
+        """
+        self.path = path
+        self.clock = clock
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.row_factory = sqlite3.Row
+        if path != ':memory:':
+            self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.executescript(_SCHEMA)
+
+    def _write(self, sql: str, params=()) -> List[sqlite3.Row]:
+        """单条写语句（BEGIN IMMEDIATE 先拿写锁，避免多进程间读后写冲突），返回语句产出的行"""
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                cursor = self._conn.execute(sql, params)
+                rows = cursor.fetchall()
+                self._conn.execute('COMMIT')
+            except BaseException:
+                self._conn.execute('ROLLBACK')
+                raise
+        return rows
+
+    def enqueue(self, kind: str, payload: Dict, key: Optional[str] = None,
+                refresh_after: Optional[float] = None) -> bool:
+        """
+        入队（同类型同 key 的任务只有一个）
+
+        Args:
+            key: 去重键（默认取 payload 的哈希）
+            refresh_after: 已完成/失败超过这么多秒的同 key 任务重置为待领取；None 表示不重置
+
+        Returns:
+            是否新增或重置了任务
+        """
+        now = self.clock()
+        key = key or hashlib.sha1(json.dumps(payload, sort_keys=True).encode('utf-8')).hexdigest()
+        sql = """
+            INSERT INTO tasks (kind, task_key, payload, priority, max_attempts, available_at, created_at, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(kind, task_key) DO UPDATE SET
+                payload=excluded.payload, status='pending', attempts=0, available_at=excluded.available_at,
+                lease_owner=NULL, lease_expires=NULL, last_error=NULL, updated_at=excluded.updated_at
+            WHERE ? IS NOT NULL AND tasks.status IN ('done', 'failed') AND tasks.updated_at <= ?
+            RETURNING id
+        """
+        cutoff = now - (refresh_after or 0)
+        rows = self._write(sql, (kind, key, json.dumps(payload, ensure_ascii=False), KIND_PRIORITY.get(kind, 1),
+                                 self.max_attempts, now, now, now, refresh_after, cutoff))
+        return bool(rows)
+
+    def claim(self, worker_id: str, lease_seconds: float = DEFAULT_LEASE_SECONDS) -> Optional[Dict]:
+        """
+        领取一个任务：待领取且已到可执行时间的，或租约已过期（持有者大概率已崩溃）的
+
+        过期任务若已用完尝试次数，直接标记失败
+        """
+        now = self.clock()
+        self._write("""
+            UPDATE tasks SET status='failed', last_error='lease expired', lease_owner=NULL, updated_at=?
+            WHERE status='leased' AND lease_expires < ? AND attempts >= max_attempts
+        """, (now, now))
+        rows = self._write("""
+            UPDATE tasks SET status='leased', attempts=attempts + 1, lease_owner=?, lease_expires=?, updated_at=?
+            WHERE id = (
+                SELECT id FROM tasks
+                WHERE (status='pending' AND available_at <= ?) OR (status='leased' AND lease_expires < ?)
+                ORDER BY priority, available_at, id LIMIT 1
+            )
+            RETURNING id, kind, payload, attempts
+        """, (worker_id, now + lease_seconds, now, now, now))
+        if not rows:
+            return None
+        row = rows[0]
+        return {'id': row['id'], 'kind': row['kind'], 'payload': json.loads(row['payload']),
+                'attempts': row['attempts']}
+
+    def heartbeat(self, task_id: int, worker_id: str, lease_seconds: float = DEFAULT_LEASE_SECONDS) -> bool:
+        """续约；返回 False 表示租约已被他人接管，应放弃该任务"""
+        now = self.clock()
+        rows = self._write("""
+            UPDATE tasks SET lease_expires=?, updated_at=?
+            WHERE id=? AND status='leased' AND lease_owner=? RETURNING id
+        """, (now + lease_seconds, now, task_id, worker_id))
+        return bool(rows)
+
+    def complete(self, task_id: int, worker_id: str) -> bool:
+        rows = self._write("""
+            UPDATE tasks SET status='done', lease_owner=NULL, lease_expires=NULL, last_error=NULL, updated_at=?
+            WHERE id=? AND status='leased' AND lease_owner=? RETURNING id
+        """, (self.clock(), task_id, worker_id))
+        return bool(rows)
+
+    def fail(self, task_id: int, worker_id: str, error: str,
+             backoff: float = RETRY_BACKOFF_SECONDS) -> bool:
+        """标记失败：还有尝试次数则按 backoff × 2^(次数-1) 延后重试，否则标记为失败"""
+        now = self.clock()
+        rows = self._write("""
+            UPDATE tasks SET
+                status=CASE WHEN attempts >= max_attempts THEN 'failed' ELSE 'pending' END,
+                available_at=? + ? * (1 << (attempts - 1)),
+                lease_owner=NULL, lease_expires=NULL, last_error=?, updated_at=?
+            WHERE id=? AND status='leased' AND lease_owner=? RETURNING id
+        """, (now, backoff, error[:500], now, task_id, worker_id))
+        return bool(rows)
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """按任务类型、状态计数"""
+        with self._lock:
+            rows = self._conn.execute('SELECT kind, status, COUNT(*) AS n FROM tasks GROUP BY kind, status').fetchall()
+        stats: Dict[str, Dict[str, int]] = {}
+        for row in rows:
+            stats.setdefault(row['kind'], {})[row['status']] = row['n']
+        return stats
+
+    def unfinished(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM tasks WHERE status IN ('pending', 'leased')").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def seed(queue: LeaseQueue, jobs: List[Dict], max_results: int = 50) -> int:
+    """协调端：把关键词 / 频道任务写入队列（已完成的同名任务重置，开始新一轮抓取），返回入队数"""
+    added = 0
+    for job in jobs:
+        if job['type'] not in ('keyword', 'channel'):
+            continue
+        payload = {'value': job['value'], 'max_results': job.get('max_results', max_results)}
+        if job['type'] == 'keyword':
+            payload.update(language=job.get('language'), region=job.get('region'))
+        added += queue.enqueue(job['type'], payload, refresh_after=0)
+    return added
+
+
+class CrawlWorker:
+    """领取并执行任务的 worker（一个进程可以跑多个线程各自一个 worker）"""
+
+    def __init__(self, queue: LeaseQueue, analyzer: YouTubeAnalyzer, worker_id: Optional[str] = None,
+                 lease_seconds: float = DEFAULT_LEASE_SECONDS,
+                 details_refresh_after: float = DETAILS_REFRESH_AFTER):
+        self.queue = queue
+        self.analyzer = analyzer
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self.lease_seconds = lease_seconds
+        self.details_refresh_after = details_refresh_after
+        self.processed = {'done': 0, 'failed': 0, 'lost': 0}
+
+    def _enqueue_details(self, video_ids: List[str]):
+        for i in range(0, len(video_ids), DETAILS_BATCH):
+            batch = sorted(video_ids[i:i + DETAILS_BATCH])
+            self.queue.enqueue('details', {'ids': batch}, refresh_after=self.details_refresh_after)
+
+    def handle(self, task: Dict):
+        """执行一个任务；有API调用失败时抛出 CrawlTaskError 交给队列重试"""
+        analyzer = self.analyzer
+        analyzer.errors = []
+        payload = task['payload']
+        if task['kind'] == 'keyword':
+            ids = analyzer.search_videos(payload['value'], payload['max_results'],
+                                         language=payload.get('language'), region=payload.get('region'))
+            self._enqueue_details(ids)
+        elif task['kind'] == 'channel':
+            ids = analyzer.get_channel_videos(payload['value'], payload['max_results'])
+            self._enqueue_details(ids)
+        elif task['kind'] == 'details':
+            # 解析后的视频由分析器写入共用的本地索引
+            analyzer.get_video_details(payload['ids'])
+        else:
+            raise CrawlTaskError(f"未知任务类型: {task['kind']}")
+        if analyzer.errors:
+            raise CrawlTaskError(json.dumps(analyzer.errors[-1], ensure_ascii=False, default=str))
+
+    def run_once(self) -> bool:
+        """领取并执行一个任务；队列里暂时没有可领取的任务时返回 False"""
+        task = self.queue.claim(self.worker_id, self.lease_seconds)
+        if task is None:
+            return False
+
+        # 执行期间后台心跳续约
+        stop = threading.Event()
+        lost = threading.Event()
+
+        def beat():
+            while not stop.wait(self.lease_seconds / 3):
+                if not self.queue.heartbeat(task['id'], self.worker_id, self.lease_seconds):
+                    lost.set()
+                    return
+
+        beater = threading.Thread(target=beat, daemon=True)
+        beater.start()
+        try:
+            self.handle(task)
+        except Exception as e:
+            stop.set()
+            beater.join()
+            if self.queue.fail(task['id'], self.worker_id, str(e)):
+                self.processed['failed'] += 1
+            else:
+                self.processed['lost'] += 1
+            return True
+        stop.set()
+        beater.join()
+        if not lost.is_set() and self.queue.complete(task['id'], self.worker_id):
+            self.processed['done'] += 1
+        else:
+            self.processed['lost'] += 1
+        return True
+
+    def run(self, poll_interval: float = 5.0, exit_when_idle: bool = False,
+            stop: Optional[threading.Event] = None) -> Dict[str, int]:
+        """循环执行任务；exit_when_idle 时队列里没有未完成任务就退出"""
+        stop = stop or threading.Event()
+        while not stop.is_set():
+            if self.run_once():
+                continue
+            if exit_when_idle and self.queue.unfinished() == 0:
+                break
+            stop.wait(poll_interval)
+        return self.processed
+
+
+def _load_config(path: str) -> Dict:
+    if path and os.path.exists(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    return {}
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="并行抓取：共享任务队列的协调端与 worker")
+    parser.add_argument("--queue", default=DEFAULT_QUEUE_PATH, help="任务队列数据库")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("seed", help="写入关键词/频道任务（任务文件格式同 cli.py batch）")
+    p.add_argument("job_file")
+    p.add_argument("--max-results", type=int, default=50, help="每个任务最多发现的视频数")
+    p = sub.add_parser("worker", help="领取并执行任务")
+    p.add_argument("--index", default=DEFAULT_INDEX_PATH, help="共用的本地视频索引（结果写入这里）")
+    p.add_argument("--threads", type=int, default=1, help="本进程内的 worker 数")
+    p.add_argument("--lease", type=float, default=DEFAULT_LEASE_SECONDS, help="租约时长（秒）")
+    p.add_argument("--exit-when-idle", action="store_true", help="队列清空后退出")
+    p.add_argument("--config", default="config.json", help="配置文件（读取密钥）")
+    sub.add_parser("status", help="查看队列状态")
+    args = parser.parse_args(argv)
+
+    queue = LeaseQueue(args.queue)
+    if args.command == "seed":
+        added = seed(queue, load_jobs(args.job_file), max_results=args.max_results)
+        print(f"✅ 已入队 {added} 个任务")
+    elif args.command == "status":
+        print(json.dumps(queue.stats(), ensure_ascii=False, indent=2))
+    else:
+        key_pool = load_key_pool(_load_config(args.config))
+        if key_pool is None:
+            print("❌ 未找到API密钥：设置 YOUTUBE_API_KEY / YOUTUBE_API_KEYS 或 config.json", file=sys.stderr)
+            return 2
+        index = LocalIndex(args.index)
+        stop = threading.Event()
+        workers = [CrawlWorker(queue, YouTubeAnalyzer(None, key_pool=key_pool, local_index=index, quiet=True),
+                               lease_seconds=args.lease) for _ in range(max(1, args.threads))]
+        threads = [threading.Thread(target=w.run, kwargs={'exit_when_idle': args.exit_when_idle, 'stop': stop})
+                   for w in workers]
+        print(f"🚀 启动 {len(workers)} 个 worker（{workers[0].worker_id} ...）")
+        for t in threads:
+            t.start()
+        try:
+            for t in threads:
+                while t.is_alive():
+                    t.join(0.5)
+        except KeyboardInterrupt:
+            stop.set()
+            print("\n⏹️ 正在停止（未完成的任务租约到期后由其他 worker 接管）")
+            for t in threads:
+                t.join()
+        totals = {k: sum(w.processed[k] for w in workers) for k in ('done', 'failed', 'lost')}
+        print(f"✅ 完成 {totals['done']} 个任务，失败 {totals['failed']}，租约丢失 {totals['lost']}")
+        index.close()
+    queue.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
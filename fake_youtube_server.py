@@ -0,0 +1,302 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+本地模拟 YouTube Data API v3 服务器
+功能：实现分析器用到的接口子集（search / videos / channels / playlistItems / commentThreads），
+      以及 multipart/mixed 批量端点（/batch，一次往返执行多个子请求），
+      支持配置延迟、错误率、限流和配额耗尽，压测和联调时不消耗真实配额；
+      同时充当缩略图主机（/vi/<视频ID>/hqdefault.jpg，需要 Pillow）
+
+运行:
+    python fake_youtube_server.py --port 8765 --latency-ms 80 --error-rate 0.01
+分析器指向它:
+    YOUTUBE_API_ENDPOINT=http://127.0.0.1:8765 python web_app.py
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime
+from email.parser import BytesParser
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional, Tuple
+from urllib.parse import parse_qsl, urlsplit
+
+from key_pool import QUOTA_COSTS
+from youtube_stub import StubYouTube, index_for, synthetic_thumbnail
+
+API_PREFIX = '/youtube/v3/'
+BATCH_PATH = '/batch'
+THUMBNAIL_PREFIX = '/vi/'
+
+
+def _error_body(code: int, reason: str, message: str, domain: str = 'youtube.quota') -> Dict:
+    """Google API 标准错误结构"""
+    return {'error': {
+        'code': code,
+        'message': message,
+        'errors': [{'message': message, 'domain': domain, 'reason': reason}],
+    }}
+
+
+class FakeYouTubeServer:
+    """可编程的模拟API服务器"""
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0,
+                 corpus_size: int = 5000, seed: int = 0,
+                 latency_ms: float = 0.0, latency_jitter_ms: float = 0.0,
+                 error_rate: float = 0.0, rate_limit_rate: float = 0.0,
+                 quota_error_rate: float = 0.0, quota_per_key: Optional[int] = None,
+                 connect_latency_ms: float = 0.0):
+        """
+        Args:
+            corpus_size: 合成语料视频数
+            latency_ms: 每个请求的基础延迟（毫秒）
+            latency_jitter_ms: 延迟随机抖动上限（毫秒）
+            error_rate: 返回 500 backendError 的概率
+            rate_limit_rate: 返回 403 rateLimitExceeded 的概率
+            quota_error_rate: 返回 403 quotaExceeded 的概率
+            quota_per_key: 每个key的配额上限，超过后一律 quotaExceeded（None 表示不限）
+            connect_latency_ms: 每个新连接的额外延迟（毫秒，模拟TLS握手等建连开销）
+        """
+        self.stub = StubYouTube(corpus_size=corpus_size, seed=seed)
+        self.latency_ms = latency_ms
+        self.latency_jitter_ms = latency_jitter_ms
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.quota_error_rate = quota_error_rate
+        self.quota_per_key = quota_per_key
+        self.connect_latency_ms = connect_latency_ms
+        self.quota_used: Counter = Counter()
+        self.requests: Counter = Counter()
+        self.responses: Counter = Counter()
+        self.thumbnail_requests = 0
+        self.connections = 0  # 接受的TCP连接数（衡量客户端连接复用）
+        self.batch_requests = 0  # 批量端点的往返次数（子请求计入 requests）
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), _Handler)
+        self._httpd.daemon_threads = True
+        self._httpd.fake = self
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> 'FakeYouTubeServer':
+        """后台线程启动"""
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name='fake-youtube', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def serve_forever(self):
+        self._httpd.serve_forever()
+
+    def reset(self):
+        """清空配额与统计（模拟每日配额重置）"""
+        with self._lock:
+            self.quota_used.clear()
+            self.requests.clear()
+            self.responses.clear()
+            self.thumbnail_requests = 0
+            self.connections = 0
+            self.batch_requests = 0
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'requests': dict(self.requests),
+                'responses': {str(k): v for k, v in self.responses.items()},
+                'quota_used': dict(self.quota_used),
+                'thumbnail_requests': self.thumbnail_requests,
+                'connections': self.connections,
+                'batch_requests': self.batch_requests,
+            }
+
+    def _roll(self) -> float:
+        with self._lock:
+            return self._rng.random()
+
+    def _sleep_latency(self):
+        delay = self.latency_ms + (self._roll() * self.latency_jitter_ms if self.latency_jitter_ms else 0)
+        if delay > 0:
+            time.sleep(delay / 1000)
+
+    def handle(self, method: str, params: Dict, delay: bool = True) -> Tuple[int, Dict]:
+        """处理一次API调用，返回 (状态码, 响应体)；delay=False 时不单独计延迟（批量子请求共用一次）"""
+        key = params.get('key', '')
+        cost = QUOTA_COSTS.get(method)
+        if cost is None:
+            return 404, _error_body(404, 'notFound', f"Unknown method {method}", domain='global')
+
+        if delay:
+            self._sleep_latency()
+
+        with self._lock:
+            self.requests[method] += 1
+            over_quota = self.quota_per_key is not None and self.quota_used[key] + cost > self.quota_per_key
+            if not over_quota:
+                self.quota_used[key] += cost
+
+        roll = self._roll()
+        if over_quota or roll < self.quota_error_rate:
+            return 403, _error_body(403, 'quotaExceeded',
+                                    'The request cannot be completed because you have exceeded your quota.')
+        roll -= self.quota_error_rate
+        if roll < self.rate_limit_rate:
+            return 403, _error_body(403, 'rateLimitExceeded', 'Rate limit exceeded.', domain='usageLimits')
+        roll -= self.rate_limit_rate
+        if roll < self.error_rate:
+            return 500, _error_body(500, 'backendError', 'Backend Error', domain='global')
+
+        query = {k: v for k, v in params.items() if k not in ('key', 'alt')}
+        return 200, self.stub.respond(method, query)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # 响应头和响应体分两次写出，不关 Nagle 时长连接上的每个响应都会多等一次延迟确认（约40ms）
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        fake = self.server.fake
+        with fake._lock:
+            fake.connections += 1
+        if fake.connect_latency_ms:
+            time.sleep(fake.connect_latency_ms / 1000)
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status: int, body: Dict):
+        data = json.dumps(body, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=UTF-8')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_thumbnail(self, fake: 'FakeYouTubeServer', path: str):
+        index = index_for(path[len(THUMBNAIL_PREFIX):].split('/')[0])
+        if index is None or index >= fake.stub.corpus_size:
+            return self._send_json(404, _error_body(404, 'notFound', 'Not Found', domain='global'))
+        with fake._lock:
+            fake.thumbnail_requests += 1
+        data = synthetic_thumbnail(index, fake.stub.seed)
+        self.send_response(200)
+        self.send_header('Content-Type', 'image/jpeg')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        fake: FakeYouTubeServer = self.server.fake
+        parts = urlsplit(self.path)
+        params = dict(parse_qsl(parts.query, keep_blank_values=True))
+        if parts.path == '/_stats':
+            return self._send_json(200, fake.stats())
+        if parts.path == '/_reset':
+            fake.reset()
+            return self._send_json(200, {'status': 'ok', 'reset_at': datetime.now().isoformat()})
+        if parts.path.startswith(THUMBNAIL_PREFIX):
+            return self._send_thumbnail(fake, parts.path)
+        if parts.path.startswith(API_PREFIX):
+            method = parts.path[len(API_PREFIX):].strip('/') + '.list'
+            status, body = fake.handle(method, params)
+            with fake._lock:
+                fake.responses[status] += 1
+            return self._send_json(status, body)
+        return self._send_json(404, _error_body(404, 'notFound', 'Not Found', domain='global'))
+
+    def do_POST(self):
+        """批量端点：multipart/mixed 请求体里每个 application/http 部分是一个子请求，按同样格式逐个回应"""
+        fake: FakeYouTubeServer = self.server.fake
+        body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        if urlsplit(self.path).path.rstrip('/') != BATCH_PATH:
+            return self._send_json(404, _error_body(404, 'notFound', 'Not Found', domain='global'))
+        message = BytesParser().parsebytes(
+            f"Content-Type: {self.headers.get('Content-Type', '')}\r\n\r\n".encode('utf-8') + body)
+        if not message.is_multipart():
+            return self._send_json(400, _error_body(400, 'badRequest', 'Expected multipart/mixed', domain='global'))
+        with fake._lock:
+            fake.batch_requests += 1
+        # 一次往返只计一次延迟
+        fake._sleep_latency()
+
+        boundary = f"batch_{uuid.uuid4().hex}"
+        chunks = []
+        for part in message.get_payload():
+            request_line = part.get_payload().split('\n', 1)[0].strip()
+            target = urlsplit(request_line.split(' ')[1])
+            params = dict(parse_qsl(target.query, keep_blank_values=True))
+            if target.path.startswith(API_PREFIX):
+                method = target.path[len(API_PREFIX):].strip('/') + '.list'
+                status, payload = fake.handle(method, params, delay=False)
+            else:
+                status, payload = 404, _error_body(404, 'notFound', 'Not Found', domain='global')
+            with fake._lock:
+                fake.responses[status] += 1
+            content_id = (part['Content-ID'] or '<>').strip()
+            chunks.append(
+                f"--{boundary}\r\nContent-Type: application/http\r\n"
+                f"Content-ID: <response-{content_id[1:-1]}>\r\n\r\n"
+                f"HTTP/1.1 {status} {HTTPStatus(status).phrase}\r\n"
+                f"Content-Type: application/json; charset=UTF-8\r\n\r\n"
+                f"{json.dumps(payload, ensure_ascii=False)}\r\n")
+        data = (''.join(chunks) + f"--{boundary}--\r\n").encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', f'multipart/mixed; boundary={boundary}')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本地模拟 YouTube Data API v3 服务器")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--corpus-size", type=int, default=5000, help="合成语料视频数")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="基础延迟（毫秒）")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="延迟随机抖动（毫秒）")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="500 错误概率")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="rateLimitExceeded 概率")
+    parser.add_argument("--quota-error-rate", type=float, default=0.0, help="quotaExceeded 概率")
+    parser.add_argument("--quota-per-key", type=int, default=None, help="每个key的配额上限")
+    parser.add_argument("--connect-latency-ms", type=float, default=0.0, help="每个新连接的额外延迟（毫秒）")
+    args = parser.parse_args()
+
+    server = FakeYouTubeServer(
+        host=args.host, port=args.port, corpus_size=args.corpus_size,
+        latency_ms=args.latency_ms, latency_jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate, rate_limit_rate=args.rate_limit_rate,
+        quota_error_rate=args.quota_error_rate, quota_per_key=args.quota_per_key,
+        connect_latency_ms=args.connect_latency_ms
+    )
+    print(f"🧪 模拟 YouTube API 已启动: {server.url}")
+    print(f"   设置 YOUTUBE_API_ENDPOINT={server.url} 让分析器连接到这里")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
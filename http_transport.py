@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+连接池 HTTP 传输层
+功能：googleapiclient 默认的 httplib2 传输在大量短小的 videos.list / playlistItems.list 调用之间
+      连接复用差，每个新连接都要重新握手。这里在 urllib3 连接池上实现 httplib2 兼容的 request() 接口，
+      通过 build(..., http=...) 注入，多线程共用一个池（长连接），支持池大小、连接/读取/总超时，
+      并统计新建连接数、复用率与每次调用的耗时
+"""
+
+import threading
+import time
+from collections import Counter, deque
+from typing import Dict, Optional, Tuple
+
+import httplib2
+import urllib3
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+# 每个主机的连接池大小（并发线程数超过它时，多出的连接用完即关，不放回池）
+DEFAULT_POOL_MAXSIZE = 16
+DEFAULT_NUM_POOLS = 8
+DEFAULT_CONNECT_TIMEOUT = 5.0
+DEFAULT_READ_TIMEOUT = 30.0
+# 统计分位数时保留的最近调用耗时条数
+LATENCY_WINDOW = 2048
+
+
+def _counting_pool(base, transport: 'PooledTransport'):
+    """新建连接时计数的连接池类"""
+    class CountingPool(base):
+        def _new_conn(self):
+            transport._count('connections_opened')
+            return super()._new_conn()
+    return CountingPool
+
+
+class PooledTransport:
+    """
+    httplib2.Http 兼容的 urllib3 长连接传输（线程安全）
+
+    用法:
+        transport = PooledTransport(maxsize=16, read_timeout=10)
+        YouTubeAnalyzer(api_key, transport=transport)
+        transport.stats()  # requests / connections_opened / reuse_ratio / p50_ms ...
+    """
+
+    def __init__(self, maxsize: int = DEFAULT_POOL_MAXSIZE, num_pools: int = DEFAULT_NUM_POOLS,
+                 connect_timeout: float = DEFAULT_CONNECT_TIMEOUT, read_timeout: float = DEFAULT_READ_TIMEOUT,
+                 total_timeout: Optional[float] = None, block: bool = False):
+        """
+        Args:
+            maxsize: 每个主机保留的长连接数
+            num_pools: 最多缓存的主机连接池数
+            connect_timeout: 建立连接超时（秒）
+            read_timeout: 读取超时（秒，两次收到数据之间的最长间隔）
+            total_timeout: 单次调用总超时（秒），None 不限
+            block: 连接都在用时是否等待空闲连接（False 则临时新建，用完关闭）
+        """
+        self.maxsize = maxsize
+        self.timeout = urllib3.Timeout(connect=connect_timeout, read=read_timeout, total=total_timeout)
+        # 重试与重定向交给 resilience.call_with_retry，这里不重复重试
+        self.pool = urllib3.PoolManager(num_pools=num_pools, maxsize=maxsize, block=block,
+                                        timeout=self.timeout, retries=False)
+        self.pool.pool_classes_by_scheme = {
+            'http': _counting_pool(HTTPConnectionPool, self),
+            'https': _counting_pool(HTTPSConnectionPool, self),
+        }
+        self.counters: Counter = Counter()
+        self._latencies = deque(maxlen=LATENCY_WINDOW)
+        self._lock = threading.Lock()
+
+    def _count(self, name: str, amount: int = 1):
+        with self._lock:
+            self.counters[name] += amount
+
+    def request(self, uri: str, method: str = 'GET', body=None, headers: Optional[Dict] = None,
+                redirections: int = 5, connection_type=None) -> Tuple[httplib2.Response, bytes]:
+        """与 httplib2.Http.request 相同的签名与返回值 (response, content)"""
+        started = time.perf_counter()
+        try:
+            r = self.pool.request(method, uri, body=body, headers=headers)
+        except urllib3.exceptions.TimeoutError as e:
+            self._count('errors')
+            raise TimeoutError(str(e)) from e
+        except urllib3.exceptions.HTTPError as e:
+            self._count('errors')
+            raise ConnectionError(str(e)) from e
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self.counters['requests'] += 1
+            self.counters['bytes'] += len(r.data)
+            self._latencies.append(elapsed)
+        info = {name.lower(): value for name, value in r.headers.items()}
+        if 'content-encoding' in info:
+            # 内容已由 urllib3 解压，和 httplib2 一样改名，避免上层再解压一次
+            info['-content-encoding'] = info.pop('content-encoding')
+        info['status'] = str(r.status)
+        response = httplib2.Response(info)
+        response.reason = r.reason
+        return response, r.data
+
+    def stats(self) -> Dict:
+        """连接复用与调用耗时统计"""
+        with self._lock:
+            counters = dict(self.counters)
+            latencies = sorted(self._latencies)
+        requests = counters.get('requests', 0)
+        opened = counters.get('connections_opened', 0)
+
+        def percentile(p: float) -> Optional[float]:
+            if not latencies:
+                return None
+            return round(latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000, 2)
+
+        return {
+            'requests': requests,
+            'errors': counters.get('errors', 0),
+            'connections_opened': opened,
+            'connections_reused': max(0, requests - opened),
+            'reuse_ratio': round(max(0, requests - opened) / requests, 3) if requests else 0.0,
+            'bytes': counters.get('bytes', 0),
+            'p50_ms': percentile(0.5),
+            'p95_ms': percentile(0.95),
+            'pool_maxsize': self.maxsize,
+        }
+
+    def close(self):
+        """关闭所有长连接（之后的调用会重新建立连接）"""
+        self.pool.clear()
+
+
+def transport_from_config(config: Dict, maxsize: Optional[int] = None) -> Optional[PooledTransport]:
+    """
+    按 config.json 构建连接池传输：http_pool_maxsize（0 表示用默认的 httplib2）、
+    http_connect_timeout / http_read_timeout / http_total_timeout；maxsize 参数优先于配置
+    """
+    if maxsize is None:
+        maxsize = config.get('http_pool_maxsize', DEFAULT_POOL_MAXSIZE)
+    if not maxsize:
+        return None
+    return PooledTransport(maxsize=maxsize,
+                           connect_timeout=config.get('http_connect_timeout', DEFAULT_CONNECT_TIMEOUT),
+                           read_timeout=config.get('http_read_timeout', DEFAULT_READ_TIMEOUT),
+                           total_timeout=config.get('http_total_timeout'))
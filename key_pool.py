@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+多API密钥轮换池
+功能：从配置或环境变量加载多个密钥，按密钥记录已用配额与近期错误，
+      每次调用路由到最健康的密钥；选中时先预留本次调用的配额（并发调用不会同时挤进快用完的密钥），
+      调用结束后按实际结果结算；配额耗尽的密钥剔除到配额重置时间，并可输出每个密钥的用量
+"""
+
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+from resilience import CIRCUIT_OPEN, QUOTA, RATE_LIMIT, ApiCallError, next_quota_reset
+
+DEFAULT_DAILY_QUOTA = 10000
+
+# 各接口配额消耗（YouTube Data API v3 官方单位）
+QUOTA_COSTS = {
+    'search.list': 100,
+    'videos.list': 1,
+    'channels.list': 1,
+    'playlistItems.list': 1,
+    'commentThreads.list': 1,
+}
+
+# 限流后的冷却时间（秒）与"近期错误"统计窗口（秒）
+RATE_LIMIT_COOLDOWN = 10.0
+ERROR_WINDOW = 300.0
+
+
+def quota_cost(method: str) -> int:
+    """接口的配额消耗，未知接口按1计"""
+    return QUOTA_COSTS.get(method, 1)
+
+
+def mask_key(key: str) -> str:
+    """脱敏显示密钥"""
+    if len(key) <= 8:
+        return '*' * len(key)
+    return f"{key[:4]}...{key[-4:]}"
+
+
+class KeyState:
+    """单个密钥的状态"""
+
+    def __init__(self, key: str, daily_quota: int):
+        self.key = key
+        self.daily_quota = daily_quota
+        self.used = 0
+        self.reserved = 0  # 已选中、还没结算的调用预留的配额
+        self.calls = 0
+        self.failures = 0
+        self.recent_errors = deque()
+        self.evicted_until: Optional[datetime] = None
+        self.last_error: Optional[str] = None
+        self.reset_at = next_quota_reset()
+
+    @property
+    def remaining(self) -> int:
+        return max(0, self.daily_quota - self.used - self.reserved)
+
+    def error_count(self, now: float) -> int:
+        while self.recent_errors and now - self.recent_errors[0] > ERROR_WINDOW:
+            self.recent_errors.popleft()
+        return len(self.recent_errors)
+
+    def to_dict(self, now: float) -> Dict:
+        return {
+            'key': mask_key(self.key),
+            'used': self.used,
+            'reserved': self.reserved,
+            'remaining': self.remaining,
+            'daily_quota': self.daily_quota,
+            'calls': self.calls,
+            'failures': self.failures,
+            'recent_errors': self.error_count(now),
+            'evicted_until': self.evicted_until.isoformat() if self.evicted_until else None,
+            'last_error': self.last_error,
+            'reset_at': self.reset_at.isoformat(),
+        }
+
+
+class ApiKeyPool:
+    """线程安全的密钥池"""
+
+    def __init__(self, keys: List[str], daily_quota: int = DEFAULT_DAILY_QUOTA):
+        """
+        Args:
+            keys: 密钥列表（自动去重、去空）
+            daily_quota: 每个密钥的每日配额
+        """
+        unique = list(dict.fromkeys(k.strip() for k in keys if k and k.strip()))
+        if not unique:
+            raise ValueError("密钥池至少需要一个API密钥")
+        self.states: Dict[str, KeyState] = {k: KeyState(k, daily_quota) for k in unique}
+        self._lock = threading.Lock()
+
+    @property
+    def keys(self) -> List[str]:
+        return list(self.states)
+
+    def __len__(self) -> int:
+        return len(self.states)
+
+    def _refresh(self, state: KeyState, now_dt: datetime):
+        """过了配额重置时间就清零；剔除期满则恢复"""
+        if now_dt >= state.reset_at:
+            state.used = 0
+            state.reset_at = next_quota_reset(now_dt)
+        if state.evicted_until and now_dt >= state.evicted_until:
+            state.evicted_until = None
+
+    def acquire(self, cost: int = 1) -> str:
+        """
+        选出最健康的密钥：未被剔除、剩余配额够用，近期错误最少，剩余配额最多；
+        在锁内预留 cost，调用方随后必须用 record_success / record_failure / release 结算
+
+        Raises:
+            ApiCallError: 所有密钥都不可用（kind=quota，retry_at 为最早恢复时间）
+        """
+        now = time.time()
+        now_dt = datetime.now(timezone.utc)
+        with self._lock:
+            candidates = []
+            for state in self.states.values():
+                self._refresh(state, now_dt)
+                if state.evicted_until is None and state.remaining >= cost:
+                    candidates.append(state)
+            if not candidates:
+                waits = [s.evicted_until or s.reset_at for s in self.states.values()]
+                raise ApiCallError(QUOTA, f"密钥池中 {len(self.states)} 个密钥均无可用配额",
+                                   reason='keyPoolExhausted', retry_at=min(waits))
+            best = min(candidates, key=lambda s: (s.error_count(now), -s.remaining))
+            best.reserved += cost
+            return best.key
+
+    def release(self, key: str, cost: int):
+        """归还预留但没有发出的调用的配额"""
+        with self._lock:
+            state = self.states[key]
+            state.reserved = max(0, state.reserved - cost)
+
+    def record_success(self, key: str, cost: int):
+        """结算成功的调用：预留转为已用"""
+        with self._lock:
+            state = self.states[key]
+            state.reserved = max(0, state.reserved - cost)
+            state.used += cost
+            state.calls += 1
+
+    def record_failure(self, key: str, error: ApiCallError, cost: int = 1):
+        """
+        结算失败的调用：发出去的调用按 cost 计入已用，熔断拦下的不计（预留全部归还）；
+        配额错误剔除到重置时间，限流短暂冷却，其余计入近期错误
+        """
+        now_dt = datetime.now(timezone.utc)
+        with self._lock:
+            state = self.states[key]
+            state.reserved = max(0, state.reserved - cost)
+            state.failures += 1
+            state.last_error = f"{error.kind}: {error}"
+            if error.kind != CIRCUIT_OPEN:
+                state.calls += 1
+                state.used += cost
+            state.recent_errors.append(time.time())
+            if error.kind == QUOTA:
+                state.used = max(state.used, state.daily_quota)
+                state.evicted_until = error.retry_at or state.reset_at
+            elif error.kind == CIRCUIT_OPEN and error.retry_at:
+                state.evicted_until = error.retry_at
+            elif error.kind == RATE_LIMIT:
+                state.evicted_until = now_dt + timedelta(seconds=RATE_LIMIT_COOLDOWN)
+
+    def usage(self) -> List[Dict]:
+        """每个密钥的用量报告（密钥已脱敏）"""
+        now = time.time()
+        now_dt = datetime.now(timezone.utc)
+        with self._lock:
+            for state in self.states.values():
+                self._refresh(state, now_dt)
+            return [s.to_dict(now) for s in self.states.values()]
+
+
+def load_keys(config: Optional[Dict] = None) -> List[str]:
+    """
+    读取密钥列表，优先级：
+    环境变量 YOUTUBE_API_KEYS（逗号分隔） > config.json 的 youtube_api_keys 列表
+    > 环境变量 YOUTUBE_API_KEY > config.json 的 youtube_api_key
+    """
+    config = config or {}
+    env_keys = os.getenv('YOUTUBE_API_KEYS')
+    if env_keys:
+        return [k.strip() for k in env_keys.split(',') if k.strip()]
+    if config.get('youtube_api_keys'):
+        return [k for k in config['youtube_api_keys'] if k]
+    single = os.getenv('YOUTUBE_API_KEY') or config.get('youtube_api_key')
+    return [single] if single else []
+
+
+def load_key_pool(config: Optional[Dict] = None) -> Optional[ApiKeyPool]:
+    """按配置构建密钥池，没有任何密钥时返回 None"""
+    keys = load_keys(config)
+    if not keys:
+        return None
+    daily_quota = int((config or {}).get('daily_quota_per_key', DEFAULT_DAILY_QUOTA))
+    return ApiKeyPool(keys, daily_quota=daily_quota)
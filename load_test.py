@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+web_app 端到端压测
+功能：启动本地模拟API服务器（fake_youtube_server），按不同 gunicorn worker 配置启动 web_app
+      （以及按进程数启动 uvicorn 上的 asgi_app），以目标RPS开环压测 /api/analyze，
+      报告 p50/p95/p99 延迟、吞吐、错误率，以及结果缓存命中率和每请求消耗的API配额
+      （默认的5个关键词很快全部进缓存；--unique-queries / --refresh 才测到真正调用API的路径）
+
+运行:
+    python load_test.py --rps 20 --duration 15 --configs 1x1,2x1,4x1,2x4
+    python load_test.py --rps 20 --duration 15 --configs 2x4 --unique-queries    # 每个请求都是新查询
+    python load_test.py --rps 200 --latency-ms 500 --max-inflight 2000 --configs 2x32 --asgi-configs 2
+    python load_test.py --target http://127.0.0.1:5000 --rps 10    # 压测已运行的服务
+"""
+
+import argparse
+import json
+import math
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlencode
+
+from fake_youtube_server import FakeYouTubeServer
+
+DEFAULT_KEYWORDS = ["life hacks", "cooking tips", "DIY crafts", "quick recipes", "home workout"]
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """最近秩百分位（输入需已排序）"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _request(url: str, timeout: float, headers: Optional[Dict] = None) -> Tuple[Optional[int], Optional[str], bytes]:
+    """返回 (状态码, 连接错误类型, 响应体)"""
+    try:
+        with urllib.request.urlopen(urllib.request.Request(url, headers=headers or {}), timeout=timeout) as resp:
+            return resp.status, None, resp.read()
+    except urllib.error.HTTPError as e:
+        return e.code, None, b''
+    except Exception as e:
+        return None, type(e).__name__, b''
+
+
+def run_load(base_url: str, rps: float, duration: float, max_results: int = 30,
+             keywords: Optional[List[str]] = None, timeout: float = 60.0,
+             max_inflight: int = 256, extra_params: Optional[Dict] = None, clients: int = 1000,
+             unique_queries: bool = False, refresh: bool = False) -> Dict:
+    """
+    开环压测：按计划时间发请求，延迟从计划时间算起（避免协同遗漏）。
+    请求轮流带上 clients 个不同的 X-Forwarded-For，模拟多个客户端（服务端要把压测机当作受信任代理，
+    start_gunicorn / start_uvicorn 已设置 TRUSTED_PROXIES；否则全部算作一个客户端被限流）
+
+    Args:
+        unique_queries: 每个请求的关键词都加上本轮唯一的后缀，结果缓存和搜索缓存都不会命中
+        refresh: 请求带 refresh=1，跳过服务端的结果缓存与搜索缓存
+
+    Returns:
+        统计字典: 请求数、成功数、错误分布、吞吐、p50/p95/p99（毫秒）、结果缓存命中率、每请求平均配额
+    """
+    keywords = keywords or DEFAULT_KEYWORDS
+    total = max(1, int(rps * duration))
+    run_id = os.urandom(3).hex()
+    latencies: List[float] = []
+    statuses: Dict[str, int] = {}
+    served = {'cached': 0, 'quota': 0}
+    lock = threading.Lock()
+
+    def one(i: int, scheduled: float):
+        keyword = keywords[i % len(keywords)]
+        if unique_queries:
+            keyword = f"{keyword} {run_id}{i}"
+        params = {'input_type': 'keyword', 'value': keyword, 'max_results': max_results}
+        if refresh:
+            params['refresh'] = 1
+        params.update(extra_params or {})
+        client = i % max(1, clients)
+        status, error, body = _request(f"{base_url}/api/analyze?{urlencode(params)}", timeout,
+                                       {'X-Forwarded-For': f"10.{client >> 16 & 255}.{client >> 8 & 255}.{client & 255}"})
+        elapsed = (time.perf_counter() - scheduled) * 1000
+        result = json.loads(body) if status == 200 else {}
+        with lock:
+            key = str(status) if status is not None else error
+            statuses[key] = statuses.get(key, 0) + 1
+            if status == 200:
+                latencies.append(elapsed)
+                served['cached'] += bool(result.get('cached'))
+                served['quota'] += result.get('quota', {}).get('spent', 0)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max_inflight) as pool:
+        for i in range(total):
+            scheduled = start + i / rps
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            pool.submit(one, i, scheduled)
+    wall = time.perf_counter() - start
+
+    latencies.sort()
+    ok = len(latencies)
+    return {
+        'requests': total,
+        'ok': ok,
+        'error_rate': round(1 - ok / total, 4),
+        'statuses': statuses,
+        'throughput_rps': round(ok / wall, 2),
+        'p50_ms': round(percentile(latencies, 50), 1),
+        'p95_ms': round(percentile(latencies, 95), 1),
+        'p99_ms': round(percentile(latencies, 99), 1),
+        'cache_hit_rate': round(served['cached'] / ok, 3) if ok else 0.0,
+        'quota_per_request': round(served['quota'] / ok, 1) if ok else 0.0,
+    }
+
+
+def _wait_healthy(base_url: str, timeout: float = 30.0) -> bool:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        status, _, _ = _request(f"{base_url}/health", 2)
+        if status == 200:
+            return True
+        time.sleep(0.2)
+    return False
+
+
+def start_gunicorn(workers: int, threads: int, api_endpoint: str,
+                   app: str = 'web_app:app', worker_class: Optional[str] = None) -> Tuple[subprocess.Popen, str]:
+    """按指定worker配置启动 gunicorn，返回 (进程, 基础URL)"""
+    port = _free_port()
+    cmd = [sys.executable, '-m', 'gunicorn', '-w', str(workers), '--threads', str(threads),
+           '-b', f'127.0.0.1:{port}', '--timeout', '120']
+    if worker_class:
+        cmd += ['-k', worker_class]
+    cmd.append(app)
+    return _start_server(cmd, api_endpoint), f"http://127.0.0.1:{port}"
+
+
+def start_uvicorn(workers: int, api_endpoint: str, app: str = 'asgi_app:app') -> Tuple[subprocess.Popen, str]:
+    """用 uvicorn 按指定进程数启动 ASGI 入口，返回 (进程, 基础URL)"""
+    port = _free_port()
+    cmd = [sys.executable, '-m', 'uvicorn', '--workers', str(workers), '--host', '127.0.0.1',
+           '--port', str(port), '--no-access-log', app]
+    return _start_server(cmd, api_endpoint), f"http://127.0.0.1:{port}"
+
+
+def _start_server(cmd: List[str], api_endpoint: str) -> subprocess.Popen:
+    # 压测客户端在本机，把它当作受信任代理，轮换的 X-Forwarded-For 才会被当作不同客户端
+    env = dict(os.environ, YOUTUBE_API_ENDPOINT=api_endpoint, TRUSTED_PROXIES='127.0.0.1',
+               YOUTUBE_API_KEY=os.getenv('LOAD_TEST_API_KEY', 'load-test-key'))
+    return subprocess.Popen(cmd, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                            cwd=os.path.dirname(os.path.abspath(__file__)))
+
+
+def _parse_configs(text: str) -> List[Tuple[int, int]]:
+    configs = []
+    for part in text.split(','):
+        part = part.strip()
+        if not part:
+            continue
+        workers, _, threads = part.partition('x')
+        configs.append((int(workers), int(threads or 1)))
+    return configs
+
+
+def _print_row(name: str, r: Dict):
+    print(f"{name:<14}{r['requests']:>8}{r['throughput_rps']:>10}{r['p50_ms']:>10}"
+          f"{r['p95_ms']:>10}{r['p99_ms']:>10}{r['error_rate']:>10.2%}{r['cache_hit_rate']:>10.1%}"
+          f"{r['quota_per_request']:>10}  {r['statuses']}", flush=True)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="web_app /api/analyze 端到端压测")
+    parser.add_argument("--target", help="直接压测已运行的服务（不启动 gunicorn）")
+    parser.add_argument("--configs", default="1x1,2x1,4x1,2x4", help="gunicorn 配置列表: 进程数x线程数")
+    parser.add_argument("--worker-class", help="gunicorn worker 类型（如 gthread）")
+    parser.add_argument("--asgi-configs", default="", help="asgi_app 的 uvicorn 进程数列表（如 1,2），需要 uvicorn")
+    parser.add_argument("--rps", type=float, default=10.0, help="目标每秒请求数")
+    parser.add_argument("--duration", type=float, default=10.0, help="每轮压测秒数")
+    parser.add_argument("--max-results", type=int, default=30, help="每个请求的 max_results")
+    parser.add_argument("--timeout", type=float, default=60.0, help="单请求超时（秒）")
+    parser.add_argument("--max-inflight", type=int, default=256, help="压测客户端最多同时在途的请求数")
+    parser.add_argument("--clients", type=int, default=1000, help="模拟的客户端数（X-Forwarded-For 轮换）")
+    parser.add_argument("--unique-queries", action="store_true",
+                        help="每个请求用不同的关键词（不命中任何缓存，测真正调用API的路径）")
+    parser.add_argument("--refresh", action="store_true", help="请求带 refresh=1，跳过服务端缓存")
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="模拟API基础延迟")
+    parser.add_argument("--jitter-ms", type=float, default=30.0, help="模拟API延迟抖动")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="模拟API 500 概率")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="模拟API 限流概率")
+    parser.add_argument("--quota-error-rate", type=float, default=0.0, help="模拟API 配额错误概率")
+    parser.add_argument("--json", help="把结果另存为JSON")
+    args = parser.parse_args(argv)
+
+    print(f"{'配置':<14}{'请求数':>8}{'吞吐':>10}{'p50ms':>10}{'p95ms':>10}{'p99ms':>10}{'错误率':>10}"
+          f"{'缓存命中':>10}{'配额/请求':>10}")
+    print('-' * 100)
+    load_options = dict(timeout=args.timeout, max_inflight=args.max_inflight, clients=args.clients,
+                        unique_queries=args.unique_queries, refresh=args.refresh)
+    report = {}
+    if args.target:
+        r = run_load(args.target.rstrip('/'), args.rps, args.duration, args.max_results, **load_options)
+        _print_row('target', r)
+        report['target'] = r
+    else:
+        fake = FakeYouTubeServer(
+            latency_ms=args.latency_ms, latency_jitter_ms=args.jitter_ms,
+            error_rate=args.error_rate, rate_limit_rate=args.rate_limit_rate,
+            quota_error_rate=args.quota_error_rate
+        ).start()
+        try:
+            servers = [(f"{workers}x{threads}", 'gunicorn',
+                        lambda w=workers, t=threads: start_gunicorn(w, t, fake.url, worker_class=args.worker_class))
+                       for workers, threads in _parse_configs(args.configs)]
+            servers += [(f"asgi {workers}", 'uvicorn', lambda w=workers: start_uvicorn(w, fake.url))
+                        for workers in (int(p) for p in args.asgi_configs.split(',') if p.strip())]
+            for name, server, start in servers:
+                proc, base_url = start()
+                try:
+                    if not _wait_healthy(base_url):
+                        print(f"{name:<14}❌ {server} 启动失败")
+                        continue
+                    run_load(base_url, min(args.rps, 5), 1, args.max_results, timeout=args.timeout)  # 预热
+                    r = run_load(base_url, args.rps, args.duration, args.max_results, **load_options)
+                    _print_row(name, r)
+                    report[name] = r
+                finally:
+                    proc.terminate()
+                    proc.wait(timeout=30)
+            report['fake_api'] = fake.stats()
+        finally:
+            fake.stop()
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
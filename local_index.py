@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+本地视频全文索引
+功能：把每次解析过的视频写入本地 SQLite（FTS5 全文索引：标题、频道、简介、爆红原因；
+      播放量、互动率、发布日期、时长建二级索引），之后的查询直接在本地完成，不消耗API配额
+"""
+
+import json
+import re
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+DEFAULT_INDEX_PATH = 'video_index.db'
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS videos (
+    rowid INTEGER PRIMARY KEY,
+    video_id TEXT NOT NULL UNIQUE,
+    title TEXT,
+    channel_title TEXT,
+    description TEXT,
+    hot_reasons TEXT,
+    published_at TEXT,
+    duration_seconds INTEGER,
+    view_count INTEGER,
+    engagement_rate REAL,
+    heat_score REAL,
+    indexed_at TEXT,
+    data TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_videos_views ON videos(view_count);
+CREATE INDEX IF NOT EXISTS idx_videos_engagement ON videos(engagement_rate);
+CREATE INDEX IF NOT EXISTS idx_videos_published ON videos(published_at);
+CREATE INDEX IF NOT EXISTS idx_videos_duration ON videos(duration_seconds);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS videos_fts USING fts5(
+    title, channel_title, description, hot_reasons,
+    content='videos', content_rowid='rowid', tokenize='unicode61'
+);
+CREATE TRIGGER IF NOT EXISTS videos_ai AFTER INSERT ON videos BEGIN
+    INSERT INTO videos_fts(rowid, title, channel_title, description, hot_reasons)
+    VALUES (new.rowid, new.title, new.channel_title, new.description, new.hot_reasons);
+END;
+CREATE TRIGGER IF NOT EXISTS videos_ad AFTER DELETE ON videos BEGIN
+    INSERT INTO videos_fts(videos_fts, rowid, title, channel_title, description, hot_reasons)
+    VALUES ('delete', old.rowid, old.title, old.channel_title, old.description, old.hot_reasons);
+END;
+CREATE TRIGGER IF NOT EXISTS videos_au AFTER UPDATE ON videos BEGIN
+    INSERT INTO videos_fts(videos_fts, rowid, title, channel_title, description, hot_reasons)
+    VALUES ('delete', old.rowid, old.title, old.channel_title, old.description, old.hot_reasons);
+    INSERT INTO videos_fts(rowid, title, channel_title, description, hot_reasons)
+    VALUES (new.rowid, new.title, new.channel_title, new.description, new.hot_reasons);
+END;
+"""
+
+_UPSERT = """
+INSERT INTO videos (video_id, title, channel_title, description, hot_reasons, published_at,
+                    duration_seconds, view_count, engagement_rate, heat_score, indexed_at, data)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT(video_id) DO UPDATE SET
+    title=excluded.title, channel_title=excluded.channel_title, description=excluded.description,
+    hot_reasons=excluded.hot_reasons, published_at=excluded.published_at,
+    duration_seconds=excluded.duration_seconds, view_count=excluded.view_count,
+    engagement_rate=excluded.engagement_rate, heat_score=excluded.heat_score,
+    indexed_at=excluded.indexed_at, data=excluded.data
+"""
+
+# 允许的排序列（防止拼接任意SQL）
+ORDER_COLUMNS = ('heat_score', 'view_count', 'engagement_rate', 'published_at')
+
+
+def fts_query(text: str) -> str:
+    """
+    把用户输入转成安全的 FTS5 查询：每个词作为带引号的短语，多个词之间为 AND
+
+    末尾带 * 的词保留前缀匹配，如 "cook*" 可匹配 cooking
+    """
+    terms = []
+    for token in re.findall(r'[\w*]+', text, flags=re.UNICODE):
+        prefix = token.endswith('*')
+        word = token.strip('*')
+        if word:
+            terms.append(f'"{word}"' + ('*' if prefix else ''))
+    return ' '.join(terms)
+
+
+class LocalIndex:
+    """线程安全的本地视频索引"""
+
+    def __init__(self, path: str = DEFAULT_INDEX_PATH):
+        """
+        Args:
+            path: SQLite 数据库文件路径（':memory:' 为内存库）
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        if path != ':memory:':
+            self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.executescript(_SCHEMA)
+        self._conn.commit()
+
+    def add(self, videos: List[Dict]) -> int:
+        """写入（或更新）一批解析后的视频，返回写入条数"""
+        if not videos:
+            return 0
+        now = datetime.now().isoformat(timespec='seconds')
+        rows = [(
+            v['video_id'], v['title'], v['channel_title'], v.get('description', ''),
+            ' '.join(v.get('hot_reasons', [])), v['published_at'], v['duration_seconds'],
+            v['view_count'], v['engagement_rate'], v['heat_score'], now,
+            json.dumps(v, ensure_ascii=False),
+        ) for v in videos]
+        with self._lock:
+            with self._conn:
+                self._conn.executemany(_UPSERT, rows)
+        return len(rows)
+
+    def search(self,
+               query: Optional[str] = None,
+               min_views: int = 0,
+               min_engagement: float = 0.0,
+               max_days: Optional[int] = None,
+               min_duration: int = 0,
+               max_duration: Optional[int] = None,
+               order_by: str = 'heat_score',
+               limit: int = 50) -> List[Dict]:
+        """
+        查询本地索引
+
+        Args:
+            query: 全文检索词（标题/频道/简介/爆红原因），为空则只按条件筛选
+            min_views: 最低播放量
+            min_engagement: 最低互动率(%)
+            max_days: 最多发布天数
+            min_duration: 最短时长（秒）
+            max_duration: 最长时长（秒）
+            order_by: 排序列（heat_score / view_count / engagement_rate / published_at，降序）
+            limit: 最多返回条数
+
+        Returns:
+            与 _parse_video_data 结构一致的视频列表（days_since_published 按今天重新计算）
+        """
+        if order_by not in ORDER_COLUMNS:
+            raise ValueError(f"order_by 仅支持: {', '.join(ORDER_COLUMNS)}")
+        where = ['v.view_count >= ?', 'v.engagement_rate >= ?', 'v.duration_seconds >= ?']
+        params: list = [min_views, min_engagement, min_duration]
+        if max_duration is not None:
+            where.append('v.duration_seconds <= ?')
+            params.append(max_duration)
+        if max_days is not None:
+            where.append('v.published_at >= ?')
+            params.append((datetime.now() - timedelta(days=max_days)).strftime('%Y-%m-%d'))
+        match = fts_query(query or '')
+        if match:
+            sql = ('SELECT v.data FROM videos_fts f JOIN videos v ON v.rowid = f.rowid '
+                   'WHERE videos_fts MATCH ? AND ')
+            params.insert(0, match)
+        else:
+            sql = 'SELECT v.data FROM videos v WHERE '
+        sql += ' AND '.join(where) + f' ORDER BY v.{order_by} DESC LIMIT ?'
+        params.append(limit)
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        today = datetime.now()
+        videos = []
+        for row in rows:
+            video = json.loads(row['data'])
+            published_at = datetime.strptime(video['published_at'], '%Y-%m-%d')
+            video['days_since_published'] = max(1, (today - published_at).days)
+            videos.append(video)
+        return videos
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute('SELECT COUNT(*) FROM videos').fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+API调用容错层
+功能：错误分类（配额 / 限流 / 临时故障 / 请求错误）、指数退避+抖动重试、熔断器，
+      所有 YouTube Data API 调用都经由 call_with_retry 执行
+"""
+
+import json
+import random
+import socket
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, Optional
+
+from googleapiclient.errors import HttpError
+
+# 错误类别
+QUOTA = 'quota'              # 配额耗尽：重试无意义，熔断到配额重置
+RATE_LIMIT = 'rate_limit'    # 短时限流：退避后重试
+TRANSIENT = 'transient'      # 5xx/网络抖动：退避后重试
+CLIENT = 'client'            # 参数错误/不存在等：不重试
+CIRCUIT_OPEN = 'circuit_open'  # 熔断中，未实际发请求
+BUDGET = 'budget'            # 超出本次请求的配额上限，未实际发请求
+
+RETRYABLE = (RATE_LIMIT, TRANSIENT)
+
+QUOTA_REASONS = {'quotaExceeded', 'dailyLimitExceeded', 'dailyLimitExceededUnreg'}
+RATE_LIMIT_REASONS = {'rateLimitExceeded', 'userRateLimitExceeded'}
+
+
+class ApiCallError(Exception):
+    """分类后的API调用错误"""
+
+    def __init__(self, kind: str, message: str, status: Optional[int] = None,
+                 reason: Optional[str] = None, retry_at: Optional[datetime] = None):
+        super().__init__(message)
+        self.kind = kind
+        self.status = status
+        self.reason = reason
+        self.retry_at = retry_at
+
+    def to_marker(self, stage: str, **extra) -> Dict:
+        """转成可JSON序列化的错误标记，附在部分结果上"""
+        marker = {
+            'stage': stage,
+            'kind': self.kind,
+            'status': self.status,
+            'reason': self.reason,
+            'message': str(self),
+        }
+        if self.retry_at:
+            marker['retry_at'] = self.retry_at.isoformat()
+        marker.update(extra)
+        return marker
+
+
+def _error_reason(error: HttpError) -> Optional[str]:
+    details = getattr(error, 'error_details', None)
+    if isinstance(details, list):
+        for d in details:
+            if isinstance(d, dict) and d.get('reason'):
+                return d['reason']
+    try:
+        content = error.content.decode('utf-8') if isinstance(error.content, bytes) else error.content
+        errors = json.loads(content).get('error', {}).get('errors', [])
+        if errors:
+            return errors[0].get('reason')
+    except Exception:
+        pass
+    return None
+
+
+def classify_error(error: BaseException) -> ApiCallError:
+    """把底层异常归类为 ApiCallError"""
+    if isinstance(error, ApiCallError):
+        return error
+    if isinstance(error, HttpError):
+        status = getattr(error.resp, 'status', None)
+        try:
+            status = int(status)
+        except (TypeError, ValueError):
+            status = None
+        reason = _error_reason(error)
+        message = f"HTTP {status} {reason or ''}".strip()
+        if reason in QUOTA_REASONS:
+            return ApiCallError(QUOTA, message, status, reason, retry_at=next_quota_reset())
+        if reason in RATE_LIMIT_REASONS or status == 429:
+            return ApiCallError(RATE_LIMIT, message, status, reason)
+        if status is not None and status >= 500:
+            return ApiCallError(TRANSIENT, message, status, reason)
+        return ApiCallError(CLIENT, message, status, reason)
+    if isinstance(error, (socket.timeout, TimeoutError, ConnectionError, OSError)):
+        return ApiCallError(TRANSIENT, f"{type(error).__name__}: {error}")
+    return ApiCallError(CLIENT, f"{type(error).__name__}: {error}")
+
+
+def next_quota_reset(now: Optional[datetime] = None) -> datetime:
+    """YouTube配额在太平洋时间午夜重置，返回下一次重置时间（UTC）"""
+    now = now or datetime.now(timezone.utc)
+    try:
+        from zoneinfo import ZoneInfo
+        pacific = ZoneInfo('America/Los_Angeles')
+    except Exception:
+        pacific = timezone(timedelta(hours=-8))
+    local = now.astimezone(pacific)
+    midnight = (local + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+    return midnight.astimezone(timezone.utc)
+
+
+class RetryPolicy:
+    """指数退避 + 全抖动（full jitter）"""
+
+    def __init__(self, max_attempts: int = 4, base_delay: float = 0.5, max_delay: float = 8.0,
+                 sleep: Callable[[float], None] = time.sleep, rng: Optional[random.Random] = None):
+        """
+        Args:
+            max_attempts: 最多尝试次数（含第一次）
+            base_delay: 退避基数（秒）
+            max_delay: 单次等待上限（秒）
+        """
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.sleep = sleep
+        self.rng = rng or random.Random()
+
+    def delay(self, attempt: int) -> float:
+        """第 attempt 次失败后的等待时间（attempt 从0开始）"""
+        return self.rng.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+
+class CircuitBreaker:
+    """
+    熔断器
+    - 配额耗尽：立即熔断到配额重置时间
+    - 连续临时故障达到阈值：熔断 reset_timeout 秒，之后半开放行一次试探
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.open_until: Optional[datetime] = None
+        self.open_kind: Optional[str] = None
+        self._half_open_probe = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self.open_until is None:
+                return 'closed'
+            if datetime.now(timezone.utc) >= self.open_until:
+                return 'half_open'
+            return 'open'
+
+    def allow(self):
+        """放行检查，熔断中抛出 ApiCallError(CIRCUIT_OPEN)"""
+        with self._lock:
+            if self.open_until is None:
+                return
+            if datetime.now(timezone.utc) >= self.open_until and not self._half_open_probe:
+                self._half_open_probe = True
+                return
+            raise ApiCallError(CIRCUIT_OPEN, f"熔断中（{self.open_kind}），{self.open_until.isoformat()} 后重试",
+                               reason=self.open_kind, retry_at=self.open_until)
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.open_until = None
+            self.open_kind = None
+            self._half_open_probe = False
+
+    def record_failure(self, error: ApiCallError):
+        with self._lock:
+            self._half_open_probe = False
+            if error.kind == QUOTA:
+                self.open_until = error.retry_at or next_quota_reset()
+                self.open_kind = QUOTA
+            elif error.kind in RETRYABLE:
+                self.failures += 1
+                if self.failures >= self.failure_threshold or self.open_until is not None:
+                    self.open_until = datetime.now(timezone.utc) + timedelta(seconds=self.reset_timeout)
+                    self.open_kind = error.kind
+
+    def snapshot(self) -> Dict:
+        return {
+            'state': self.state,
+            'failures': self.failures,
+            'open_until': self.open_until.isoformat() if self.open_until else None,
+            'open_kind': self.open_kind,
+        }
+
+
+_BREAKERS: Dict[str, CircuitBreaker] = {}
+_BREAKERS_LOCK = threading.Lock()
+
+
+def breaker_for(name: str) -> CircuitBreaker:
+    """进程内按名字（通常是API key）共享熔断器，跨请求生效"""
+    with _BREAKERS_LOCK:
+        if name not in _BREAKERS:
+            _BREAKERS[name] = CircuitBreaker()
+        return _BREAKERS[name]
+
+
+def call_with_retry(func: Callable[[], Dict], breaker: Optional[CircuitBreaker] = None,
+                    policy: Optional[RetryPolicy] = None) -> Dict:
+    """
+    执行一次幂等API调用：熔断检查 → 调用 → 按错误类别退避重试
+
+    Raises:
+        ApiCallError: 最终失败（已分类）
+    """
+    policy = policy or RetryPolicy()
+    last_error: Optional[ApiCallError] = None
+    for attempt in range(policy.max_attempts):
+        if breaker is not None:
+            breaker.allow()
+        try:
+            result = func()
+        except Exception as e:
+            last_error = classify_error(e)
+            if breaker is not None:
+                breaker.record_failure(last_error)
+            if last_error.kind not in RETRYABLE or attempt == policy.max_attempts - 1:
+                raise last_error from e
+            policy.sleep(policy.delay(attempt))
+            continue
+        if breaker is not None:
+            breaker.record_success()
+        return result
+    raise last_error
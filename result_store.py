@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+查询结果列式缓存
+功能：把每次查询未经筛选的完整结果按列存进内存（每个数值字段一份排序索引），
+      只改播放量/互动率/天数/时长门槛时直接在缓存上做区间查询并按热度重排，不再调用API
+"""
+
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from video_table import VideoTable
+
+# 建排序索引的数值字段
+INDEXED_FIELDS = ('view_count', 'engagement_rate', 'days_since_published', 'duration_seconds', 'heat_score')
+DEFAULT_MAX_ENTRIES = 64
+DEFAULT_TTL = 15 * 60
+
+
+class ResultSet:
+    """一次查询的完整结果：列式视频表 + 每个数值列的排序索引"""
+
+    def __init__(self, videos: List[Dict]):
+        self.table = VideoTable.from_dicts(videos)
+        self.created_at = time.time()
+        self.columns: Dict[str, np.ndarray] = {}
+        self.order: Dict[str, np.ndarray] = {}
+        self.sorted_values: Dict[str, np.ndarray] = {}
+        for field in INDEXED_FIELDS:
+            column = self.table.column(field).astype(np.float64)
+            order = np.argsort(column, kind='stable')
+            self.columns[field] = column
+            self.order[field] = order
+            self.sorted_values[field] = column[order]
+
+    def __len__(self) -> int:
+        return len(self.table)
+
+    def _range(self, field: str, low: Optional[float], high: Optional[float]) -> Tuple[int, int]:
+        """排序索引上 low <= 值 <= high 的区间（None 表示不限）"""
+        values = self.sorted_values[field]
+        start = 0 if low is None else int(np.searchsorted(values, low, side='left'))
+        stop = len(values) if high is None else int(np.searchsorted(values, high, side='right'))
+        return start, max(start, stop)
+
+    def query(self, min_views: int = 0, min_engagement: float = 0.0, max_days: Optional[int] = None,
+              min_duration: int = 0, max_duration: Optional[int] = None) -> List[Dict]:
+        """
+        区间查询并按热度降序重排，语义与 YouTubeAnalyzer.filter_videos 相同
+
+        先用最窄的那个区间取候选行，其余条件在候选行上做向量化掩码；
+        返回新建的 dict，调用方可以随意修改而不影响缓存
+        """
+        ranges = {
+            'view_count': (min_views, None),
+            'engagement_rate': (min_engagement, None),
+            'days_since_published': (None, max_days),
+            'duration_seconds': (min_duration, max_duration),
+        }
+        bounds = {field: self._range(field, *limits) for field, limits in ranges.items()}
+        narrowest = min(bounds, key=lambda f: bounds[f][1] - bounds[f][0])
+        start, stop = bounds[narrowest]
+        rows = np.sort(self.order[narrowest][start:stop])
+        mask = np.ones(len(rows), dtype=bool)
+        for field, (low, high) in ranges.items():
+            if field == narrowest:
+                continue
+            values = self.columns[field][rows]
+            if low is not None:
+                mask &= values >= low
+            if high is not None:
+                mask &= values <= high
+        rows = rows[mask]
+        ranked = rows[np.argsort(-self.columns['heat_score'][rows], kind='stable')]
+        table = self.table
+        return [table[i].to_dict() for i in ranked.tolist()]
+
+
+class ResultStore:
+    """按查询键缓存 ResultSet（LRU + 过期时间，线程安全）"""
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, ttl: float = DEFAULT_TTL):
+        """
+        Args:
+            max_entries: 最多缓存的查询数
+            ttl: 过期时间（秒）；发布天数、播放量会随时间变化，不宜缓存太久
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: 'OrderedDict[str, ResultSet]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(**params) -> str:
+        """只由影响抓取结果的参数组成的规范化键（门槛类参数不参与）"""
+        normalized = {k: (v.strip().lower() if isinstance(v, str) else v) for k, v in params.items()}
+        return json.dumps(normalized, sort_keys=True, ensure_ascii=False, default=str)
+
+    def get(self, key: str) -> Optional[ResultSet]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.time() - entry.created_at > self.ttl:
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key: str, videos: List[Dict]) -> ResultSet:
+        entry = ResultSet(videos)
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {'entries': len(self._entries), 'hits': self.hits, 'misses': self.misses,
+                    'videos': sum(len(e) for e in self._entries.values()),
+                    'bytes': sum(e.table.nbytes() for e in self._entries.values())}
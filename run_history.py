@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+运行历史与"上次之后有什么新的"对比
+功能：每次分析的结果集紧凑地存进 SQLite（视频ID压缩文本 + 64位ID哈希数组 + 热度数组 + 运行参数），
+      同一查询的新结果与上一次运行用哈希集合做差：新上榜、已下榜、排名/热度大幅变动，
+      并给每个视频标上 is_new / previous_rank / rank_change，供"只看新增"模式使用
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+import zlib
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import numpy as np
+
+DEFAULT_HISTORY_PATH = 'run_history.db'
+# 每个查询保留的运行数
+DEFAULT_KEEP_RUNS = 30
+# 大幅变动：排名变化至少这么多名，或热度变化至少这个比例
+MOVER_RANKS = 10
+MOVER_HEAT_RATIO = 0.5
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    query_key TEXT NOT NULL,
+    params TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    ids BLOB NOT NULL,
+    hashes BLOB NOT NULL,
+    heat BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_runs_query ON runs(query_key, id);
+"""
+
+
+def query_params(input_type: str, input_value: str, **options) -> Dict:
+    """决定"同一查询"的参数（类型、输入值与全部筛选条件），字符串规范化后参与比较"""
+    params = {'input_type': input_type, 'input_value': input_value.strip().lower(), **options}
+    return {k: (v.strip().lower() if isinstance(v, str) else v) for k, v in sorted(params.items())}
+
+
+def query_key(params: Dict) -> str:
+    return hashlib.sha1(json.dumps(params, sort_keys=True, ensure_ascii=False, default=str)
+                        .encode('utf-8')).hexdigest()
+
+
+def hash_ids(video_ids: List[str]) -> np.ndarray:
+    """视频ID → 64位哈希（集合运算在哈希数组上向量化完成）"""
+    return np.fromiter((int.from_bytes(hashlib.blake2b(vid.encode('utf-8'), digest_size=8).digest(), 'little')
+                        for vid in video_ids), dtype=np.uint64, count=len(video_ids))
+
+
+class RunHistory:
+    """线程安全的运行历史"""
+
+    def __init__(self, path: str = DEFAULT_HISTORY_PATH, keep_runs: int = DEFAULT_KEEP_RUNS):
+        """
+        Args:
+            path: SQLite 数据库文件路径（':memory:' 为内存库）
+            keep_runs: 每个查询保留的最近运行数
+        """
+        self.path = path
+        self.keep_runs = keep_runs
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        if path != ':memory:':
+            self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.executescript(_SCHEMA)
+        self._conn.commit()
+
+    def record(self, key: str, params: Dict, videos: List[Dict]) -> int:
+        """保存一次运行的结果集（按结果顺序），返回运行ID"""
+        ids = [v['video_id'] for v in videos]
+        heat = np.array([v.get('heat_score', 0.0) for v in videos], dtype=np.float32)
+        row = (key, json.dumps(params, ensure_ascii=False, default=str),
+               datetime.now().isoformat(timespec='seconds'), len(ids),
+               zlib.compress('\n'.join(ids).encode('utf-8')), hash_ids(ids).tobytes(), heat.tobytes())
+        with self._lock:
+            with self._conn:
+                cursor = self._conn.execute(
+                    'INSERT INTO runs (query_key, params, created_at, count, ids, hashes, heat) '
+                    'VALUES (?, ?, ?, ?, ?, ?, ?)', row)
+                self._conn.execute(
+                    'DELETE FROM runs WHERE query_key = ? AND id NOT IN '
+                    '(SELECT id FROM runs WHERE query_key = ? ORDER BY id DESC LIMIT ?)',
+                    (key, key, self.keep_runs))
+        return cursor.lastrowid
+
+    def runs(self, key: str, limit: int = 10) -> List[Dict]:
+        """某个查询最近的运行（新的在前）"""
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT id, created_at, count FROM runs WHERE query_key = ? ORDER BY id DESC LIMIT ?',
+                (key, limit)).fetchall()
+        return [dict(row) for row in rows]
+
+    def _latest(self, key: str) -> Optional[sqlite3.Row]:
+        with self._lock:
+            return self._conn.execute(
+                'SELECT id, created_at, count, ids, hashes, heat FROM runs WHERE query_key = ? '
+                'ORDER BY id DESC LIMIT 1', (key,)).fetchone()
+
+    def diff(self, key: str, videos: List[Dict], mover_ranks: int = MOVER_RANKS,
+             mover_heat_ratio: float = MOVER_HEAT_RATIO) -> Dict:
+        """
+        与同一查询的上一次运行对比（原地给视频补充 is_new / previous_rank / rank_change）
+
+        Returns:
+            previous_run: 上一次运行（id / created_at / count），没有时为 None，此时全部视为新增
+            new_ids / dropped_ids: 新上榜、已下榜的视频ID
+            movers: 排名或热度大幅变动的视频（rank_change 为正表示上升）
+        """
+        current = hash_ids([v['video_id'] for v in videos])
+        previous = self._latest(key)
+        if previous is None:
+            for video in videos:
+                video.update(is_new=True, previous_rank=None, rank_change=None)
+            return {'previous_run': None, 'new_ids': [v['video_id'] for v in videos],
+                    'dropped_ids': [], 'movers': []}
+
+        prev_hashes = np.frombuffer(previous['hashes'], dtype=np.uint64)
+        prev_heat = np.frombuffer(previous['heat'], dtype=np.float32)
+        order = np.argsort(prev_hashes, kind='stable')
+        pos = np.minimum(np.searchsorted(prev_hashes, current, sorter=order), max(len(order) - 1, 0))
+        prev_index = order[pos] if len(order) else np.zeros(len(current), dtype=np.int64)
+        matched = prev_hashes[prev_index] == current if len(order) else np.zeros(len(current), dtype=bool)
+
+        movers = []
+        for rank, (video, hit, index) in enumerate(zip(videos, matched.tolist(), prev_index.tolist()), 1):
+            if not hit:
+                video.update(is_new=True, previous_rank=None, rank_change=None)
+                continue
+            change = index + 1 - rank
+            video.update(is_new=False, previous_rank=index + 1, rank_change=change)
+            old_heat = float(prev_heat[index])
+            heat_change = (video.get('heat_score', 0.0) - old_heat) / old_heat if old_heat else 0.0
+            if abs(change) >= mover_ranks or abs(heat_change) >= mover_heat_ratio:
+                movers.append({'video_id': video['video_id'], 'rank': rank, 'previous_rank': index + 1,
+                               'rank_change': change, 'heat_change': round(heat_change, 3)})
+
+        dropped = ~np.isin(prev_hashes, current)
+        dropped_ids = []
+        if dropped.any():
+            prev_ids = zlib.decompress(previous['ids']).decode('utf-8').split('\n')
+            dropped_ids = [prev_ids[i] for i in np.flatnonzero(dropped).tolist()]
+        return {
+            'previous_run': {'id': previous['id'], 'created_at': previous['created_at'], 'count': previous['count']},
+            'new_ids': [v['video_id'] for v in videos if v['is_new']],
+            'dropped_ids': dropped_ids,
+            'movers': movers,
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
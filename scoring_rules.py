@@ -0,0 +1,348 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+配置驱动的评分与爆红原因规则引擎
+功能：热度公式、趋势加成、趋势标签和爆红原因的阈值都从配置读取，
+      加载时把表达式一次性编译成对列数组的向量化运算 / 布尔掩码，
+      每次调用评估一整页视频，并统计每条规则的命中数和耗时，方便对比不同策略
+
+规则表达式是受限的 Python 表达式：可用视频字段名、derived 中定义的派生列、数字、
+比较（支持 60 <= x < 240 连写）、and / or / not、+ - * / 以及 where / maximum / minimum /
+clip / log1p / sqrt / abs，和 contains(title, 'hot_keywords')（标题包含关键词表中任意一个）
+"""
+
+import ast
+import copy
+import json
+import os
+import re
+import threading
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+
+DEFAULT_RULES = {
+    'name': 'default',
+    'keywords': {
+        'hot_keywords': [
+            'hack', 'hacks', 'diy', 'tips', 'trick', 'tricks', 'challenge', 'viral',
+            'recipe', 'cook', 'cooking', 'air fryer', 'slime', 'asmr', 'shortcut',
+            'easy', 'fast', 'quick', 'life', 'tiktok', 'shorts'
+        ],
+    },
+    'derived': {
+        'engagement': 'where(view_count > 0, (like_count + comment_count) / maximum(view_count, 1) * 100, 0)',
+        'like_rate': 'where(view_count > 0, like_count / maximum(view_count, 1) * 100, 0)',
+        'comment_rate': 'where(view_count > 0, comment_count / maximum(view_count, 1) * 100, 0)',
+        'avg_daily': 'view_count / clip(days_since_published, 1, 90)',
+    },
+    'scores': {
+        'heat_score': '(view_count * 0.3 + like_count * 30 + comment_count * 15) / maximum(days_since_published, 1)',
+        'trend_score': '(avg_daily + engagement * 1500) * where(days_since_published <= 7, 1.15, 1)'
+                       ' * where(duration_seconds <= 120, 1.05, 1)',
+        'avg_daily_views': 'avg_daily',
+    },
+    # 趋势标签：按顺序取第一个命中的
+    'labels': [
+        {'name': '爆发期', 'when': 'days_since_published <= 3 and avg_daily >= 50000'},
+        {'name': '高速增长', 'when': 'avg_daily >= 100000'},
+        {'name': '稳定增长', 'when': 'avg_daily >= 30000'},
+        {'name': '平稳', 'when': 'avg_daily >= 10000'},
+    ],
+    'default_label': '缓慢',
+    # 爆红原因：同一 group 内按顺序只取第一个命中的（相当于 if/elif）
+    'reasons': [
+        {'name': 'high_engagement', 'when': 'engagement >= 4', 'group': 'engagement'},
+        {'name': 'good_engagement', 'when': 'engagement >= 2.5', 'group': 'engagement'},
+        {'name': 'high_like_rate', 'when': 'like_rate >= 2.0'},
+        {'name': 'high_comment_rate', 'when': 'comment_rate >= 0.1'},
+        {'name': 'optimal_duration', 'when': '240 <= duration_seconds <= 600', 'group': 'duration'},
+        {'name': 'short_duration', 'when': '60 <= duration_seconds < 240', 'group': 'duration'},
+        {'name': 'fresh_7d', 'when': 'days_since_published <= 7', 'group': 'fresh'},
+        {'name': 'fresh_14d', 'when': 'days_since_published <= 14', 'group': 'fresh'},
+        {'name': 'title_clickbait', 'when': "contains(title, 'hot_keywords')"},
+        {'name': 'high_views', 'when': 'view_count >= 500000'},
+    ],
+    'fallback_reason': 'general_good',
+}
+
+FUNCTIONS = {
+    'where': np.where,
+    'maximum': np.maximum,
+    'minimum': np.minimum,
+    'clip': np.clip,
+    'log1p': np.log1p,
+    'sqrt': np.sqrt,
+    'abs': np.abs,
+}
+# 可在表达式中使用的数值字段
+NUMERIC_FIELDS = (
+    'view_count', 'like_count', 'comment_count', 'engagement_rate', 'days_since_published',
+    'duration_seconds', 'heat_score', 'avg_daily_views', 'trend_score', 'revenue_mid',
+)
+TEXT_FIELDS = ('title', 'channel_title', 'description')
+# 输出时保留的小数位（与 _parse_video_data 一致）
+SCORE_DIGITS = 2
+
+
+class RuleError(ValueError):
+    """规则配置错误"""
+
+
+_ALLOWED_NODES = (
+    ast.Expression, ast.BinOp, ast.UnaryOp, ast.BoolOp, ast.Compare, ast.Call, ast.Name, ast.Load,
+    ast.Constant, ast.Add, ast.Sub, ast.Mult, ast.Div, ast.Mod, ast.Pow, ast.USub, ast.UAdd, ast.Not,
+    ast.And, ast.Or, ast.Lt, ast.LtE, ast.Gt, ast.GtE, ast.Eq, ast.NotEq, ast.BitAnd, ast.BitOr, ast.Invert,
+)
+
+
+class _Vectorize(ast.NodeTransformer):
+    """把 and/or/not 和连写比较改写成按元素的 & | ~，contains() 换成预先计算的文本掩码"""
+
+    def __init__(self, keywords: Dict[str, List[str]], text_masks: Dict[str, tuple]):
+        self.keywords = keywords
+        self.text_masks = text_masks
+
+    def visit_BoolOp(self, node):
+        self.generic_visit(node)
+        op = ast.BitAnd() if isinstance(node.op, ast.And) else ast.BitOr()
+        result = node.values[0]
+        for value in node.values[1:]:
+            result = ast.BinOp(left=result, op=op, right=value)
+        return result
+
+    def visit_UnaryOp(self, node):
+        self.generic_visit(node)
+        if isinstance(node.op, ast.Not):
+            return ast.UnaryOp(op=ast.Invert(), operand=node.operand)
+        return node
+
+    def visit_Compare(self, node):
+        self.generic_visit(node)
+        if len(node.ops) == 1:
+            return node
+        parts, left = [], node.left
+        for op, right in zip(node.ops, node.comparators):
+            parts.append(ast.Compare(left=left, ops=[op], comparators=[right]))
+            left = right
+        result = parts[0]
+        for part in parts[1:]:
+            result = ast.BinOp(left=result, op=ast.BitAnd(), right=part)
+        return result
+
+    def visit_Call(self, node):
+        if isinstance(node.func, ast.Name) and node.func.id == 'contains':
+            if (len(node.args) != 2 or not isinstance(node.args[0], ast.Name)
+                    or node.args[0].id not in TEXT_FIELDS or not isinstance(node.args[1], ast.Constant)):
+                raise RuleError("contains() 用法: contains(title, '关键词表名')")
+            field, list_name = node.args[0].id, node.args[1].value
+            if list_name not in self.keywords:
+                raise RuleError(f"未定义的关键词表: {list_name}")
+            name = f"__text_{field}_{list_name}"
+            words = sorted(self.keywords[list_name], key=len, reverse=True)
+            self.text_masks[name] = (field, re.compile('|'.join(re.escape(w.lower()) for w in words)))
+            return ast.copy_location(ast.Name(id=name, ctx=ast.Load()), node)
+        self.generic_visit(node)
+        if not isinstance(node.func, ast.Name) or node.func.id not in FUNCTIONS or node.keywords:
+            raise RuleError(f"不支持的函数: {ast.dump(node.func)}")
+        return node
+
+
+class CompiledRule:
+    """编译后的单条表达式"""
+
+    def __init__(self, name: str, source: str, keywords: Dict[str, List[str]], text_masks: Dict[str, tuple]):
+        self.name = name
+        self.source = source
+        try:
+            tree = ast.parse(source, mode='eval')
+        except SyntaxError as e:
+            raise RuleError(f"规则 {name} 语法错误: {e}") from e
+        for node in ast.walk(tree):
+            if not isinstance(node, _ALLOWED_NODES):
+                raise RuleError(f"规则 {name} 包含不允许的语法: {type(node).__name__}")
+        tree = ast.fix_missing_locations(_Vectorize(keywords, text_masks).visit(tree))
+        self.names = {n.id for n in ast.walk(tree) if isinstance(n, ast.Name)} - set(FUNCTIONS)
+        self.code = compile(tree, f"<rule {name}>", 'eval')
+
+    def evaluate(self, namespace: Dict) -> np.ndarray:
+        return eval(self.code, {'__builtins__': {}, **FUNCTIONS}, namespace)
+
+
+class RuleEngine:
+    """按策略配置编译的规则引擎（线程安全，统计在多次调用间累计）"""
+
+    def __init__(self, spec: Optional[Dict] = None):
+        """
+        Args:
+            spec: 规则配置，结构见 DEFAULT_RULES；缺省的部分用默认规则补齐
+        """
+        merged = copy.deepcopy(DEFAULT_RULES)
+        for key, value in (spec or {}).items():
+            if isinstance(value, dict) and isinstance(merged.get(key), dict):
+                merged[key].update(value)
+            else:
+                merged[key] = value
+        self.spec = merged
+        self.name = merged.get('name', 'default')
+        self.text_masks: Dict[str, tuple] = {}
+        keywords = merged.get('keywords', {})
+
+        def build(section: str, name: str, source: str) -> CompiledRule:
+            return CompiledRule(f"{section}.{name}", source, keywords, self.text_masks)
+
+        self.derived = [build('derived', n, s) for n, s in merged.get('derived', {}).items()]
+        self.scores = [build('scores', n, s) for n, s in merged.get('scores', {}).items()]
+        self.labels = [build('labels', r['name'], r['when']) for r in merged.get('labels', [])]
+        self.reasons = [build('reasons', r['name'], r['when']) for r in merged.get('reasons', [])]
+        self.reason_groups = [r.get('group') for r in merged.get('reasons', [])]
+        self.default_label = merged.get('default_label')
+        self.fallback_reason = merged.get('fallback_reason')
+
+        known = set(NUMERIC_FIELDS) | set(self.text_masks) | {r.name.split('.', 1)[1] for r in self.derived}
+        rules = self.derived + self.scores + self.labels + self.reasons
+        for rule in rules:
+            unknown = rule.names - known
+            if unknown:
+                raise RuleError(f"规则 {rule.name} 引用了未知字段: {', '.join(sorted(unknown))}")
+        self.fields = sorted(set().union(*(r.names for r in rules)) & set(NUMERIC_FIELDS))
+
+        self._lock = threading.Lock()
+        self.stats: Dict[str, Dict] = {r.name: {'hits': 0, 'evaluated': 0, 'time_ms': 0.0} for r in rules}
+        self.calls = 0
+
+    @classmethod
+    def from_file(cls, path: str) -> 'RuleEngine':
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls(json.load(f))
+
+    def _record(self, rule: CompiledRule, started: float, size: int, hits: Optional[int] = None):
+        stat = self.stats[rule.name]
+        stat['evaluated'] += size
+        stat['time_ms'] += (time.perf_counter() - started) * 1000
+        if hits is not None:
+            stat['hits'] += hits
+
+    def evaluate(self, videos: List[Dict]) -> Dict[str, np.ndarray]:
+        """
+        对一页视频求值
+
+        Returns:
+            分数列（scores 中的每一项）、'label' 标签索引数组（-1 表示默认标签）、
+            以及每条爆红原因的布尔掩码（键为 'reason.<名称>'，已按 group 去掉后命中的）
+        """
+        n = len(videos)
+        namespace = {field: np.fromiter((v.get(field, 0) for v in videos), dtype=np.float64, count=n)
+                     for field in self.fields}
+        for name, (field, pattern) in self.text_masks.items():
+            namespace[name] = np.fromiter((bool(pattern.search(str(v.get(field, '')).lower())) for v in videos),
+                                          dtype=bool, count=n)
+        result: Dict[str, np.ndarray] = {}
+        with self._lock:
+            self.calls += 1
+            for rule in self.derived:
+                started = time.perf_counter()
+                namespace[rule.name.split('.', 1)[1]] = np.broadcast_to(rule.evaluate(namespace), (n,))
+                self._record(rule, started, n)
+            for rule in self.scores:
+                started = time.perf_counter()
+                result[rule.name.split('.', 1)[1]] = np.broadcast_to(rule.evaluate(namespace), (n,))
+                self._record(rule, started, n)
+
+            label = np.full(n, -1)
+            for index, rule in enumerate(self.labels):
+                started = time.perf_counter()
+                hit = np.broadcast_to(rule.evaluate(namespace), (n,)) & (label < 0)
+                label[hit] = index
+                self._record(rule, started, n, int(hit.sum()))
+            result['label'] = label
+
+            taken: Dict[str, np.ndarray] = {}
+            for rule, group in zip(self.reasons, self.reason_groups):
+                started = time.perf_counter()
+                hit = np.broadcast_to(rule.evaluate(namespace), (n,)).astype(bool)
+                if group is not None:
+                    previous = taken.get(group)
+                    if previous is not None:
+                        hit = hit & ~previous
+                        taken[group] = previous | hit
+                    else:
+                        taken[group] = hit
+                result[rule.name] = hit
+                self._record(rule, started, n, int(hit.sum()))
+        return result
+
+    def apply(self, videos: List[Dict]) -> List[Dict]:
+        """求值后写回每个视频的分数、趋势标签和爆红原因（原地修改）"""
+        if not videos:
+            return videos
+        result = self.evaluate(videos)
+        score_names = [r.name.split('.', 1)[1] for r in self.scores]
+        label_names = [r.name.split('.', 1)[1] for r in self.labels]
+        reason_names = [(r.name, r.name.split('.', 1)[1]) for r in self.reasons]
+        columns = {name: result[name].tolist() for name in score_names}
+        labels = result['label'].tolist()
+        masks = [(name, result[key].tolist()) for key, name in reason_names]
+        for i, video in enumerate(videos):
+            for name in score_names:
+                video[name] = round(columns[name][i], SCORE_DIGITS)
+            if self.labels:
+                video['trend_label'] = label_names[labels[i]] if labels[i] >= 0 else self.default_label
+            if self.reasons:
+                reasons = [name for name, mask in masks if mask[i]]
+                if not reasons and self.fallback_reason:
+                    reasons.append(self.fallback_reason)
+                video['hot_reasons'] = reasons
+                video['hot_reasons_text'] = '; '.join(reasons[:4])
+        return videos
+
+    def report(self) -> Dict:
+        """每条规则的累计命中数、求值条数与耗时"""
+        with self._lock:
+            return {
+                'strategy': self.name,
+                'calls': self.calls,
+                'rules': {name: dict(stat, time_ms=round(stat['time_ms'], 3)) for name, stat in self.stats.items()},
+            }
+
+
+def load_strategies(config: Optional[Dict] = None) -> Dict[str, RuleEngine]:
+    """
+    从配置加载评分策略：
+    scoring_rules（或 scoring_rules_file 指向的JSON）作为 default，
+    scoring_strategies 中的每一项作为可选策略（用于A/B对比）
+    """
+    config = config or {}
+    strategies: Dict[str, RuleEngine] = {}
+    path = config.get('scoring_rules_file')
+    if path and os.path.exists(path):
+        strategies['default'] = RuleEngine.from_file(path)
+    elif config.get('scoring_rules'):
+        strategies['default'] = RuleEngine(config['scoring_rules'])
+    for name, spec in (config.get('scoring_strategies') or {}).items():
+        strategies[name] = RuleEngine(dict(spec, name=name))
+    return strategies
+
+
+def compare_strategies(videos: List[Dict], engines: Dict[str, RuleEngine], key: str = 'heat_score',
+                       top_n: int = 20) -> Dict[str, Dict]:
+    """
+    用多个策略给同一批视频打分，比较前 top_n 的重合度与规则命中
+
+    Returns:
+        {策略名: {'top_ids', 'overlap_with_first', 'report'}}
+    """
+    results: Dict[str, Dict] = {}
+    baseline: Optional[set] = None
+    for name, engine in engines.items():
+        scored = engine.apply([dict(v) for v in videos])
+        top = [v['video_id'] for v in sorted(scored, key=lambda v: v.get(key, 0), reverse=True)[:top_n]]
+        if baseline is None:
+            baseline = set(top)
+        results[name] = {
+            'top_ids': top,
+            'overlap_with_first': round(len(baseline & set(top)) / max(1, len(top)), 3),
+            'report': engine.report(),
+        }
+    return results
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+search.list 结果缓存
+功能：search.list 每次消耗100配额，同一关键词/地区一天内会被网页、示例脚本和批量任务反复搜索。
+      按规范化后的关键词、地区、相关语言、时长分类和 publishedAfter 时间桶缓存每一页的视频ID（SQLite 持久化），
+      在新鲜期内直接复用，并统计命中次数与节省的配额
+"""
+
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+from collections import Counter
+from typing import Callable, Dict, List, Optional, Tuple
+
+from key_pool import quota_cost
+
+DEFAULT_SEARCH_CACHE_PATH = 'search_cache.db'
+# 新鲜期（秒）：超过后重新搜索
+DEFAULT_FRESHNESS = 60 * 60
+# 时间参数向下取整的粒度（秒）：默认"最近14天"随时间变化，取整后同一小时内的搜索共用缓存
+DEFAULT_BUCKET_SECONDS = 60 * 60
+# 命中/未命中计数每累计这么多次查询写一次库（put / prune / close 时也会顺带写入）
+DEFAULT_FLUSH_EVERY = 100
+# 启用缓存时每页都按最大页请求（search.list 按次计费，与 maxResults 无关），多余的ID在本地截掉
+PAGE_SIZE = 50
+
+_TIME_PARAMS = ('publishedAfter', 'publishedBefore')
+_RFC3339 = '%Y-%m-%dT%H:%M:%SZ'
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS search_pages (
+    cache_key TEXT NOT NULL,
+    page INTEGER NOT NULL,
+    params TEXT NOT NULL,
+    ids TEXT NOT NULL,
+    next_page_token TEXT,
+    fetched_at REAL NOT NULL,
+    PRIMARY KEY (cache_key, page)
+);
+CREATE TABLE IF NOT EXISTS counters (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+
+def normalize_keyword(keyword: str) -> str:
+    """关键词规范化：小写、合并空白"""
+    return re.sub(r'\s+', ' ', keyword or '').strip().lower()
+
+
+class SearchCache:
+    """线程安全的 search.list 分页结果缓存"""
+
+    def __init__(self, path: str = DEFAULT_SEARCH_CACHE_PATH, freshness: float = DEFAULT_FRESHNESS,
+                 bucket_seconds: int = DEFAULT_BUCKET_SECONDS, clock: Callable[[], float] = time.time,
+                 flush_every: int = DEFAULT_FLUSH_EVERY):
+        """
+        Args:
+            path: SQLite 数据库文件路径（':memory:' 为内存库）
+            freshness: 新鲜期（秒）
+            bucket_seconds: publishedAfter / publishedBefore 向下取整的粒度（秒）
+            clock: 时间函数（测试注入）
+            flush_every: 累计多少次查询后把命中计数写入库（查询本身不写库）
+        """
+        self.path = path
+        self.freshness = freshness
+        self.bucket_seconds = max(1, int(bucket_seconds))
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self.flush_every = max(1, int(flush_every))
+        # 还没写入 counters 表的计数
+        self._pending: Counter = Counter()
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        if path != ':memory:':
+            self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.executescript(_SCHEMA)
+        self._conn.commit()
+        self.prune()
+
+    def canonical(self, params: Dict) -> Dict:
+        """实际请求用的参数：时间参数按时间桶向下取整，页大小固定，保证缓存内容与请求一致"""
+        params = {k: v for k, v in params.items() if k not in ('maxResults', 'pageToken')}
+        for name in _TIME_PARAMS:
+            if params.get(name):
+                stamp = datetime.strptime(params[name], _RFC3339).replace(tzinfo=timezone.utc).timestamp()
+                stamp -= stamp % self.bucket_seconds
+                params[name] = datetime.fromtimestamp(stamp, timezone.utc).strftime(_RFC3339)
+        params['maxResults'] = PAGE_SIZE
+        return params
+
+    @staticmethod
+    def key(params: Dict) -> str:
+        """缓存键：规范化的关键词、地区、语言、时长分类与时间桶（以及其余搜索参数）"""
+        normalized = {k: v for k, v in params.items() if k != 'pageToken'}
+        normalized['q'] = normalize_keyword(params.get('q', ''))
+        normalized['regionCode'] = (params.get('regionCode') or '').upper()
+        normalized['relevanceLanguage'] = (params.get('relevanceLanguage') or '').lower()
+        normalized['videoDuration'] = params.get('videoDuration') or 'any'
+        return hashlib.sha1(json.dumps(normalized, sort_keys=True, ensure_ascii=False)
+                            .encode('utf-8')).hexdigest()
+
+    def get(self, params: Dict, page: int) -> Optional[Tuple[List[str], Optional[str]]]:
+        """新鲜期内的一页结果：(视频ID列表, 下一页 token)；没有或已过期返回 None"""
+        key = self.key(params)
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT ids, next_page_token FROM search_pages '
+                'WHERE cache_key = ? AND page = ? AND fetched_at >= ?',
+                (key, page, self.clock() - self.freshness)).fetchone()
+            name = 'hits' if row else 'misses'
+            setattr(self, name, getattr(self, name) + 1)
+            self._pending[name] += 1
+            if sum(self._pending.values()) >= self.flush_every:
+                with self._conn:
+                    self._flush_counters()
+        if row is None:
+            return None
+        return json.loads(row[0]), row[1]
+
+    def _flush_counters(self):
+        """把未写入的计数累加到 counters 表（调用方持锁并负责提交）"""
+        if not self._pending:
+            return
+        self._conn.executemany('INSERT INTO counters (name, value) VALUES (?, ?) '
+                               'ON CONFLICT(name) DO UPDATE SET value = value + excluded.value',
+                               list(self._pending.items()))
+        self._pending.clear()
+
+    def put(self, params: Dict, page: int, ids: List[str], next_page_token: Optional[str]):
+        """保存一页搜索结果"""
+        with self._lock:
+            with self._conn:
+                self._conn.execute(
+                    'INSERT OR REPLACE INTO search_pages '
+                    '(cache_key, page, params, ids, next_page_token, fetched_at) VALUES (?, ?, ?, ?, ?, ?)',
+                    (self.key(params), page, json.dumps(params, ensure_ascii=False), json.dumps(ids),
+                     next_page_token, self.clock()))
+                self._flush_counters()
+
+    def prune(self) -> int:
+        """删除过期的页，返回删除数"""
+        with self._lock:
+            with self._conn:
+                cursor = self._conn.execute('DELETE FROM search_pages WHERE fetched_at < ?',
+                                            (self.clock() - self.freshness,))
+                self._flush_counters()
+        return cursor.rowcount
+
+    def stats(self) -> Dict:
+        """命中统计与节省的配额（本进程 / 缓存库累计）"""
+        cost = quota_cost('search.list')
+        with self._lock:
+            totals = Counter(dict(self._conn.execute('SELECT name, value FROM counters').fetchall()))
+            totals.update(self._pending)
+            pages = self._conn.execute('SELECT COUNT(*) FROM search_pages').fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            'pages': pages,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+            'quota_saved': self.hits * cost,
+            'total_hits': totals.get('hits', 0),
+            'total_quota_saved': totals.get('hits', 0) * cost,
+            'freshness_s': self.freshness,
+        }
+
+    def close(self):
+        """写入未保存的计数并关闭数据库"""
+        with self._lock:
+            with self._conn:
+                self._flush_counters()
+            self._conn.close()
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""测试准入控制：令牌桶限流、并发闸门与排队、429/503 + Retry-After、单请求配额上限"""
+
+import asyncio
+import importlib
+import threading
+
+import pytest
+
+from admission import AdmissionController, Rejected
+from fake_youtube_server import FakeYouTubeServer
+from resilience import BUDGET, CircuitBreaker
+from youtube_analyzer import YouTubeAnalyzer
+from youtube_stub import StubYouTube, video_id_for
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_token_buckets_per_client_and_per_key():
+    """每个客户端各自一个桶；同一密钥的多个客户端合计；被拒绝时不扣任何令牌"""
+    clock = FakeClock()
+    admission = AdmissionController(client_rate=1, client_burst=3, key_rate=1, key_burst=4,
+                                    max_active=0, clock=clock)
+    for _ in range(3):
+        admission.check_rate('10.0.0.1')
+    with pytest.raises(Rejected) as e:
+        admission.check_rate('10.0.0.1')
+    assert e.value.status == 429 and e.value.reason == 'client_rate_limited' and e.value.retry_after == 1
+    admission.check_rate('10.0.0.2')  # 其他客户端不受影响
+    clock.now += 1
+    admission.check_rate('10.0.0.1')
+
+    # 密钥桶（突发4）被两个客户端共同耗尽
+    for client in ('a', 'a', 'b', 'b'):
+        admission.check_rate(client, 'shared-key')
+    with pytest.raises(Rejected) as e:
+        admission.check_rate('c', 'shared-key')
+    assert e.value.reason == 'key_rate_limited'
+    # 客户端 c 的令牌没有被扣掉
+    for _ in range(3):
+        admission.check_rate('c')
+
+    body, status, headers = e.value.response()
+    assert status == 429 and headers == {'Retry-After': '1'} and body['reason'] == 'key_rate_limited'
+    stats = admission.stats()
+    assert stats['rejected_client_rate'] == 1 and stats['rejected_key_rate'] == 1
+    assert stats['tracked_clients'] == 5 and stats['tracked_keys'] == 1
+
+
+def test_concurrency_gate_queues_then_sheds():
+    """名额占满后排队，队列满立即 503，排队超时 503；释放的名额直接转给队首"""
+    admission = AdmissionController(client_rate=0, max_active=1, max_queue=1, queue_timeout=5)
+    release = threading.Event()
+    entered = []
+
+    def worker(name):
+        with admission.slot():
+            entered.append(name)
+            release.wait(5)
+
+    holder = threading.Thread(target=worker, args=('first',))
+    holder.start()
+    while admission.stats()['active'] < 1:
+        pass
+    waiter = threading.Thread(target=worker, args=('second',))
+    waiter.start()
+    while admission.stats()['waiting'] < 1:
+        pass
+
+    with pytest.raises(Rejected) as e:
+        with admission.slot():
+            pass
+    assert e.value.status == 503 and e.value.reason == 'queue_full' and e.value.retry_after == 5
+
+    release.set()
+    holder.join(5)
+    waiter.join(5)
+    assert entered == ['first', 'second']
+
+    short = AdmissionController(client_rate=0, max_active=1, max_queue=4, queue_timeout=0.05)
+    with short.slot():
+        with pytest.raises(Rejected) as e:
+            with short.slot():
+                pass
+    assert e.value.reason == 'queue_timeout'
+
+    stats = admission.stats()
+    assert stats['admitted'] == 2 and stats['queued'] == 1 and stats['rejected_queue_full'] == 1
+    assert stats['active'] == 0 and stats['waiting'] == 0 and stats['peak_active'] == 1
+    assert short.stats()['rejected_queue_timeout'] == 1 and short.stats()['waiting'] == 0
+
+
+def test_async_gate_and_cancelled_waiters():
+    """协程入口：同时执行数不超过上限；排队中被取消的请求离开队列，不占名额"""
+    admission = AdmissionController(client_rate=0, max_active=2, max_queue=20, queue_timeout=5)
+    state = {'active': 0, 'peak': 0}
+
+    async def handler():
+        async with admission.slot_async():
+            state['active'] += 1
+            state['peak'] = max(state['peak'], state['active'])
+            await asyncio.sleep(0.01)
+            state['active'] -= 1
+
+    async def main():
+        await asyncio.gather(*(handler() for _ in range(10)))
+        async with admission.slot_async():
+            async with admission.slot_async():
+                leaver = asyncio.ensure_future(handler())
+                await asyncio.sleep(0.01)
+                assert admission.stats()['waiting'] == 1
+                leaver.cancel()
+                await asyncio.gather(leaver, return_exceptions=True)
+                assert leaver.cancelled() and admission.stats()['waiting'] == 0
+
+    asyncio.run(main())
+    stats = admission.stats()
+    assert state['peak'] == 2 and stats['active'] == 0 and stats['waiting'] == 0
+    assert stats['admitted'] == 12
+
+
+def test_identify_trusts_only_configured_proxies_and_keys():
+    """只有来自受信任代理的请求才读 X-Forwarded-For（从右数第 N 跳）；未登记的密钥不算数"""
+    admission = AdmissionController(trusted_proxies=['10.0.0.0/8'], forwarded_hops=2, api_keys=['good'])
+    spoofed = {'X-Forwarded-For': '1.1.1.1, 9.9.9.9'}
+    assert admission.identify(spoofed, '203.0.113.5') == ('203.0.113.5', None)
+    # 两层代理：最右边是内层代理写入的外层代理地址，从右数第2个才是客户端；更左边的是客户端自己填的
+    assert admission.identify({'X-Forwarded-For': '6.6.6.6, 198.51.100.7, 10.1.1.1'}, '10.0.0.2') == \
+        ('198.51.100.7', None)
+    assert admission.identify({'X-Forwarded-For': '198.51.100.7'}, '10.0.0.2') == ('198.51.100.7', None)
+    assert admission.identify({'X-API-Key': 'good'}, None, {'api_key': 'other'}) == ('unknown', 'good')
+    assert admission.identify({}, '203.0.113.5', {'api_key': 'made-up'}) == ('203.0.113.5', None)
+    assert AdmissionController().identify(spoofed, 'not-an-ip') == ('not-an-ip', None)
+
+
+def test_request_quota_cap_stops_calls_and_keeps_partial_results():
+    """单请求配额上限：超出后的调用不发出，记 budget 错误，已翻到的搜索页保留"""
+    stub = StubYouTube(corpus_size=2000)
+    analyzer = YouTubeAnalyzer('CAP_KEY', quiet=True, youtube=stub, quota_limit=250)
+    ids = analyzer.search_videos('life hacks', max_results=200)
+    assert len(ids) == 100 and stub.calls['search.list'] == 2
+    assert analyzer.quota_spent == 200
+    assert analyzer.errors[-1]['kind'] == BUDGET and analyzer.errors[-1]['reason'] == 'requestQuotaCap'
+
+    # 批量模式：超出上限的子请求不打包发送
+    with FakeYouTubeServer(corpus_size=1000) as server:
+        analyzer = YouTubeAnalyzer('CAP_BATCH_KEY', quiet=True, api_endpoint=server.url,
+                                   breaker=CircuitBreaker(), batch_requests=True, quota_limit=5)
+        videos = analyzer.get_video_details([video_id_for(i) for i in range(400)])
+        assert server.stats()['quota_used']['CAP_BATCH_KEY'] == 5
+    assert len(videos) == 250 and analyzer.quota_spent == 5
+    assert {e['kind'] for e in analyzer.errors} == {BUDGET}
+
+
+def test_web_app_returns_429_with_retry_after(tmp_path, monkeypatch):
+    """/api/analyze 超出客户端限流时返回 429 和 Retry-After，计数可从接口查看"""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.delenv('YOUTUBE_API_KEY', raising=False)
+    monkeypatch.delenv('YOUTUBE_API_KEYS', raising=False)
+    web_app = importlib.reload(importlib.import_module('web_app'))
+    monkeypatch.setattr(web_app, 'ADMISSION', AdmissionController(client_rate=0.5, client_burst=2))
+    client = web_app.app.test_client()
+
+    assert [client.get('/api/analyze?value=diy').status_code for _ in range(2)] == [400, 400]
+    resp = client.get('/api/analyze?value=diy')
+    assert resp.status_code == 429 and resp.headers['Retry-After'] == '2'
+    assert resp.get_json()['reason'] == 'client_rate_limited'
+    # 伪造 X-Forwarded-For 或随便编一个密钥都绕不过限流
+    for headers in ({'X-Forwarded-For': '8.8.8.8'}, {'X-Forwarded-For': '8.8.4.4, 1.2.3.4'},
+                    {'X-API-Key': 'made-up'}):
+        assert client.get('/api/analyze?value=diy', headers=headers).status_code == 429
+    stats = client.get('/api/admission/stats').get_json()
+    assert stats['admitted'] == 2 and stats['rejected_client_rate'] == 4 and stats['tracked_clients'] == 1
+
+    # 部署在受信任代理后面时，代理写入的地址才区分客户端
+    monkeypatch.setattr(web_app, 'ADMISSION', AdmissionController(client_rate=0.5, client_burst=1,
+                                                                  trusted_proxies=['127.0.0.1']))
+    assert client.get('/api/analyze?value=diy', headers={'X-Forwarded-For': '8.8.8.8'}).status_code == 400
+    assert client.get('/api/analyze?value=diy', headers={'X-Forwarded-For': '8.8.8.8'}).status_code == 429
+    assert client.get('/api/analyze?value=diy', headers={'X-Forwarded-For': '9.9.9.9'}).status_code == 400
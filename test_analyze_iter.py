@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""测试流式 analyze_iter：结果一致、提前结束时翻页线程停下"""
+
+import io
+import json
+import time
+
+from cli import run_jobs
+from resilience import CircuitBreaker
+from youtube_analyzer import YouTubeAnalyzer
+from youtube_stub import StubYouTube
+
+FILTERS = dict(min_views=10000, min_engagement=1.0, max_days=3650, min_duration=0, max_duration=10 ** 6)
+CHANNEL = 'UC' + '0' * 22
+
+
+def _analyzer(stub: StubYouTube) -> YouTubeAnalyzer:
+    return YouTubeAnalyzer('ITER_KEY', quiet=True, youtube=stub, breaker=CircuitBreaker())
+
+
+def test_iter_matches_analyze():
+    """频道与关键词两种输入，流式产出的视频集合与 analyze 的筛选结果相同"""
+    for input_type, value in (('channel', CHANNEL), ('keyword', 'diy')):
+        batch = _analyzer(StubYouTube(corpus_size=400)).analyze(
+            input_type, value, max_results=400, export=False, **FILTERS)
+        analyzer = _analyzer(StubYouTube(corpus_size=400))
+        streamed = list(analyzer.analyze_iter(input_type, value, max_results=400, **FILTERS))
+        assert sorted(v['video_id'] for v in streamed) == sorted(v['video_id'] for v in batch)
+        stats = analyzer.last_iter_stats
+        assert stats['pages'] == 8 and stats['yielded'] == len(streamed)
+        assert stats['first_result_s'] is not None and stats['first_result_s'] <= stats['elapsed_s']
+        # analyze_iter 的 span 覆盖整个消费过程，详情抓取记在它下面
+        records = analyzer.tracer.export()
+        span = [r for r in records if r['name'] == 'analyze_iter']
+        assert len(span) == 1 and span[0]['attrs']['count'] == len(streamed)
+        details = [r for r in records if r['attrs'].get('method') == 'videos.list']
+        assert details and {r['parent'] for r in details} == {'analyze_iter'}
+
+
+def test_early_stop_bounds_paging():
+    """只取第一条就结束时，翻页线程受有界队列限制，不会把5000个视频的频道翻完"""
+    stub = StubYouTube(corpus_size=5000)
+    analyzer = _analyzer(stub)
+    stream = analyzer.analyze_iter('channel', CHANNEL, max_results=5000, queue_pages=2,
+                                   min_views=0, min_engagement=0, max_days=3650,
+                                   min_duration=0, max_duration=10 ** 6)
+    first = next(stream)
+    stream.close()
+    assert first['video_id']
+    assert stub.calls['playlistItems.list'] <= 5
+    assert stub.calls['videos.list'] == 1
+
+
+class SlowPagingStub(StubYouTube):
+    """第一页之后的搜索翻页都很慢（模拟卡在慢调用或退避重试里）"""
+
+    def respond(self, method, params):
+        if method == 'search.list' and params.get('pageToken'):
+            time.sleep(5)
+        return super().respond(method, params)
+
+
+def test_close_does_not_wait_for_slow_page():
+    """翻页线程卡在慢调用里时，提前结束不会等它把调用做完"""
+    analyzer = _analyzer(SlowPagingStub(corpus_size=500))
+    stream = analyzer.analyze_iter('keyword', 'diy', max_results=500, min_views=0, min_engagement=0,
+                                   max_days=3650, min_duration=0, max_duration=10 ** 6)
+    assert next(stream)['video_id']
+    started = time.perf_counter()
+    stream.close()
+    assert time.perf_counter() - started < 3
+    assert analyzer.last_iter_stats['yielded'] == 1
+
+
+def test_cli_stream_mode():
+    """命令行 --stream 逐条输出、没有 rank，汇总记录计数正确"""
+    options = dict(FILTERS, max_results=120, cpm_low=2.0, cpm_high=4.0)
+    out = io.StringIO()
+    code = run_jobs([{'type': 'channel', 'value': CHANNEL}], options,
+                    lambda settings: _analyzer(StubYouTube(corpus_size=120)), out, stream=True)
+    records = [json.loads(line) for line in out.getvalue().splitlines()]
+    videos = [r for r in records if r['record'] == 'video']
+    assert code == 0 and videos and 'rank' not in videos[0]
+    assert records[-1]['record'] == 'job' and records[-1]['count'] == len(videos)
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""测试异步分析路径：相同查询合并、线程池上限、异常传播，以及 ASGI 入口与 Flask 入口的接口一致"""
+
+import asyncio
+import importlib
+import json
+import threading
+import time
+
+import pytest
+
+from async_analyzer import AsyncAnalyzeRunner
+from fake_youtube_server import FakeYouTubeServer
+
+
+def test_identical_requests_coalesce():
+    """执行期间到达的相同查询只分析一次，所有等待者拿到同一份结果"""
+    runner = AsyncAnalyzeRunner(max_workers=4)
+    calls = []
+
+    def analyze(value):
+        calls.append(value)
+        time.sleep(0.05)
+        return {'value': value}
+
+    async def main():
+        return await asyncio.gather(*(runner.run(('diy',), analyze, 'diy') for _ in range(200)))
+
+    results = asyncio.run(main())
+    assert calls == ['diy']
+    assert all(r is results[0] for r in results)
+    stats = runner.stats()
+    assert stats['submitted'] == 1 and stats['coalesced'] == 199
+    assert stats['completed'] == 1 and stats['inflight_keys'] == 0
+    runner.close()
+
+
+def test_thread_pool_bounds_concurrency():
+    """不同查询超出线程池大小时在事件循环里排队，同时执行的分析数不超过上限"""
+    runner = AsyncAnalyzeRunner(max_workers=3)
+    lock = threading.Lock()
+    state = {'active': 0, 'peak': 0}
+
+    def analyze(i):
+        with lock:
+            state['active'] += 1
+            state['peak'] = max(state['peak'], state['active'])
+        time.sleep(0.02)
+        with lock:
+            state['active'] -= 1
+        return i
+
+    async def main():
+        return await asyncio.gather(*(runner.run(None, analyze, i) for i in range(12)))
+
+    assert asyncio.run(main()) == list(range(12))
+    assert state['peak'] == 3
+    stats = runner.stats()
+    assert stats['peak_active'] == 3 and stats['completed'] == 12 and stats['queued'] == 0
+    runner.close()
+
+
+def test_errors_reach_every_waiter_and_free_the_key():
+    """分析抛错时所有合并的等待者都收到异常，之后相同查询重新执行"""
+    runner = AsyncAnalyzeRunner(max_workers=2)
+    attempts = []
+
+    def analyze():
+        attempts.append(1)
+        time.sleep(0.02)
+        if len(attempts) == 1:
+            raise RuntimeError('boom')
+        return 'ok'
+
+    async def main():
+        first = await asyncio.gather(*(runner.run('k', analyze) for _ in range(5)), return_exceptions=True)
+        second = await runner.run('k', analyze)
+        return first, second
+
+    first, second = asyncio.run(main())
+    assert all(isinstance(r, RuntimeError) for r in first)
+    assert second == 'ok' and len(attempts) == 2
+    assert runner.stats()['failed'] == 1
+    runner.close()
+
+
+def test_cancelled_waiter_does_not_cancel_shared_run():
+    """一个客户端断开（等待被取消）不影响合并在同一次执行上的其他请求"""
+    runner = AsyncAnalyzeRunner(max_workers=1)
+
+    def analyze():
+        time.sleep(0.05)
+        return 'done'
+
+    async def main():
+        leaver = asyncio.ensure_future(runner.run('k', analyze))
+        stayer = asyncio.ensure_future(runner.run('k', analyze))
+        await asyncio.sleep(0.01)
+        leaver.cancel()
+        return await stayer, leaver.cancelled()
+
+    assert asyncio.run(main()) == ('done', True)
+    runner.close()
+
+
+def _asgi_get(app, path: str, query: str = ''):
+    """直接按 ASGI 协议调用应用，返回 (状态码, 响应头, 响应体)"""
+    messages = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET',
+             'scheme': 'http', 'path': path, 'raw_path': path.encode(), 'query_string': query.encode(),
+             'root_path': '', 'headers': [(b'host', b'testserver')], 'client': ('127.0.0.1', 1),
+             'server': ('testserver', 80)}
+    asyncio.run(app(scope, receive, send))
+    start = next(m for m in messages if m['type'] == 'http.response.start')
+    body = b''.join(m.get('body', b'') for m in messages if m['type'] == 'http.response.body')
+    return start['status'], dict(start['headers']), body
+
+
+def test_asgi_app_matches_flask_contract(tmp_path, monkeypatch):
+    """ASGI 入口的 /、/api/analyze、/api/suggestions、/health 与 Flask 入口返回相同的内容"""
+    pytest.importorskip('starlette')
+    server = FakeYouTubeServer(corpus_size=40).start()
+    try:
+        monkeypatch.chdir(tmp_path)
+        monkeypatch.setenv('YOUTUBE_API_ENDPOINT', server.url)
+        monkeypatch.setenv('YOUTUBE_API_KEY', 'asgi-contract-key')
+        monkeypatch.delenv('YOUTUBE_API_KEYS', raising=False)
+        web_app = importlib.reload(importlib.import_module('web_app'))
+        asgi_app = importlib.reload(importlib.import_module('asgi_app'))
+        client = web_app.app.test_client()
+
+        status, headers, body = _asgi_get(asgi_app.app, '/health')
+        assert status == 200 and json.loads(body) == {'status': 'ok'}
+        status, _, body = _asgi_get(asgi_app.app, '/api/suggestions')
+        assert json.loads(body) == client.get('/api/suggestions').get_json()
+        status, headers, body = _asgi_get(asgi_app.app, '/')
+        assert status == 200 and body.decode('utf-8') == client.get('/').get_data(as_text=True)
+
+        status, _, body = _asgi_get(asgi_app.app, '/api/analyze', 'value=')
+        assert status == 400 and json.loads(body) == client.get('/api/analyze?value=').get_json()
+
+        query = 'value=life+hacks&max_results=20&min_views=0&min_engagement=0&max_days=3650&min_duration=0'
+        status, _, body = _asgi_get(asgi_app.app, '/api/analyze', query)
+        expected = client.get(f'/api/analyze?{query}').get_json()
+        result = json.loads(body)
+        assert status == 200 and result['count'] == expected['count'] > 0
+        assert [v['video_id'] for v in result['items']] == [v['video_id'] for v in expected['items']]
+        assert result['params'] == expected['params']
+        asgi_app.RUNNER.close()
+    finally:
+        server.stop()
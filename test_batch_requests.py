@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""测试批量模式（BatchHttpRequest 合并往返）"""
+
+from fake_youtube_server import FakeYouTubeServer
+from resilience import RATE_LIMIT, CircuitBreaker, RetryPolicy
+from youtube_analyzer import YouTubeAnalyzer
+from youtube_stub import video_id_for
+
+CHANNELS = ['https://www.youtube.com/@first', 'UC' + '1' * 22,
+            'https://www.youtube.com/channel/UC' + '2' * 22, 'not a channel']
+
+
+def _analyzer(server, key, batch=True, **kwargs):
+    return YouTubeAnalyzer(key, quiet=True, api_endpoint=server.url, breaker=CircuitBreaker(),
+                           batch_requests=batch, **kwargs)
+
+
+def test_batch_mode_matches_sequential_with_fewer_round_trips():
+    """批量模式的结果与逐个调用一致，子请求照常计配额，但往返次数少得多"""
+    ids = [video_id_for(i) for i in range(400)]
+    with FakeYouTubeServer(corpus_size=1000) as server:
+        sequential = _analyzer(server, 'SEQ_KEY', batch=False)
+        expected = (sequential.get_video_details(ids), sequential.get_channels_videos(CHANNELS, 120),
+                    sequential.search_many(['diy', 'pets'], 80))
+        server.reset()
+
+        batched = _analyzer(server, 'BATCH_KEY')
+        videos = batched.get_video_details(ids)
+        channels = batched.get_channels_videos(CHANNELS, 120)
+        searches = batched.search_many(['diy', 'pets'], 80)
+        stats = server.stats()
+    assert (videos, channels, searches) == expected and not batched.errors
+    assert len(channels[CHANNELS[0]]) == 120 and channels['not a channel'] == []
+    # 详情1次 + 播放列表3页 + 搜索2页；只有一个调用的步骤（handle、uploads）直接发送
+    assert stats['batch_requests'] == 6
+    assert stats['requests']['videos.list'] == 8 and stats['requests']['playlistItems.list'] == 9
+    assert stats['quota_used']['BATCH_KEY'] == 8 + 2 + 9 + 400
+
+
+def test_sub_request_errors_are_isolated_and_retried():
+    """子请求各自失败：可重试的错误退避后重新打包，重试用完后只有失败的那部分记错误标记"""
+    slept = []
+    policy = RetryPolicy(max_attempts=3, sleep=slept.append)
+    ids = [video_id_for(i) for i in range(500)]
+    with FakeYouTubeServer(corpus_size=1000, rate_limit_rate=0.3, seed=7) as server:
+        analyzer = _analyzer(server, 'BATCH_FLAKY', retry_policy=policy)
+        videos = analyzer.get_video_details(ids)
+        assert server.stats()['batch_requests'] >= 2 and slept
+    failed = {vid for error in analyzer.errors for vid in error['video_ids']}
+    assert all(error['kind'] == RATE_LIMIT for error in analyzer.errors)
+    assert len(videos) + len(failed) == 500
+    assert not failed & {v['video_id'] for v in videos}
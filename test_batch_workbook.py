@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""测试批量分析的合并工作簿"""
+
+import io
+
+import openpyxl
+
+from batch_workbook import SUMMARY_SHEET, BatchWorkbook
+from cli import EXIT_OK, run_jobs
+from resilience import CircuitBreaker
+from youtube_analyzer import YouTubeAnalyzer
+from youtube_stub import StubYouTube, synthetic_video_item
+
+
+def _videos(n: int):
+    analyzer = YouTubeAnalyzer('WORKBOOK_KEY', quiet=True, youtube=object())
+    return [analyzer._parse_video_data(synthetic_video_item(i)) for i in range(n)]
+
+
+def test_sheets_and_summary(tmp_path):
+    """每个关键词一个工作表，汇总表排第一；非法/重名工作表名被改写，空结果计为0"""
+    videos = _videos(30)
+    path = tmp_path / 'out' / 'batch.xlsx'
+    with BatchWorkbook(str(path)) as workbook:
+        assert workbook.add('a/b?', videos[:20]) == 'a_b_'
+        workbook.add('empty', [])
+        assert workbook.add('A_B_', videos[10:]) == 'A_B_ (2)'
+
+    book = openpyxl.load_workbook(path)
+    assert book.sheetnames == [SUMMARY_SHEET, 'a_b_', 'empty', 'A_B_ (2)']
+    assert [ws.max_row for ws in book.worksheets[1:]] == [21, 1, 21]
+    assert book['a_b_']['A1'].value == '热度指数' and book['a_b_']['R2'].value == videos[0]['video_id']
+
+    rows = list(book[SUMMARY_SHEET].iter_rows(min_row=2, values_only=True))
+    assert [row[0] for row in rows] == ['a/b?', 'empty', 'A_B_']
+    assert [row[2] for row in rows] == [20, 0, 20]
+    assert [row[9] for row in rows] == [10, 0, 10]
+    assert rows[0][3] == sum(v['view_count'] for v in videos[:20])
+    assert rows[0][10] == max(videos[:20], key=lambda v: v['heat_score'])['title']
+
+
+def test_cli_jobs_into_one_workbook(tmp_path):
+    """并行任务写进同一个工作簿，任务汇总记录带工作表名"""
+    def make_analyzer(settings):
+        return YouTubeAnalyzer('WORKBOOK_CLI_KEY', quiet=True, youtube=StubYouTube(corpus_size=40),
+                               breaker=CircuitBreaker())
+
+    options = {'max_results': 20, 'min_views': 0, 'min_engagement': 0.0, 'max_days': 3650,
+               'min_duration': 0, 'max_duration': 10 ** 6}
+    jobs = [{'type': 'keyword', 'value': 'diy'}, {'type': 'keyword', 'value': 'pets'}]
+    workbook = BatchWorkbook(str(tmp_path / 'jobs.xlsx'))
+    out = io.StringIO()
+    assert run_jobs(jobs, options, make_analyzer, out, parallel=2, workbook=workbook) == EXIT_OK
+    assert '"sheet": "diy"' in out.getvalue()
+    book = openpyxl.load_workbook(workbook.close())
+    assert sorted(book.sheetnames[1:]) == ['diy', 'pets']
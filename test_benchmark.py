@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""测试离线API桩与基准对比逻辑"""
+
+import json
+
+from benchmark import compare, main, measure
+from youtube_analyzer import YouTubeAnalyzer
+from youtube_stub import FixtureYouTube, RecordingYouTube, StubYouTube, synthetic_video_item
+
+
+def test_analyze_offline_with_stub():
+    """注入桩后完整 analyze 流程不联网也能跑通"""
+    stub = StubYouTube(corpus_size=120)
+    analyzer = YouTubeAnalyzer('TEST_KEY', quiet=True, youtube=stub)
+    results = analyzer.analyze('channel', 'UC' + '0' * 22, max_results=120,
+                               min_views=0, min_engagement=0, export=False)
+    assert results
+    assert stub.calls['playlistItems.list'] == 3
+    assert stub.calls['videos.list'] == 3
+    heat = [v['heat_score'] for v in results]
+    assert heat == sorted(heat, reverse=True)
+
+
+def test_record_and_replay(tmp_path):
+    """录制的响应可以被回放桩原样返回"""
+    recorder = RecordingYouTube(StubYouTube(corpus_size=10))
+    analyzer = YouTubeAnalyzer('TEST_KEY', quiet=True, youtube=recorder)
+    ids = analyzer.search_videos('life hacks', 10)
+    original = analyzer.get_video_details(ids)
+    path = tmp_path / 'fixture.json'
+    recorder.save(str(path))
+
+    replay = YouTubeAnalyzer('TEST_KEY', quiet=True, youtube=FixtureYouTube(str(path)))
+    assert replay.search_videos('life hacks', 10) == ids
+    assert [v['video_id'] for v in replay.get_video_details(ids)] == [v['video_id'] for v in original]
+
+
+def test_compare_detects_regression():
+    """超过阈值且超过绝对容差才算回退"""
+    baseline = {'filter_videos@1000': {'wall_s': 0.1, 'peak_mb': 10.0}}
+    ok = [{'stage': 'filter_videos', 'n': 1000, 'wall_s': 0.11, 'peak_mb': 10.5}]
+    slow = [{'stage': 'filter_videos', 'n': 1000, 'wall_s': 0.2, 'peak_mb': 30.0}]
+    assert compare(ok, baseline, 0.25) == []
+    assert len(compare(slow, baseline, 0.25)) == 2
+
+
+def test_measure_parse_stage():
+    """解析阶段计时与内存峰值都有结果"""
+    templates = [synthetic_video_item(i) for i in range(20)]
+    result = measure('_parse_video_data', 100, templates)
+    assert result['n'] == 100
+    assert result['wall_s'] > 0
+    assert result['peak_mb'] is not None
+
+
+def test_measure_and_baseline_roundtrip(tmp_path):
+    """保存基线后再次运行对比通过"""
+    baseline = tmp_path / 'baseline.json'
+    argv = ['--sizes', '200', '--stages', 'filter_videos,analyze', '--baseline', str(baseline)]
+    assert main(argv + ['--save-baseline']) == 0
+    saved = json.loads(baseline.read_text(encoding='utf-8'))['results']
+    assert set(saved) == {'filter_videos@200', 'analyze@200'}
+    assert main(argv + ['--threshold', '100']) == 0
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""测试频道相对爆款检测"""
+
+import numpy as np
+
+from breakout import BreakoutAnalyzer, group_medians, score_breakouts
+from resilience import CircuitBreaker
+from youtube_analyzer import YouTubeAnalyzer
+from youtube_stub import StubYouTube
+
+
+def _video(channel: str, views: int, days: int = 10) -> dict:
+    return {'channel_id': channel, 'channel_title': channel, 'view_count': views,
+            'days_since_published': days}
+
+
+def test_group_medians_match_numpy():
+    """向量化分组中位数与逐组 np.median 一致（含奇偶长度）"""
+    rng = np.random.default_rng(0)
+    codes = rng.integers(0, 50, size=2000)
+    values = rng.lognormal(8, 2, size=2000)
+    medians = group_medians(codes, values, 50)
+    for g in range(50):
+        assert np.isclose(medians[g], np.median(values[codes == g]))
+
+
+def test_outlier_flagged_relative_to_own_channel():
+    """6万播放在小频道是爆款，在大频道不是"""
+    small = [_video('small', v) for v in (5000, 5200, 4800, 5100, 4900, 5300, 60000)]
+    big = [_video('big', v) for v in (5000000, 5200000, 4800000, 5100000, 4900000, 60000 * 100)]
+    breakouts = score_breakouts(small + big)
+    assert [v['view_count'] for v in breakouts] == [60000]
+    assert breakouts[0]['breakout_ratio'] > 10
+    assert big[-1]['is_breakout'] is False
+
+
+def test_short_history_not_scored():
+    """样本不足的频道不建立基线"""
+    videos = [_video('tiny', 100), _video('tiny', 100000)]
+    assert score_breakouts(videos) == []
+    assert videos[1]['breakout_z'] is None
+
+
+def test_collect_packs_details_across_channels():
+    """多频道合并去重后按50个一批获取详情，按真实频道ID分组"""
+    stub = StubYouTube(corpus_size=2000)
+    analyzer = YouTubeAnalyzer('BREAKOUT_KEY', quiet=True, youtube=stub, breaker=CircuitBreaker())
+    detector = BreakoutAnalyzer(analyzer, window_days=365)
+    channels = [f"UC{i:022d}" for i in range(3)]
+    detector.run(channels, max_per_channel=1000)
+    assert stub.calls['videos.list'] == 20
+    assert stub.calls['channels.list'] == 3
+    assert analyzer.tracer.summary()['score_breakouts']['count'] == 1
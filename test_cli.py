@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""测试非交互命令行的任务文件、NDJSON输出与退出码"""
+
+import io
+import json
+
+import pytest
+
+from cli import EXIT_FAILED, EXIT_OK, EXIT_PARTIAL, EXIT_USAGE, load_jobs, main, parse_job_line, run_jobs
+from fake_youtube_server import FakeYouTubeServer
+from resilience import CircuitBreaker
+from youtube_analyzer import YouTubeAnalyzer
+from youtube_stub import StubYouTube
+
+OPTIONS = {'max_results': 30, 'min_views': 0, 'min_engagement': 0.0, 'max_days': 3650,
+           'min_duration': 0, 'max_duration': 10 ** 6, 'cpm_low': 2.0, 'cpm_high': 4.0}
+
+
+def _records(text: str):
+    return [json.loads(line) for line in text.splitlines()]
+
+
+def test_job_file_formats(tmp_path):
+    """纯文本行、带前缀的行、JSON 行与 JSON 数组都能解析，非法参数报出行号"""
+    assert parse_job_line('  # comment ') is None
+    assert parse_job_line('life hacks') == {'type': 'keyword', 'value': 'life hacks'}
+    assert parse_job_line('Channel: UC123') == {'type': 'channel', 'value': 'UC123'}
+    assert parse_job_line('{"value": "diy", "min_views": "10", "dedup": "false"}') == \
+        {'type': 'keyword', 'value': 'diy', 'min_views': 10, 'dedup': False}
+
+    path = tmp_path / 'jobs.txt'
+    path.write_text('diy\n\n{"value": "x", "bogus": 1}\n', encoding='utf-8')
+    with pytest.raises(ValueError, match='jobs.txt:3'):
+        load_jobs(str(path))
+    path = tmp_path / 'jobs.json'
+    path.write_text('[{"type": "local", "value": "tips"}]', encoding='utf-8')
+    assert load_jobs(str(path)) == [{'type': 'local', 'value': 'tips'}]
+
+
+def test_parallel_jobs_stream_ndjson_and_exit_codes():
+    """每个任务输出视频记录加一条汇总记录；有任务失败时退出码为部分失败"""
+    def make_analyzer(settings):
+        return YouTubeAnalyzer('CLI_KEY', quiet=True, youtube=StubYouTube(corpus_size=60),
+                               breaker=CircuitBreaker(), cpm_low=settings['cpm_low'],
+                               cpm_high=settings['cpm_high'])
+
+    jobs = [{'type': 'keyword', 'value': 'diy'},
+            {'type': 'keyword', 'value': 'cooking', 'max_results': 10, 'cpm_high': 8.0}]
+    out = io.StringIO()
+    assert run_jobs(jobs, OPTIONS, make_analyzer, out, parallel=2) == EXIT_OK
+    records = _records(out.getvalue())
+    summaries = {r['input_value']: r for r in records if r['record'] == 'job'}
+    videos = [r for r in records if r['record'] == 'video']
+    assert summaries['diy']['status'] == 'ok' and summaries['cooking']['count'] <= 10
+    assert len(videos) == sum(s['count'] for s in summaries.values())
+    cooking = [v for v in videos if v['input_value'] == 'cooking']
+    assert [v['rank'] for v in cooking] == list(range(1, len(cooking) + 1))
+    assert cooking[0]['revenue_high'] == round(cooking[0]['view_count'] / 1000 * 8.0, 2)
+
+    def flaky(settings):
+        if settings['max_results'] == 10:
+            raise RuntimeError('boom')
+        return make_analyzer(settings)
+
+    out = io.StringIO()
+    assert run_jobs(jobs, OPTIONS, flaky, out) == EXIT_PARTIAL
+    assert run_jobs(jobs[1:], OPTIONS, flaky, io.StringIO()) == EXIT_FAILED
+    failed = [r for r in _records(out.getvalue()) if r.get('status') == 'failed']
+    assert failed[0]['errors'][0]['message'] == 'boom'
+
+
+def test_main_against_fake_server(monkeypatch, capsys):
+    """命令行端到端：模拟服务器 + 环境变量密钥；缺少密钥时返回参数错误"""
+    monkeypatch.delenv('YOUTUBE_API_KEYS', raising=False)
+    monkeypatch.delenv('YOUTUBE_API_KEY', raising=False)
+    assert main(['keyword', 'diy', '--config', '', '--index', '']) == EXIT_USAGE
+
+    with FakeYouTubeServer(corpus_size=80) as server:
+        monkeypatch.setenv('YOUTUBE_API_ENDPOINT', server.url)
+        monkeypatch.setenv('YOUTUBE_API_KEY', 'CLI_MAIN_KEY')
+        code = main(['keyword', 'diy', 'pets', '--min-views', '0', '--min-engagement', '0',
+                     '--max-days', '3650', '--max-duration', '100000', '-j', '2',
+                     '--config', '', '--index', '', '--history', '', '--search-cache', '', '--no-progress'])
+    assert code == EXIT_OK
+    records = _records(capsys.readouterr().out)
+    assert sorted(r['input_value'] for r in records if r['record'] == 'job') == ['diy', 'pets']
+    assert any(r['record'] == 'video' for r in records)
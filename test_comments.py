@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""测试评论抽样与流式词法统计"""
+
+import pandas as pd
+
+from comments import CommentStats, TopKSketch
+from fake_youtube_server import FakeYouTubeServer
+from resilience import CircuitBreaker
+from youtube_analyzer import YouTubeAnalyzer
+from youtube_stub import StubYouTube
+
+
+def test_comment_stats_streaming():
+    """提问比例、语言构成、高频词与二元词组"""
+    stats = CommentStats()
+    for text in ["Does this air fryer really work?", "This air fryer trick is amazing",
+                 "Me encanta este air fryer, muy bueno", "这个太实用了"]:
+        stats.add(text, like_count=4)
+    summary = stats.to_dict()
+    assert summary['sample_size'] == 4
+    assert summary['question_ratio'] == 0.25
+    assert summary['languages'] == {'en': 0.5, 'es': 0.25, 'zh': 0.25}
+    assert summary['top_terms'][:2] == ['air', 'fryer']
+    assert summary['top_bigrams'][0] == 'air fryer'
+    assert summary['avg_likes'] == 4
+
+
+def test_sketch_memory_is_bounded():
+    """草图大小不随不同词数增长，真实高频项保留"""
+    sketch = TopKSketch(capacity=32)
+    for i in range(10000):
+        sketch.add('popular')
+        sketch.add(f"rare{i}")
+    assert len(sketch.counts) <= 32
+    assert sketch.top(1)[0][0] == 'popular'
+
+
+def test_sample_comments_with_quota_budget():
+    """只抽样前K个视频，分页受每视频上限和配额预算约束"""
+    stub = StubYouTube(corpus_size=200)
+    analyzer = YouTubeAnalyzer('COMMENT_KEY', quiet=True, youtube=stub, breaker=CircuitBreaker())
+    videos = analyzer.get_video_details([f"v{i:010d}" for i in range(20)])
+    videos.sort(key=lambda v: v['comment_count'], reverse=True)
+
+    analyzer.sample_comments(videos, top_k=3, per_video=150, quota_budget=100)
+    assert stub.calls['commentThreads.list'] == 6
+    assert all(v['comment_sample_size'] == 150 for v in videos[:3])
+    assert 'comment_stats' not in videos[3]
+    assert analyzer.last_comment_stats['quota_units'] == 6
+
+    analyzer.sample_comments(videos, top_k=5, per_video=300, quota_budget=4)
+    assert analyzer.last_comment_stats['quota_units'] == 4
+    assert analyzer.last_comment_stats['comments'] == 400
+
+
+def test_comment_columns_exported(tmp_path):
+    """通过模拟服务器完整分析，评论统计写入导出的Excel"""
+    with FakeYouTubeServer(corpus_size=100) as server:
+        analyzer = YouTubeAnalyzer('COMMENT_FAKE_KEY', quiet=True, api_endpoint=server.url)
+        results = analyzer.analyze('keyword', 'diy', max_results=50, min_views=0, min_engagement=0,
+                                   max_days=60, min_duration=0, max_duration=3600, export=False,
+                                   comments_top_k=2)
+        assert server.stats()['requests']['commentThreads.list'] >= 2
+    path = analyzer.export_to_excel(results, filename=str(tmp_path / 'out.xlsx'))
+    df = pd.read_excel(path)
+    assert '评论高频词' in df.columns
+    assert df['评论样本数'].notna().sum() == 2
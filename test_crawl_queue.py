@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""测试租约队列与并行抓取 worker"""
+
+import threading
+
+from crawl_queue import CrawlWorker, LeaseQueue, seed
+from local_index import LocalIndex
+from resilience import CircuitBreaker
+from youtube_analyzer import YouTubeAnalyzer
+from youtube_stub import StubYouTube
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_lease_lifecycle(tmp_path):
+    """去重入队、领取、续约、租约过期被他人接管、失败退避与重试上限、完成后重置"""
+    clock = FakeClock()
+    path = str(tmp_path / 'queue.db')
+    a, b = LeaseQueue(path, clock=clock, max_attempts=2), LeaseQueue(path, clock=clock)
+    assert a.enqueue('keyword', {'value': 'diy'})
+    assert not b.enqueue('keyword', {'value': 'diy'})
+
+    task = a.claim('worker-a', lease_seconds=60)
+    assert task['payload'] == {'value': 'diy'} and task['attempts'] == 1
+    assert b.claim('worker-b', lease_seconds=60) is None
+    clock.now += 50
+    assert a.heartbeat(task['id'], 'worker-a', lease_seconds=60)
+
+    # worker-a 崩溃：租约到期后 worker-b 接管，worker-a 迟到的完成无效
+    clock.now += 61
+    taken = b.claim('worker-b', lease_seconds=60)
+    assert taken['id'] == task['id'] and taken['attempts'] == 2
+    assert not a.complete(task['id'], 'worker-a')
+
+    # 用完尝试次数后标记失败；重新入队（refresh_after=0）后重置
+    assert b.fail(task['id'], 'worker-b', 'boom', backoff=10)
+    assert a.stats() == {'keyword': {'failed': 1}}
+    assert a.enqueue('keyword', {'value': 'diy'}, refresh_after=0)
+    task = a.claim('worker-a')
+    assert a.fail(task['id'], 'worker-a', 'boom', backoff=10)
+    assert a.claim('worker-a') is None
+    clock.now += 10
+    assert a.claim('worker-a')['attempts'] == 2
+
+
+def test_workers_crawl_into_shared_index(tmp_path):
+    """多个 worker 并行：发现任务拆成详情任务，结果写入共用索引，每批详情只抓一次"""
+    path = str(tmp_path / 'queue.db')
+    coordinator = LeaseQueue(path)
+    added = seed(coordinator, [{'type': 'keyword', 'value': 'diy'},
+                               {'type': 'channel', 'value': 'UC' + '0' * 22},
+                               {'type': 'local', 'value': 'ignored'}], max_results=150)
+    assert added == 2
+
+    index = LocalIndex(str(tmp_path / 'index.db'))
+    stub = StubYouTube(corpus_size=300)
+    workers = [CrawlWorker(LeaseQueue(path),
+                           YouTubeAnalyzer('CRAWL_KEY', quiet=True, youtube=stub, local_index=index,
+                                           breaker=CircuitBreaker()),
+                           worker_id=f"w{i}") for i in range(3)]
+    threads = [threading.Thread(target=w.run, kwargs={'poll_interval': 0.01, 'exit_when_idle': True})
+               for w in workers]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(30)
+
+    stats = coordinator.stats()
+    assert stats['keyword'] == {'done': 1} and stats['channel'] == {'done': 1}
+    assert stats['details'] == {'done': stub.calls['videos.list']}
+    assert sum(w.processed['done'] for w in workers) == 2 + stats['details']['done']
+    assert index.count() >= 150
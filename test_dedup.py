@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""测试近重复/重传聚类（MinHash + LSH）"""
+
+import random
+
+from dedup import cluster_duplicates, collapse_duplicates, normalize_text
+from resilience import CircuitBreaker
+from youtube_analyzer import YouTubeAnalyzer
+from youtube_stub import StubYouTube
+
+
+def _video(vid: str, title: str, seconds: int, heat: float, description: str = '') -> dict:
+    return {'video_id': vid, 'title': title, 'description': description,
+            'duration_seconds': seconds, 'heat_score': heat}
+
+
+def test_normalize_text_strips_reupload_noise():
+    """去掉大小写、标点、话题标签和常见重传噪声词"""
+    assert normalize_text('EASY Life-Hacks!!! #shorts (Official Video) https://t.co/x') == 'easy life hacks'
+
+
+def test_reuploads_collapse_to_strongest():
+    """标题改写的重传合并为一簇并保留热度最高的一条；时长差太多或内容不同的不合并"""
+    videos = [
+        _video('a', '10 Easy Life Hacks You Must Try At Home', 300, 100.0),
+        _video('b', '10 EASY LIFE HACKS you must try at home!!! #shorts (Reupload)', 302, 500.0),
+        _video('c', '10 easy life hacks you must try at home', 301, 50.0),
+        _video('d', '10 Easy Life Hacks You Must Try At Home', 900, 10.0),
+        _video('e', 'Crispy Air Fryer Chicken Wings Recipe', 300, 20.0),
+    ]
+    labels = cluster_duplicates(videos).tolist()
+    assert labels[0] == labels[1] == labels[2]
+    assert len(set(labels)) == 3
+
+    kept = collapse_duplicates(videos)
+    assert [v['video_id'] for v in kept] == ['b', 'd', 'e']
+    assert kept[0]['duplicate_count'] == 2
+    assert kept[0]['duplicate_ids'] == ['a', 'c']
+
+
+def test_distinct_titles_not_merged_at_scale():
+    """大量互不相同的标题中，只有植入的重复被合并"""
+    rng = random.Random(7)
+    vocab = [f"word{i}" for i in range(5000)]
+    videos = [_video(f"v{i}", ' '.join(rng.sample(vocab, 8)), rng.randint(60, 900), rng.random())
+              for i in range(5000)]
+    for i in range(100):
+        src = videos[i]
+        videos.append(_video(f"dup{i}", src['title'].upper() + ' #viral', src['duration_seconds'] + 1, 0.0))
+    labels = cluster_duplicates(videos)
+    assert len(set(labels.tolist())) == 5000
+    assert all(labels[5000 + i] == labels[i] for i in range(100))
+
+
+def test_analyze_with_dedup():
+    """analyze(dedup=True) 在筛选后合并重复并记录阶段耗时"""
+    analyzer = YouTubeAnalyzer('DEDUP_KEY', quiet=True, youtube=StubYouTube(corpus_size=500),
+                               breaker=CircuitBreaker())
+    results = analyzer.analyze('keyword', 'diy', max_results=500, min_views=0, min_engagement=0,
+                               max_days=60, min_duration=0, max_duration=3600, export=False, dedup=True)
+    assert results
+    assert all('duplicate_count' in v for v in results)
+    assert analyzer.tracer.summary()['dedup_videos']['count'] == 1
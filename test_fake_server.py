@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""测试本地模拟API服务器与压测统计"""
+
+import json
+import urllib.request
+
+from fake_youtube_server import FakeYouTubeServer
+from load_test import percentile
+from resilience import CircuitBreaker
+from youtube_analyzer import YouTubeAnalyzer
+
+
+def test_analyzer_against_fake_server():
+    """分析器通过 api_endpoint 连接模拟服务器完成完整流程"""
+    with FakeYouTubeServer(corpus_size=200) as server:
+        analyzer = YouTubeAnalyzer('FAKE_KEY', quiet=True, api_endpoint=server.url)
+        results = analyzer.analyze('keyword', 'life hacks', max_results=50,
+                                   min_views=0, min_engagement=0, export=False)
+        assert results
+        stats = server.stats()
+        assert stats['requests'] == {'search.list': 1, 'videos.list': 1}
+        assert stats['quota_used'] == {'FAKE_KEY': 101}
+
+
+def test_quota_exhaustion():
+    """超过每key配额后返回 403 quotaExceeded，分析器记录错误标记并熔断"""
+    with FakeYouTubeServer(quota_per_key=100) as server:
+        analyzer = YouTubeAnalyzer('QUOTA_KEY', quiet=True, api_endpoint=server.url,
+                                   breaker=CircuitBreaker())
+        assert len(analyzer.search_videos('diy', 10)) == 10
+        assert analyzer.search_videos('diy', 10) == []
+        assert analyzer.errors[-1]['kind'] == 'quota'
+        assert analyzer.search_videos('diy', 10) == []
+        assert analyzer.errors[-1]['kind'] == 'circuit_open'
+        with urllib.request.urlopen(f"{server.url}/_stats") as resp:
+            stats = json.loads(resp.read())
+        assert stats['responses'] == {'200': 1, '403': 1}
+
+
+def test_percentile():
+    """最近秩百分位"""
+    values = sorted(float(i) for i in range(1, 101))
+    assert percentile(values, 50) == 50.0
+    assert percentile(values, 99) == 99.0
+    assert percentile([], 95) == 0.0
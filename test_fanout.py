@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""测试扇出搜索：网格展开、配额预算、去重融合"""
+
+import pytest
+
+from youtube_analyzer import YouTubeAnalyzer
+from youtube_stub import StubYouTube
+
+
+def _analyzer(corpus_size: int = 2000):
+    stub = StubYouTube(corpus_size=corpus_size)
+    return YouTubeAnalyzer('TEST_KEY', quiet=True, youtube=stub), stub
+
+
+def test_fanout_grid_dedupes_and_ranks():
+    """地区 × 时长 × 日切片全部执行，结果去重且多路命中的视频排在前面"""
+    analyzer, stub = _analyzer()
+    ids = analyzer.fanout_search('life hacks', regions=['US', 'GB'], durations=['short', 'medium', 'long'],
+                                 window_days=3, slice_days=1, max_results_per_query=20, quota_budget=None)
+    stats = analyzer.last_fanout_stats
+    assert stub.calls['search.list'] == 2 * 3 * 3 == stats['queries_run']
+    assert len(ids) == len(set(ids)) == stats['unique_ids']
+    assert stats['hits'] == 18 * 20
+    assert stats['unique_ids'] > 20
+
+
+def test_fanout_respects_quota_budget():
+    """预算不足时只执行最新时间切片的子查询，并记录预算标记"""
+    analyzer, stub = _analyzer()
+    analyzer.fanout_search('diy', regions=['US', 'DE'], window_days=7, slice_days=1,
+                           max_results_per_query=10, quota_budget=500)
+    assert stub.calls['search.list'] == 5
+    assert analyzer.last_fanout_stats['queries_planned'] == 14
+    assert analyzer.errors[-1]['kind'] == 'budget'
+
+
+def test_fanout_rejects_unknown_duration():
+    """无效的时长分类直接报错"""
+    analyzer, _ = _analyzer()
+    with pytest.raises(ValueError):
+        analyzer.fanout_search('diy', durations=['tiny'])
+
+
+def test_analyze_fanout_mode():
+    """analyze 的 fanout 模式走完整流程并按传入的筛选条件过滤"""
+    analyzer, _ = _analyzer()
+    results = analyzer.analyze('fanout', 'cooking', max_results=50, min_views=0, min_engagement=0,
+                               export=False, max_days=30, min_duration=0, max_duration=24 * 3600,
+                               fanout={'regions': ['US', 'BR'], 'durations': ['short', 'long'],
+                                       'quota_budget': None})
+    assert len(results) == analyzer.last_fanout_stats['unique_ids']
+    heat = [v['heat_score'] for v in results]
+    assert heat == sorted(heat, reverse=True)
@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""测试连接池 HTTP 传输"""
+
+from benchmark import transport_latency
+from fake_youtube_server import FakeYouTubeServer
+from http_transport import PooledTransport, transport_from_config
+from resilience import QUOTA, TRANSIENT, CircuitBreaker, RetryPolicy
+from youtube_analyzer import YouTubeAnalyzer
+from youtube_stub import video_id_for
+
+
+def test_analyzers_share_keep_alive_connections():
+    """多个分析器共用一个传输时只建一个连接，结果与默认 httplib2 传输一致"""
+    ids = [video_id_for(i) for i in range(50)]
+    transport = PooledTransport(maxsize=2)
+    with FakeYouTubeServer(corpus_size=200) as server:
+        expected = YouTubeAnalyzer('TRANSPORT_KEY', quiet=True, api_endpoint=server.url,
+                                   breaker=CircuitBreaker()).get_video_details(ids)
+        server.reset()
+        for _ in range(5):
+            analyzer = YouTubeAnalyzer('TRANSPORT_KEY', quiet=True, api_endpoint=server.url,
+                                       transport=transport, breaker=CircuitBreaker())
+            assert analyzer.get_video_details(ids) == expected
+        assert server.stats()['connections'] == 1
+    stats = transport.stats()
+    assert stats['requests'] == 5 and stats['connections_opened'] == 1 and stats['reuse_ratio'] == 0.8
+    assert stats['p50_ms'] is not None
+    assert transport_from_config({'http_pool_maxsize': 0}) is None
+
+
+def test_errors_are_classified():
+    """读取超时归为可重试的瞬时错误，HTTP 错误状态照常交给 googleapiclient 解析"""
+    policy = RetryPolicy(max_attempts=1)
+    with FakeYouTubeServer(corpus_size=10, latency_ms=300) as server:
+        analyzer = YouTubeAnalyzer('TRANSPORT_SLOW', quiet=True, api_endpoint=server.url, retry_policy=policy,
+                                   transport=PooledTransport(read_timeout=0.05), breaker=CircuitBreaker())
+        assert analyzer.get_video_details([video_id_for(0)]) == []
+        assert analyzer.errors[0]['kind'] == TRANSIENT
+    with FakeYouTubeServer(corpus_size=10, quota_per_key=0) as server:
+        analyzer = YouTubeAnalyzer('TRANSPORT_QUOTA', quiet=True, api_endpoint=server.url, retry_policy=policy,
+                                   transport=PooledTransport(), breaker=CircuitBreaker())
+        assert analyzer.search_videos('diy', 10) == []
+        assert analyzer.errors[0]['kind'] == QUOTA
+
+
+def test_transport_benchmark_reuses_connections():
+    """基准：每次调用新建分析器时，httplib2 每次都新建连接，连接池传输只建一个"""
+    results = {r['transport']: r for r in transport_latency(calls=6, corpus_size=300)}
+    assert results['httplib2']['connections'] == 6
+    assert results['pooled']['connections'] == 1
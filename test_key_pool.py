@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""测试多API密钥轮换池"""
+
+import threading
+
+import pytest
+
+from fake_youtube_server import FakeYouTubeServer
+from key_pool import ApiKeyPool, load_keys
+from resilience import CIRCUIT_OPEN, QUOTA, RATE_LIMIT, TRANSIENT, ApiCallError
+from youtube_analyzer import YouTubeAnalyzer
+from youtube_stub import video_id_for
+
+
+def test_acquire_prefers_healthy_key_with_most_quota():
+    """优先选近期错误少、剩余配额多的密钥"""
+    pool = ApiKeyPool(['key-a', 'key-b', 'key-c'], daily_quota=1000)
+    pool.record_success('key-a', 300)
+    pool.record_failure('key-b', ApiCallError(TRANSIENT, 'boom'))
+    assert pool.acquire(100) == 'key-c'
+    pool.record_success('key-c', 800)
+    assert pool.acquire(100) == 'key-a'
+    assert pool.acquire(900) == 'key-b'
+
+
+def test_acquire_reserves_quota_until_settled():
+    """选中即预留配额：并发线程不会同时挤进快用完的密钥；熔断拦下或未发出的调用归还预留"""
+    pool = ApiKeyPool(['key-a'], daily_quota=1000)
+    barrier = threading.Barrier(32)
+    granted = []
+
+    def worker():
+        barrier.wait()
+        try:
+            granted.append(pool.acquire(100))
+        except ApiCallError:
+            pass
+
+    threads = [threading.Thread(target=worker) for _ in range(32)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(granted) == 10
+    assert pool.usage()[0]['reserved'] == 1000 and pool.usage()[0]['remaining'] == 0
+
+    pool.record_success('key-a', 100)
+    pool.record_failure('key-a', ApiCallError(TRANSIENT, 'boom'), 100)
+    pool.record_failure('key-a', ApiCallError(CIRCUIT_OPEN, 'open'), 100)
+    pool.release('key-a', 100)
+    usage = pool.usage()[0]
+    assert usage['used'] == 200 and usage['reserved'] == 600 and usage['remaining'] == 200
+    assert pool.acquire(200) == 'key-a'
+    with pytest.raises(ApiCallError):
+        pool.acquire(1)
+
+
+def test_quota_and_rate_limit_eviction():
+    """配额耗尽剔除到重置时间，限流短暂冷却；全部不可用时抛出配额错误"""
+    pool = ApiKeyPool(['key-a', 'key-b'])
+    pool.record_failure('key-a', ApiCallError(QUOTA, 'quota'))
+    pool.record_failure('key-b', ApiCallError(RATE_LIMIT, 'slow down'))
+    usage_a, usage_b = pool.usage()
+    assert usage_a['remaining'] == 0
+    assert usage_a['evicted_until'] == usage_a['reset_at']
+    assert usage_b['evicted_until'] is not None
+    with pytest.raises(ApiCallError) as info:
+        pool.acquire()
+    assert info.value.kind == QUOTA
+    assert info.value.retry_at is not None
+
+
+def test_load_keys_priority(monkeypatch):
+    """环境变量多密钥优先，其次配置列表，最后单个密钥"""
+    monkeypatch.delenv('YOUTUBE_API_KEYS', raising=False)
+    monkeypatch.delenv('YOUTUBE_API_KEY', raising=False)
+    assert load_keys({'youtube_api_key': 'one'}) == ['one']
+    assert load_keys({'youtube_api_keys': ['a', 'b'], 'youtube_api_key': 'one'}) == ['a', 'b']
+    monkeypatch.setenv('YOUTUBE_API_KEYS', 'x, y ,')
+    assert load_keys({'youtube_api_keys': ['a']}) == ['x', 'y']
+
+
+def test_analyzer_rotates_to_next_key_on_quota():
+    """调用在密钥间分摊；某密钥配额耗尽后换下一个，全部耗尽时快速失败"""
+    with FakeYouTubeServer(quota_per_key=150, corpus_size=100) as server:
+        pool = ApiKeyPool(['pool-key-1', 'pool-key-2'])
+        analyzer = YouTubeAnalyzer(None, quiet=True, api_endpoint=server.url, key_pool=pool)
+        for _ in range(2):
+            assert len(analyzer.search_videos('diy', 10)) == 10
+        assert server.stats()['quota_used'] == {'pool-key-1': 100, 'pool-key-2': 100}
+        assert analyzer.search_videos('diy', 10) == []
+        assert server.stats()['requests']['search.list'] == 4
+        assert analyzer.errors[-1]['kind'] == QUOTA
+        assert analyzer.search_videos('diy', 10) == []
+        assert server.stats()['requests']['search.list'] == 4
+        assert analyzer.errors[-1]['reason'] == 'keyPoolExhausted'
+        assert all(u['evicted_until'] for u in pool.usage())
+        assert all(u['reserved'] == 0 for u in pool.usage())
+
+
+def test_batch_calls_settle_reservations():
+    """批量模式下每个子请求结算自己的预留，结束后没有残留的预留"""
+    with FakeYouTubeServer(corpus_size=500) as server:
+        pool = ApiKeyPool(['batch-key-1', 'batch-key-2'])
+        analyzer = YouTubeAnalyzer(None, quiet=True, api_endpoint=server.url, key_pool=pool,
+                                   batch_requests=True)
+        videos = analyzer.get_video_details([video_id_for(i) for i in range(400)])
+        quota_used = server.stats()['quota_used']
+    assert len(videos) == 400
+    usage = {u['key']: u for u in pool.usage()}
+    assert sum(u['used'] for u in usage.values()) == sum(quota_used.values()) == 8
+    assert all(u['reserved'] == 0 for u in usage.values())
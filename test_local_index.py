@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""测试本地视频全文索引与 input_type='local' 查询"""
+
+from local_index import LocalIndex, fts_query
+from resilience import CircuitBreaker
+from youtube_analyzer import YouTubeAnalyzer
+from youtube_stub import StubYouTube
+
+
+def _analyzer(index: LocalIndex, stub: StubYouTube) -> YouTubeAnalyzer:
+    return YouTubeAnalyzer('INDEX_KEY', quiet=True, youtube=stub, local_index=index,
+                           breaker=CircuitBreaker())
+
+
+def test_fts_query_escapes_user_input():
+    """用户输入转成带引号的短语，保留末尾 * 前缀匹配"""
+    assert fts_query('cook* "tips" OR -x') == '"cook"* "tips" "OR" "x"'
+    assert fts_query('  ') == ''
+
+
+def test_parsed_videos_are_indexed_and_upserted():
+    """get_video_details 解析的每一批视频都写入索引，重复抓取只更新不重复"""
+    index = LocalIndex(':memory:')
+    stub = StubYouTube(corpus_size=120)
+    analyzer = _analyzer(index, stub)
+    ids = [f"v{i:010d}" for i in range(120)]
+    analyzer.get_video_details(ids)
+    analyzer.get_video_details(ids[:10])
+    assert index.count() == 120
+    assert analyzer.tracer.summary()['local_index.add']['count'] == 4
+
+
+def test_local_analyze_matches_filters_without_api_calls():
+    """local 模式按全文检索+数值条件查询，结果与内存筛选一致，且不发任何API请求"""
+    index = LocalIndex(':memory:')
+    stub = StubYouTube(corpus_size=300)
+    analyzer = _analyzer(index, stub)
+    videos = analyzer.get_video_details([f"v{i:010d}" for i in range(300)])
+    calls = dict(stub.calls)
+
+    results = analyzer.analyze('local', 'cooking', max_results=300, min_views=100000,
+                               min_engagement=1.0, max_days=30, min_duration=60, max_duration=900,
+                               export=False)
+    expected = analyzer.filter_videos(
+        [v for v in videos if 'cooking' in f"{v['title']} {v['description']}".lower()],
+        100000, 1.0, 30, 60, 900)
+    assert results
+    assert [v['video_id'] for v in results] == [v['video_id'] for v in expected]
+    assert dict(stub.calls) == calls
+
+
+def test_local_analyze_without_index():
+    """未配置索引时 local 模式返回空结果"""
+    analyzer = YouTubeAnalyzer('INDEX_KEY', quiet=True, youtube=StubYouTube(corpus_size=10))
+    assert analyzer.analyze('local', 'cooking', export=False) == []
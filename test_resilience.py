@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""测试API容错层：错误分类、重试、熔断、部分结果"""
+
+import json
+
+import httplib2
+import pytest
+from googleapiclient.errors import HttpError
+
+from resilience import (CLIENT, QUOTA, RATE_LIMIT, TRANSIENT, ApiCallError, CircuitBreaker,
+                        RetryPolicy, call_with_retry, classify_error)
+from youtube_analyzer import YouTubeAnalyzer
+from youtube_stub import StubYouTube
+
+
+def _http_error(status: int, reason: str) -> HttpError:
+    body = json.dumps({'error': {'code': status, 'errors': [{'reason': reason}]}}).encode()
+    return HttpError(httplib2.Response({'status': status}), body)
+
+
+def _no_sleep_policy(max_attempts: int = 4) -> RetryPolicy:
+    return RetryPolicy(max_attempts=max_attempts, sleep=lambda _: None)
+
+
+@pytest.mark.parametrize('status, reason, kind', [
+    (403, 'quotaExceeded', QUOTA),
+    (403, 'rateLimitExceeded', RATE_LIMIT),
+    (429, 'tooManyRequests', RATE_LIMIT),
+    (500, 'backendError', TRANSIENT),
+    (503, 'backendError', TRANSIENT),
+    (404, 'videoNotFound', CLIENT),
+])
+def test_classify_error(status, reason, kind):
+    """按状态码与 reason 区分配额、限流、临时故障和请求错误"""
+    error = classify_error(_http_error(status, reason))
+    assert error.kind == kind
+    assert error.reason == reason
+    if kind == QUOTA:
+        assert error.retry_at is not None
+
+
+def test_retry_transient_then_succeed():
+    """临时故障退避重试后成功"""
+    attempts = []
+
+    def flaky():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise _http_error(500, 'backendError')
+        return {'items': []}
+
+    assert call_with_retry(flaky, policy=_no_sleep_policy()) == {'items': []}
+    assert len(attempts) == 3
+
+
+def test_quota_not_retried_and_breaker_opens():
+    """配额错误不重试，熔断后后续调用直接失败、不再发请求"""
+    breaker = CircuitBreaker()
+    attempts = []
+
+    def quota():
+        attempts.append(1)
+        raise _http_error(403, 'quotaExceeded')
+
+    with pytest.raises(ApiCallError) as info:
+        call_with_retry(quota, breaker=breaker, policy=_no_sleep_policy())
+    assert info.value.kind == QUOTA
+    assert len(attempts) == 1
+    assert breaker.state == 'open'
+
+    with pytest.raises(ApiCallError) as info:
+        call_with_retry(quota, breaker=breaker, policy=_no_sleep_policy())
+    assert info.value.kind == 'circuit_open'
+    assert len(attempts) == 1
+
+
+def test_breaker_opens_after_consecutive_transient_failures():
+    """连续临时故障达到阈值后熔断，超时后半开放行一次"""
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0)
+    for _ in range(2):
+        breaker.record_failure(ApiCallError(TRANSIENT, 'boom'))
+    assert breaker.state == 'half_open'
+    breaker.allow()
+    with pytest.raises(ApiCallError):
+        breaker.allow()
+    breaker.record_success()
+    assert breaker.state == 'closed'
+
+
+class _FailingBatchStub(StubYouTube):
+    """第二个 videos.list 批次一直返回 500"""
+
+    def respond(self, method, params):
+        if method == 'videos.list' and self.calls['videos.list'] > 1:
+            raise _http_error(500, 'backendError')
+        return super().respond(method, params)
+
+
+def test_partial_results_with_error_markers():
+    """某个批次失败时保留其他批次，并给出明确的错误标记"""
+    stub = _FailingBatchStub(corpus_size=100)
+    analyzer = YouTubeAnalyzer('TEST_KEY', quiet=True, youtube=stub,
+                               retry_policy=_no_sleep_policy(2), breaker=CircuitBreaker())
+    ids = [f"v{i:010d}" for i in range(100)]
+    videos = analyzer.get_video_details(ids)
+    assert len(videos) == 50
+    assert len(analyzer.errors) == 1
+    marker = analyzer.errors[0]
+    assert marker['stage'] == 'get_video_details'
+    assert marker['kind'] == TRANSIENT
+    assert marker['video_ids'] == ids[50:]
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""测试查询结果列式缓存的区间查询与淘汰"""
+
+import importlib
+import random
+
+from fake_youtube_server import FakeYouTubeServer
+from resilience import CircuitBreaker
+from result_store import ResultStore
+from run_history import RunHistory
+from youtube_analyzer import YouTubeAnalyzer
+from youtube_stub import StubYouTube
+
+
+def _analyzer(stub: StubYouTube) -> YouTubeAnalyzer:
+    return YouTubeAnalyzer('STORE_KEY', quiet=True, youtube=stub, breaker=CircuitBreaker())
+
+
+def test_query_matches_filter_videos_without_api_calls():
+    """任意门槛组合下，缓存上的区间查询与 filter_videos 结果和顺序完全一致，且不再调用API"""
+    stub = StubYouTube(corpus_size=400)
+    analyzer = _analyzer(stub)
+    analyzer.analyze('keyword', 'cooking', max_results=400, min_views=0, min_engagement=0,
+                     export=False, max_days=3650, min_duration=0, max_duration=10 ** 6)
+    assert len(analyzer.last_videos) == 400
+
+    store = ResultStore()
+    key = store.key(input_type='keyword', input_value=' Cooking ', max_results=400)
+    store.put(key, analyzer.last_videos)
+    entry = store.get(store.key(input_type='keyword', input_value='cooking', max_results=400))
+    assert entry is not None and len(entry) == 400
+
+    calls = dict(stub.calls)
+    rng = random.Random(7)
+    for _ in range(30):
+        thresholds = {
+            'min_views': rng.choice([0, 1000, 50000, 200000]),
+            'min_engagement': rng.choice([0, 1.0, 2.0, 4.5]),
+            'max_days': rng.choice([3, 14, 60, 3650]),
+            'min_duration': rng.choice([0, 60, 180]),
+            'max_duration': rng.choice([300, 900, 3600]),
+        }
+        expected = analyzer.filter_videos(analyzer.last_videos, **thresholds)
+        got = entry.query(**thresholds)
+        assert [v['video_id'] for v in got] == [v['video_id'] for v in expected]
+    assert dict(stub.calls) == calls
+
+
+def test_lru_and_ttl_eviction():
+    """超过容量淘汰最久未用的查询，过期条目视为未命中"""
+    video = {'view_count': 1, 'engagement_rate': 1.0, 'days_since_published': 1,
+             'duration_seconds': 60, 'heat_score': 1.0}
+    store = ResultStore(max_entries=2)
+    store.put('a', [video])
+    store.put('b', [video])
+    assert store.get('a') is not None
+    store.put('c', [video])
+    assert store.get('b') is None and store.get('a') is not None
+
+    expired = ResultStore(ttl=0)
+    expired.put('a', [video])
+    expired._entries['a'].created_at -= 1
+    assert expired.get('a') is None
+    assert expired.stats()['misses'] == 1
+
+
+def test_cached_videos_carry_no_post_processing_fields():
+    """去重/评论抽样/历史对比原地补的字段不进缓存：之后只按门槛查询的结果里没有这些字段"""
+    stub = StubYouTube(corpus_size=300)
+    analyzer = YouTubeAnalyzer('STORE_KEY', quiet=True, youtube=stub, breaker=CircuitBreaker(),
+                               run_history=RunHistory(':memory:'))
+    thresholds = dict(min_views=0, min_engagement=0, max_days=3650, min_duration=0, max_duration=10 ** 6)
+    results = analyzer.analyze('keyword', 'cooking', max_results=100, export=False, dedup=True,
+                               comments_top_k=3, **thresholds)
+    assert any('duplicate_count' in v for v in results) and 'comment_stats' in results[0]
+
+    store = ResultStore()
+    cached = store.put('cooking', analyzer.last_videos).query(**thresholds)
+    derived = {'duplicate_count', 'duplicate_ids', 'comment_stats', 'comment_sample_size', 'is_new',
+               'previous_rank', 'rank_change', 'visual_group'}
+    assert len(cached) == 100 and not any(derived & set(v) for v in cached)
+
+
+def test_web_cache_hit_samples_comments_per_request(tmp_path, monkeypatch):
+    """命中结果缓存的请求：不带 dedup/comments 时没有派生字段，带 comments 时按本次参数抽样评论"""
+    server = FakeYouTubeServer(corpus_size=200).start()
+    try:
+        monkeypatch.chdir(tmp_path)
+        monkeypatch.setenv('YOUTUBE_API_ENDPOINT', server.url)
+        monkeypatch.setenv('YOUTUBE_API_KEY', 'store-web-key')
+        monkeypatch.delenv('YOUTUBE_API_KEYS', raising=False)
+        web_app = importlib.reload(importlib.import_module('web_app'))
+        client = web_app.app.test_client()
+        query = 'value=cooking&max_results=100&min_views=0&min_engagement=0&max_days=3650&min_duration=0'
+
+        first = client.get(f'/api/analyze?{query}&dedup=1&comments=3').get_json()
+        assert not first['cached'] and first['comment_stats']
+        plain = client.get(f'/api/analyze?{query}').get_json()
+        assert plain['cached'] and plain['comment_stats'] is None
+        assert not any({'duplicate_count', 'comment_stats'} & set(v) for v in plain['items'])
+
+        sampled = client.get(f'/api/analyze?{query}&comments=2').get_json()
+        assert sampled['cached'] and sampled['comment_stats']['videos'] == 2
+        assert ['comment_stats' in v for v in sampled['items'][:3]] == [True, True, False]
+    finally:
+        server.stop()
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""测试运行历史与"只看新增"对比"""
+
+import openpyxl
+
+from resilience import CircuitBreaker
+from run_history import RunHistory, query_key, query_params
+from youtube_analyzer import YouTubeAnalyzer
+from youtube_stub import StubYouTube
+
+
+def _videos(ids, heat=None):
+    return [{'video_id': vid, 'heat_score': (heat or {}).get(vid, 100.0)} for vid in ids]
+
+
+def test_diff_new_dropped_and_movers():
+    """首次运行全部为新增；之后对比出新上榜、已下榜与排名/热度大幅变动，并按保留数清理"""
+    history = RunHistory(':memory:', keep_runs=2)
+    key = query_key(query_params('keyword', ' DIY ', min_views=0))
+    assert key == query_key(query_params('keyword', 'diy', min_views=0))
+
+    first = _videos([f"v{i}" for i in range(20)])
+    diff = history.diff(key, first)
+    assert diff['previous_run'] is None and len(diff['new_ids']) == 20 and first[0]['is_new']
+    history.record(key, {}, first)
+
+    # v19 升到第一，v0/v1 下榜，新增 n1，v5 热度翻倍
+    second = _videos(['v19', 'n1'] + [f"v{i}" for i in range(2, 19)], heat={'v5': 250.0})
+    diff = history.diff(key, second)
+    assert diff['new_ids'] == ['n1'] and diff['dropped_ids'] == ['v0', 'v1']
+    movers = {m['video_id']: m for m in diff['movers']}
+    assert movers['v19']['rank_change'] == 19 and movers['v5']['heat_change'] == 1.5
+    assert second[0]['previous_rank'] == 20 and second[1]['rank_change'] is None
+
+    for _ in range(3):
+        history.record(key, {}, second)
+    assert len(history.runs(key)) == 2
+
+
+def test_analyze_only_new_and_export(tmp_path):
+    """同一查询第二次运行没有新增；only_new 只返回新增，导出带对比列"""
+    history = RunHistory(str(tmp_path / 'history.db'))
+    analyzer = YouTubeAnalyzer('HISTORY_KEY', quiet=True, youtube=StubYouTube(corpus_size=100),
+                               breaker=CircuitBreaker(), run_history=history)
+    options = dict(max_results=100, min_views=0, min_engagement=0, max_days=3650,
+                   min_duration=0, max_duration=10 ** 6, export=False)
+    first = analyzer.analyze('keyword', 'diy', **options)
+    assert first and analyzer.last_diff['new'] == len(first)
+
+    assert analyzer.analyze('keyword', 'diy', only_new=True, **options) == []
+    assert analyzer.last_diff['new'] == 0 and analyzer.last_diff['previous_run'] is not None
+    again = analyzer.analyze('keyword', 'DIY', **options)
+    assert not any(v['is_new'] for v in again)
+
+    path = analyzer.export_to_excel(again, str(tmp_path / 'out.xlsx'))
+    header = [c.value for c in next(openpyxl.load_workbook(path).active.iter_rows(max_row=1))]
+    assert {'是否新增', '上次排名', '排名变化'} <= set(header)
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""测试配置驱动的评分与爆红原因规则引擎"""
+
+import pytest
+
+from resilience import CircuitBreaker
+from scoring_rules import RuleEngine, RuleError, compare_strategies, load_strategies
+from youtube_analyzer import YouTubeAnalyzer
+from youtube_stub import StubYouTube, synthetic_video_item
+
+FIELDS = ('heat_score', 'trend_score', 'avg_daily_views', 'trend_label', 'hot_reasons', 'hot_reasons_text')
+
+
+def _parsed(count: int):
+    analyzer = YouTubeAnalyzer('RULES_KEY', quiet=True, youtube=StubYouTube(0))
+    return [analyzer._parse_video_data(synthetic_video_item(i)) for i in range(count)]
+
+
+def test_default_rules_match_builtin_scoring():
+    """默认规则与内置的热度/趋势/爆红原因计算结果完全一致"""
+    videos = _parsed(3000)
+    scored = RuleEngine().apply([dict(v) for v in videos])
+    for original, new in zip(videos, scored):
+        assert {f: original[f] for f in FIELDS} == {f: new[f] for f in FIELDS}
+
+
+def test_custom_strategy_and_stats():
+    """自定义权重与规则，统计每条规则的命中数和求值条数"""
+    engine = RuleEngine({
+        'name': 'likes_heavy',
+        'scores': {'heat_score': 'like_count * 100 / maximum(days_since_published, 1)'},
+        'reasons': [
+            {'name': 'mid_length', 'when': '120 <= duration_seconds <= 600 and not view_count < 1000'},
+            {'name': 'asmr', 'when': "contains(title, 'topics')"},
+        ],
+        'keywords': {'topics': ['asmr']},
+    })
+    videos = engine.apply([{'video_id': 'a', 'title': 'Relaxing ASMR', 'view_count': 5000, 'like_count': 10,
+                            'comment_count': 0, 'days_since_published': 2, 'duration_seconds': 300},
+                           {'video_id': 'b', 'title': 'Cooking', 'view_count': 500, 'like_count': 1,
+                            'comment_count': 0, 'days_since_published': 1, 'duration_seconds': 30}])
+    assert [v['heat_score'] for v in videos] == [500.0, 100.0]
+    assert videos[0]['hot_reasons'] == ['mid_length', 'asmr']
+    assert videos[1]['hot_reasons'] == ['general_good']
+    report = engine.report()
+    assert report['strategy'] == 'likes_heavy'
+    assert report['rules']['reasons.mid_length'] == dict(report['rules']['reasons.mid_length'], hits=1, evaluated=2)
+
+
+@pytest.mark.parametrize('expression', [
+    "__import__('os')",
+    'view_count.__class__',
+    'unknown_field > 1',
+    'open(title)',
+])
+def test_unsafe_or_unknown_expressions_rejected(expression):
+    """只允许白名单语法、函数和字段"""
+    with pytest.raises(RuleError):
+        RuleEngine({'scores': {'heat_score': expression}})
+
+
+def test_analyzer_applies_engine_per_page_and_ab_compare():
+    """分析器按页应用规则引擎；多策略对比前N名重合度"""
+    strategies = load_strategies({'scoring_strategies': {
+        'base': {},
+        'fresh': {'scores': {'heat_score': 'view_count / maximum(days_since_published, 1) ** 2'}},
+    }})
+    analyzer = YouTubeAnalyzer('RULES_KEY', quiet=True, youtube=StubYouTube(corpus_size=120),
+                               rule_engine=strategies['fresh'], breaker=CircuitBreaker())
+    videos = analyzer.get_video_details([f"v{i:010d}" for i in range(120)])
+    assert strategies['fresh'].calls == 3
+    assert analyzer.tracer.summary()['rule_engine']['count'] == 3
+    assert all(v['heat_score'] == round(v['view_count'] / v['days_since_published'] ** 2, 2) for v in videos)
+
+    result = compare_strategies(videos, strategies, top_n=10)
+    assert result['base']['overlap_with_first'] == 1.0
+    assert 0 <= result['fresh']['overlap_with_first'] <= 1
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""测试 search.list 结果缓存"""
+
+import sqlite3
+from datetime import datetime, timedelta, timezone
+
+from resilience import CircuitBreaker
+from search_cache import SearchCache
+from youtube_analyzer import YouTubeAnalyzer
+from youtube_stub import StubYouTube
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1_700_000_000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_key_normalization_and_time_buckets():
+    """关键词大小写/空白、地区大小写不影响键；同一时间桶内的 publishedAfter 取整到同一值"""
+    cache = SearchCache(':memory:', bucket_seconds=3600)
+    base = datetime(2026, 1, 1, 10, tzinfo=timezone.utc)
+    a = cache.canonical({'q': 'DIY  Crafts', 'regionCode': 'us',
+                         'publishedAfter': (base + timedelta(minutes=5)).strftime('%Y-%m-%dT%H:%M:%SZ')})
+    b = cache.canonical({'q': 'diy crafts', 'regionCode': 'US', 'videoDuration': None,
+                         'publishedAfter': (base + timedelta(minutes=55)).strftime('%Y-%m-%dT%H:%M:%SZ')})
+    assert a['publishedAfter'] == '2026-01-01T10:00:00Z' and a['maxResults'] == 50
+    assert cache.key(a) == cache.key(b)
+    assert cache.key(a) != cache.key(dict(a, videoDuration='short'))
+    assert cache.key(a) != cache.key(dict(a, relevanceLanguage='de'))
+
+
+def test_analyzer_reuses_pages_until_stale(tmp_path):
+    """同样的搜索在新鲜期内不再调用 search.list，少要结果时复用前几页；过期后重新搜索；统计跨进程累计"""
+    clock = FakeClock()
+    path = str(tmp_path / 'search.db')
+    cache = SearchCache(path, freshness=600, clock=clock)
+    stub = StubYouTube(corpus_size=500)
+    analyzer = YouTubeAnalyzer('SEARCH_CACHE_KEY', quiet=True, youtube=stub, breaker=CircuitBreaker(),
+                               search_cache=cache)
+
+    first = analyzer.search_videos('Cooking Tips', max_results=120)
+    assert len(first) == 120 and stub.calls['search.list'] == 3
+    assert analyzer.search_videos('cooking tips ', max_results=120) == first
+    assert analyzer.search_videos('cooking tips', max_results=30) == first[:30]
+    assert stub.calls['search.list'] == 3
+    stats = cache.stats()
+    assert stats['hits'] == 4 and stats['quota_saved'] == 400 and stats['misses'] == 3
+
+    clock.now += 601
+    analyzer.search_videos('cooking tips', max_results=30)
+    assert stub.calls['search.list'] == 4
+    cache.close()
+
+    reopened = SearchCache(path, freshness=600, clock=clock)
+    assert reopened.stats()['total_quota_saved'] == 400 and reopened.stats()['hits'] == 0
+    reopened.close()
+
+
+def test_lookups_do_not_write_counters_until_flush(tmp_path):
+    """查询只改内存计数，累计到 flush_every 次或 put / close 时才写库；stats 的累计值包含未写入的部分"""
+    path = str(tmp_path / 'search.db')
+    cache = SearchCache(path, flush_every=3)
+    params = cache.canonical({'q': 'diy', 'type': 'video'})
+
+    def stored():
+        conn = sqlite3.connect(path)
+        try:
+            return dict(conn.execute('SELECT name, value FROM counters').fetchall())
+        finally:
+            conn.close()
+
+    assert cache.get(params, 0) is None and cache.get(params, 1) is None
+    assert stored() == {} and cache.stats()['misses'] == 2
+    cache.put(params, 0, ['a', 'b'], None)
+    assert stored() == {'misses': 2}
+    cache.get(params, 0)
+    cache.get(params, 0)
+    assert stored() == {'misses': 2} and cache.stats()['total_hits'] == 2
+    cache.get(params, 0)
+    assert stored() == {'misses': 2, 'hits': 3}
+    cache.get(params, 0)
+    cache.close()
+    assert stored() == {'misses': 2, 'hits': 4}
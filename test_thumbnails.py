@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""测试缩略图并发抓取、磁盘缓存与感知哈希分组（连接本地模拟图片服务器）"""
+
+import random
+
+from dedup import collapse_duplicates
+from fake_youtube_server import FakeYouTubeServer
+from thumbnails import BKTree, ThumbnailFetcher, dhash, group_by_hash, hamming
+from youtube_analyzer import YouTubeAnalyzer
+from youtube_stub import synthetic_thumbnail
+
+
+def test_bktree_matches_linear_scan():
+    """BK 树半径查询与暴力扫描结果一致"""
+    rng = random.Random(3)
+    values = [rng.getrandbits(64) for _ in range(500)]
+    values += [v ^ (1 << rng.randrange(64)) for v in values[:50]]
+    tree = BKTree()
+    for i, v in enumerate(values):
+        tree.add(v, i)
+    for probe in values[:20]:
+        expected = {i for i, v in enumerate(values) if hamming(probe, v) <= 6}
+        assert set(tree.search(probe, 6)) == expected
+
+
+def test_dhash_robust_to_reencoding():
+    """同一画面不同编码质量的哈希接近，不同画面相距很远"""
+    a, b, c = (dhash(synthetic_thumbnail(i)) for i in (10, 11, 12))
+    assert hamming(a, b) <= 6
+    assert hamming(a, c) > 16
+    assert group_by_hash([a, None, b, c]) == [0, 1, 0, 3]
+
+
+def test_fetch_cache_and_size_cap(tmp_path):
+    """并发下载走本地服务器，第二次命中磁盘缓存，超过大小上限的放弃"""
+    with FakeYouTubeServer(corpus_size=20) as server:
+        urls = [f"https://i.ytimg.com/vi/v{i:010d}/hqdefault.jpg" for i in range(20)]
+        fetcher = ThumbnailFetcher(cache_dir=str(tmp_path), thumbnail_host=server.url, max_workers=4)
+        images = fetcher.fetch_many(urls + urls[:5])
+        assert all(images[u] for u in urls)
+        assert fetcher.stats['fetched'] == 20
+        fetcher.fetch_many(urls)
+        assert fetcher.stats['cache_hits'] == 20
+        assert server.stats()['thumbnail_requests'] == 20
+
+        tiny = ThumbnailFetcher(cache_dir=None, thumbnail_host=server.url, max_bytes=100)
+        assert tiny.fetch(urls[0]) is None
+        assert tiny.stats['too_large'] == 1
+        assert tiny.fetch(f"{server.url}/vi/missing/hqdefault.jpg") is None
+
+
+def test_analyze_marks_visual_duplicates(tmp_path):
+    """分析结果补充缩略图哈希；相同缩略图的视频在 dedup 时合并"""
+    with FakeYouTubeServer(corpus_size=40) as server:
+        fetcher = ThumbnailFetcher(cache_dir=str(tmp_path), thumbnail_host=server.url)
+        analyzer = YouTubeAnalyzer('THUMB_KEY', quiet=True, api_endpoint=server.url,
+                                   thumbnail_fetcher=fetcher)
+        videos = analyzer.analyze('keyword', 'diy', max_results=40, min_views=0, min_engagement=0,
+                                  max_days=60, min_duration=0, max_duration=3600, export=False,
+                                  thumbnails=True)
+        assert len(videos) == 40
+        assert all(v['thumbnail_hash'] for v in videos)
+        groups = {v['visual_group'] for v in videos}
+        assert None not in groups and len(groups) == 20
+        assert len(collapse_duplicates(videos)) <= 20
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""测试阶段追踪与剖析抓取"""
+
+import importlib
+import os
+from collections import Counter
+
+import pytest
+
+from admission import AdmissionController
+from run_history import RunHistory
+from tracing import Tracer, profile_capture
+from youtube_analyzer import YouTubeAnalyzer
+from youtube_stub import StubYouTube
+
+
+def test_span_records_nested_timing():
+    """span 嵌套时记录父子关系和耗时"""
+    events = []
+    tracer = Tracer(hooks=[lambda event, rec: events.append((event, rec['name']))])
+
+    with tracer.span('analyze'):
+        with tracer.span('search_videos', keyword='diy') as rec:
+            rec['attrs']['count'] = 3
+
+    records = tracer.export()
+    assert [r['name'] for r in records] == ['search_videos', 'analyze']
+    assert records[0]['parent'] == 'analyze'
+    assert records[0]['attrs'] == {'keyword': 'diy', 'count': 3}
+    assert all(r['duration_ms'] >= 0 for r in records)
+    assert events == [('start', 'analyze'), ('start', 'search_videos'),
+                      ('end', 'search_videos'), ('end', 'analyze')]
+    assert tracer.summary()['analyze']['count'] == 1
+
+
+def test_span_records_error():
+    """阶段抛异常时记录错误并继续抛出"""
+    tracer = Tracer()
+    with pytest.raises(ValueError):
+        with tracer.span('filter_videos'):
+            raise ValueError('boom')
+    assert tracer.export()[0]['error'] == 'ValueError: boom'
+
+
+def test_quiet_mode_and_traced_methods(capsys):
+    """静默模式下不输出，且被装饰的方法产生计时记录"""
+    analyzer = YouTubeAnalyzer('TEST_KEY', quiet=True)
+    videos = [{
+        'view_count': 100000, 'engagement_rate': 3.0, 'days_since_published': 2,
+        'duration_seconds': 300, 'heat_score': 10.0,
+    }]
+    assert len(analyzer.filter_videos(videos)) == 1
+    assert capsys.readouterr().out == ''
+    assert analyzer.tracer.export()[-1]['attrs']['count'] == 1
+
+
+def test_full_analyze_records_each_stage_once(tmp_path, monkeypatch):
+    """完整分析（含历史对比与导出）每个阶段各记录一个 span"""
+    monkeypatch.chdir(tmp_path)
+    analyzer = YouTubeAnalyzer('TEST_KEY', quiet=True, youtube=StubYouTube(corpus_size=500),
+                               run_history=RunHistory(':memory:'))
+    videos = analyzer.analyze('keyword', 'diy', max_results=60, min_views=0, min_engagement=0, max_days=3650,
+                              min_duration=0, max_duration=10 ** 6, export=True)
+    assert len(videos) == 60
+    records = analyzer.tracer.export()
+    counts = Counter(r['name'] for r in records)
+    for stage in ('analyze', 'search_videos', 'get_video_details', 'filter_videos', 'compare_with_history',
+                  'export_to_excel'):
+        assert counts[stage] == 1, stage
+    assert counts['api_call'] == 4
+    parents = {r['name']: r['parent'] for r in records}
+    assert parents['analyze'] is None
+    assert parents['compare_with_history'] == parents['export_to_excel'] == 'analyze'
+
+
+@pytest.mark.parametrize('mode, suffix', [('cprofile', '.prof'), ('sampling', '.folded')])
+def test_profile_capture_writes_file(tmp_path, mode, suffix):
+    """按需剖析会把结果写到磁盘"""
+    with profile_capture(mode, output_dir=str(tmp_path), label='life hacks') as prof:
+        sum(i * i for i in range(200000))
+    assert prof['path'].endswith(suffix)
+    assert os.path.exists(prof['path'])
+
+
+def test_profile_capture_disabled():
+    """未开启剖析时不写文件"""
+    with profile_capture(None) as prof:
+        pass
+    assert prof['path'] is None
+
+
+def test_profile_capture_keeps_newest_files(tmp_path):
+    """keep 限制目录里的剖析文件数，写完后删掉最旧的"""
+    paths = []
+    for i in range(4):
+        with profile_capture('sampling', output_dir=str(tmp_path), label=f'run{i}', keep=2) as prof:
+            pass
+        os.utime(prof['path'], (1000 + i, 1000 + i))
+        paths.append(prof['path'])
+    assert sorted(os.listdir(tmp_path)) == sorted(os.path.basename(p) for p in paths[2:])
+
+
+def test_web_profiling_requires_registered_key(tmp_path, monkeypatch):
+    """匿名请求不能开剖析（403）；已登记密钥可以，响应只给文件名；同一时间只剖析一个请求"""
+    monkeypatch.chdir(tmp_path)
+    web_app = importlib.reload(importlib.import_module('web_app'))
+    monkeypatch.setattr(web_app, 'ADMISSION', AdmissionController(client_rate=0, api_keys=['ops-key']))
+    monkeypatch.setattr(web_app, 'PROFILE_KEEP', 2)
+    client = web_app.app.test_client()
+    url = '/api/analyze?input_type=local&value=diy&profile=sampling'
+
+    resp = client.get(url, headers={'X-API-Key': 'made-up'})
+    assert resp.status_code == 403 and not os.path.exists('profiles')
+
+    for _ in range(3):
+        body = client.get(url, headers={'X-API-Key': 'ops-key'}).get_json()
+        assert body['profile'].endswith('.folded') and os.sep not in body['profile']
+    assert len(os.listdir('profiles')) == 2
+
+    with web_app.PROFILE_LOCK:
+        resp = client.get(url, headers={'X-API-Key': 'ops-key'})
+    assert resp.status_code == 429 and resp.headers['Retry-After'] == '1'
+
+    monkeypatch.setattr(web_app, 'ALLOW_PROFILING', True)
+    assert client.get(url).status_code == 200
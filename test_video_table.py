@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""测试列式视频表的往返、行视图与内存占用"""
+
+from benchmark import table_memory
+from video_table import VideoTable, _DerivedColumn, _ListColumn, _NumericColumn
+from youtube_analyzer import YouTubeAnalyzer
+from youtube_stub import synthetic_video_item
+
+
+def _videos(n: int):
+    analyzer = YouTubeAnalyzer('TABLE_KEY', quiet=True, youtube=object())
+    return [analyzer._parse_video_data(synthetic_video_item(i)) for i in range(n)]
+
+
+def test_roundtrip_and_row_views():
+    """建表后逐行还原与原 dict 完全一致，行视图支持 dict 式访问，子表按行号取"""
+    videos = _videos(300)
+    table = VideoTable.from_dicts(videos)
+    assert isinstance(table._columns['view_count'], _NumericColumn)
+    assert isinstance(table._columns['trend_points'], _ListColumn)
+    assert isinstance(table._columns['url'], _DerivedColumn)
+    assert table.to_dicts() == videos
+
+    row = table[7]
+    assert row == videos[7]
+    assert row['hot_reasons'] == videos[7]['hot_reasons']
+    assert row.get('missing', 'x') == 'x' and 'missing' not in row
+    assert not hasattr(row, '__dict__')
+    assert table.take([9, 2, 299]).to_dicts() == [videos[9], videos[2], videos[299]]
+    assert list(table.column('view_count')[:3]) == [v['view_count'] for v in videos[:3]]
+
+
+def test_writes_keep_dependent_fields_consistent():
+    """改写列表列时依赖它的可推导列先固化；新字段只出现在写入的行；类型不符的数值退回普通列表"""
+    videos = _videos(20)
+    table = VideoTable.from_dicts(videos)
+    table[0]['hot_reasons'] = ['edited']
+    assert table[0]['hot_reasons'] == ['edited']
+    assert table[0]['hot_reasons_text'] == videos[0]['hot_reasons_text']
+
+    table[1]['comment_stats'] = {'sample_size': 3}
+    assert table[1]['comment_stats'] == {'sample_size': 3}
+    assert 'comment_stats' not in table[2] and len(table[2]) == len(videos[2])
+
+    table[3]['view_count'] = 1.5
+    assert table[3]['view_count'] == 1.5 and table[4]['view_count'] == videos[4]['view_count']
+
+
+def test_irregular_input_falls_back_to_lists():
+    """缺字段、类型不符或不认识的字段照样能存取"""
+    videos = [{'video_id': 'a', 'view_count': 10, 'url': 'custom'},
+              {'video_id': 'b', 'view_count': None, 'extra': [1]}]
+    table = VideoTable.from_dicts(videos)
+    assert table.to_dicts() == videos
+
+
+def test_table_memory_smaller_than_dicts():
+    """列式存储的占用明显小于 dict 列表"""
+    templates = [synthetic_video_item(i) for i in range(200)]
+    result = table_memory(2000, templates)
+    assert result['ratio'] > 3
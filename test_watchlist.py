@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""测试关注列表守护进程：自适应刷新间隔、满批打包、状态持久化"""
+
+from resilience import CircuitBreaker
+from watchlist_daemon import BASE_INTERVALS, MIN_INTERVAL, WatchlistDaemon, next_interval
+from youtube_analyzer import YouTubeAnalyzer
+from youtube_stub import StubYouTube
+
+
+class _Clock:
+    def __init__(self, now: float = 1_000_000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _daemon(tmp_path, clock, stub=None, **kwargs):
+    analyzer = YouTubeAnalyzer('WATCH_KEY', quiet=True, youtube=stub or StubYouTube(corpus_size=200),
+                               breaker=CircuitBreaker())
+    return WatchlistDaemon(analyzer, state_file=str(tmp_path / 'state.json'), clock=clock, **kwargs)
+
+
+def test_next_interval_by_label_and_velocity():
+    """爆发期刷新快、缓慢期刷新慢；实测增速远超预期时缩短间隔，停滞时放长"""
+    assert next_interval('爆发期', None, None, None) < next_interval('缓慢', None, None, None)
+    assert next_interval('平稳', 3600, 10.0, 1.0) == max(MIN_INTERVAL, 1800)
+    assert next_interval('平稳', 6 * 3600, 0.0, 1.0) == 9 * 3600
+
+
+def test_tick_discovers_refreshes_and_survives_restart(tmp_path):
+    """首轮发现并满批刷新；重启后读回状态，未到期的视频和关键词不会重复消耗配额"""
+    clock = _Clock()
+    stub = StubYouTube(corpus_size=200)
+    daemon = _daemon(tmp_path, clock, stub)
+    daemon.add_keyword('life hacks')
+    summary = daemon.tick()
+    assert summary['discovered'] == 50
+    assert summary['refreshed'] == 50
+    assert stub.calls['videos.list'] == 1
+    for entry in daemon.state['videos'].values():
+        assert entry['next_due'] == clock.now + entry['interval']
+        assert entry['interval'] == next_interval(entry['latest']['trend_label'], None, None, None)
+
+    restarted = _daemon(tmp_path, clock, stub)
+    assert len(restarted.state['videos']) == 50
+    assert restarted.tick()['refreshed'] == 0
+    assert stub.calls == {'search.list': 1, 'videos.list': 1}
+
+    clock.now += max(BASE_INTERVALS.values())
+    assert restarted.tick()['refreshed'] == 50
+    assert stub.calls['search.list'] == 2
+
+
+def test_plan_tops_up_batches_with_soon_due_videos(tmp_path):
+    """到期视频不足50个时，用最早到期的其余视频补满一批"""
+    clock = _Clock()
+    daemon = _daemon(tmp_path, clock)
+    daemon._track([f"v{i:010d}" for i in range(120)], clock.now, 'test')
+    for i, entry in enumerate(daemon.state['videos'].values()):
+        entry['next_due'] = clock.now + (i - 10) * 60
+    batches = daemon.plan_batches()
+    assert len(batches) == 1
+    assert batches[0] == [f"v{i:010d}" for i in range(50)]
+
+
+def test_quota_budget_limits_batches(tmp_path):
+    """每小时配额用尽后本轮不再刷新"""
+    clock = _Clock()
+    daemon = _daemon(tmp_path, clock, quota_per_hour=2)
+    daemon._track([f"v{i:010d}" for i in range(150)], clock.now, 'test')
+    assert daemon.refresh() == 100
+    assert daemon.plan_batches() == []
@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+缩略图抓取与感知哈希去重
+功能：换了标题的同一视频靠文本去重抓不到。这里用连接池并发下载缩略图（限制单张大小，
+      按URL内容缓存到磁盘），计算差值感知哈希（dHash），再用 BK 树按汉明距离
+      把视觉上相同的视频分到同一组
+"""
+
+import hashlib
+import io
+import os
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+from urllib.parse import urlsplit
+
+import urllib3
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow 是可选依赖，只有启用缩略图去重时才需要
+    Image = None
+
+DEFAULT_CACHE_DIR = os.path.join('cache', 'thumbnails')
+# 单张缩略图大小上限（hqdefault 一般 20~60KB）
+MAX_THUMBNAIL_BYTES = 512 * 1024
+# dHash 汉明距离不超过该值视为同一张图（64位哈希）
+DEFAULT_MAX_DISTANCE = 6
+THUMBNAIL_HOSTS = ('i.ytimg.com', 'i9.ytimg.com', 'img.youtube.com')
+
+
+class ThumbnailFetcher:
+    """带连接池、并发、大小限制和磁盘缓存的缩略图下载器"""
+
+    def __init__(self, cache_dir: Optional[str] = DEFAULT_CACHE_DIR, max_bytes: int = MAX_THUMBNAIL_BYTES,
+                 max_workers: int = 16, timeout: float = 5.0, thumbnail_host: Optional[str] = None):
+        """
+        Args:
+            cache_dir: 磁盘缓存目录（None 不缓存）
+            max_bytes: 单张大小上限，超过的直接放弃
+            max_workers: 并发下载数（同时也是每个主机的连接池大小）
+            timeout: 连接/读取超时（秒）
+            thumbnail_host: 缩略图主机替换地址（如本地模拟服务器 http://127.0.0.1:8765，
+                            也可用环境变量 YOUTUBE_THUMBNAIL_HOST）
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.max_workers = max_workers
+        self.thumbnail_host = (thumbnail_host or os.getenv('YOUTUBE_THUMBNAIL_HOST') or '').rstrip('/') or None
+        self.http = urllib3.PoolManager(
+            num_pools=8, maxsize=max_workers, block=False,
+            timeout=urllib3.Timeout(connect=timeout, read=timeout),
+            retries=urllib3.Retry(total=2, backoff_factor=0.2, status_forcelist=(500, 502, 503, 504)),
+        )
+        self.stats: Counter = Counter()
+        self._lock = threading.Lock()
+
+    def _count(self, name: str, amount: int = 1):
+        with self._lock:
+            self.stats[name] += amount
+
+    def _resolve(self, url: str) -> str:
+        if self.thumbnail_host and urlsplit(url).hostname in THUMBNAIL_HOSTS:
+            parts = urlsplit(url)
+            return self.thumbnail_host + parts.path + (f"?{parts.query}" if parts.query else '')
+        return url
+
+    def _cache_path(self, url: str) -> str:
+        digest = hashlib.sha1(url.encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, digest[:2], digest + '.img')
+
+    def fetch(self, url: str) -> Optional[bytes]:
+        """下载一张缩略图；失败、超限或非200返回 None"""
+        url = self._resolve(url)
+        path = self._cache_path(url) if self.cache_dir else None
+        if path and os.path.exists(path):
+            self._count('cache_hits')
+            with open(path, 'rb') as f:
+                return f.read()
+
+        try:
+            resp = self.http.request('GET', url, preload_content=False)
+        except urllib3.exceptions.HTTPError:
+            self._count('errors')
+            return None
+        try:
+            if resp.status != 200:
+                self._count('errors')
+                return None
+            length = resp.headers.get('Content-Length')
+            if length and int(length) > self.max_bytes:
+                self._count('too_large')
+                return None
+            data = resp.read(self.max_bytes + 1)
+            if len(data) > self.max_bytes:
+                self._count('too_large')
+                return None
+        finally:
+            resp.release_conn()
+
+        self._count('fetched')
+        self._count('bytes', len(data))
+        if path:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = f"{path}.{os.getpid()}.tmp"
+            with open(tmp, 'wb') as f:
+                f.write(data)
+            os.replace(tmp, path)
+        return data
+
+    def fetch_many(self, urls: List[str]) -> Dict[str, Optional[bytes]]:
+        """并发下载（相同URL只下载一次）"""
+        unique = list(dict.fromkeys(u for u in urls if u))
+        if not unique:
+            return {}
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(unique))) as pool:
+            return dict(zip(unique, pool.map(self.fetch, unique)))
+
+
+def dhash(data: bytes, size: int = 8) -> int:
+    """
+    差值哈希：缩成 (size+1)×size 灰度图，比较每行相邻像素的明暗，得到 size² 位整数
+
+    对重新编码、缩放、轻微调色不敏感
+    """
+    if Image is None:
+        raise RuntimeError("缩略图感知哈希需要 Pillow：pip install Pillow")
+    with Image.open(io.BytesIO(data)) as img:
+        pixels = img.convert('L').resize((size + 1, size), Image.BILINEAR).tobytes()
+    value = 0
+    for row in range(size):
+        offset = row * (size + 1)
+        for col in range(size):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return value
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count('1')
+
+
+class BKTree:
+    """按汉明距离组织的 BK 树，半径查询只访问满足三角不等式的子树"""
+
+    def __init__(self):
+        self.root = None  # [哈希, 条目列表, {距离: 子节点}]
+
+    def add(self, value: int, item):
+        if self.root is None:
+            self.root = [value, [item], {}]
+            return
+        node = self.root
+        while True:
+            distance = hamming(value, node[0])
+            if distance == 0:
+                node[1].append(item)
+                return
+            child = node[2].get(distance)
+            if child is None:
+                node[2][distance] = [value, [item], {}]
+                return
+            node = child
+
+    def search(self, value: int, radius: int) -> List:
+        """返回距离不超过 radius 的所有条目"""
+        found = []
+        stack = [self.root] if self.root else []
+        while stack:
+            node = stack.pop()
+            distance = hamming(value, node[0])
+            if distance <= radius:
+                found.extend(node[1])
+            for d, child in node[2].items():
+                if distance - radius <= d <= distance + radius:
+                    stack.append(child)
+        return found
+
+
+def group_by_hash(hashes: List[Optional[int]], max_distance: int = DEFAULT_MAX_DISTANCE) -> List[int]:
+    """
+    把哈希相近的条目分组
+
+    Returns:
+        每个条目的组号（组内最小下标）；哈希为 None 的条目自成一组
+    """
+    parent = list(range(len(hashes)))
+
+    def find(i: int) -> int:
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    tree = BKTree()
+    for index, value in enumerate(hashes):
+        if value is None:
+            continue
+        for other in tree.search(value, max_distance):
+            ri, rj = find(index), find(other)
+            if ri != rj:
+                parent[max(ri, rj)] = min(ri, rj)
+        tree.add(value, index)
+    return [find(i) for i in range(len(hashes))]
+
+
+def enrich_thumbnails(videos: List[Dict], fetcher: ThumbnailFetcher,
+                      max_distance: int = DEFAULT_MAX_DISTANCE) -> int:
+    """
+    下载缩略图、计算感知哈希并标记视觉重复（原地补充字段）
+
+    新增字段:
+        thumbnail_hash: 16位十六进制 dHash（下载/解码失败为 None）
+        visual_group: 视觉重复组内第一条视频的ID（没有视觉重复时为 None）
+
+    Returns:
+        视觉重复组的数量
+    """
+    images = fetcher.fetch_many([v.get('thumbnail') for v in videos])
+    hashes: List[Optional[int]] = []
+    for video in videos:
+        data = images.get(video.get('thumbnail'))
+        value = None
+        if data:
+            try:
+                value = dhash(data)
+            except (OSError, ValueError):
+                fetcher._count('decode_errors')
+        hashes.append(value)
+        video['thumbnail_hash'] = None if value is None else f"{value:016x}"
+
+    labels = group_by_hash(hashes, max_distance)
+    sizes = Counter(labels)
+    for video, label in zip(videos, labels):
+        video['visual_group'] = videos[label]['video_id'] if sizes[label] > 1 else None
+    return sum(1 for size in sizes.values() if size > 1)
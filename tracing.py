@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+阶段追踪与性能剖析
+功能：为分析流程的各个阶段记录结构化耗时（span），并支持按需抓取 cProfile / 采样剖析文件
+"""
+
+import cProfile
+import functools
+import os
+import sys
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Callable, Dict, Iterator, List, Optional
+
+# 钩子签名: hook(event, record)，event 为 'start' 或 'end'
+SpanHook = Callable[[str, Dict], None]
+
+PROFILE_MODES = ('cprofile', 'sampling')
+
+
+class Tracer:
+    """阶段计时追踪器：span 可嵌套，结束时产出一条结构化耗时记录"""
+
+    def __init__(self, hooks: Optional[List[SpanHook]] = None, max_records: int = 10000):
+        """
+        Args:
+            hooks: span 开始/结束时回调的钩子列表
+            max_records: 最多保留的记录条数（长驻进程避免无限增长）
+        """
+        self.hooks: List[SpanHook] = list(hooks or [])
+        self.records = deque(maxlen=max_records)
+        self._local = threading.local()
+
+    def add_hook(self, hook: SpanHook):
+        """注册钩子"""
+        self.hooks.append(hook)
+
+    def _stack(self) -> list:
+        if not hasattr(self._local, 'stack'):
+            self._local.stack = []
+        return self._local.stack
+
+    @contextmanager
+    def span(self, name: str, **attrs) -> Iterator[Dict]:
+        """
+        记录一个阶段的耗时
+
+        用法:
+            with tracer.span('search_videos', keyword='diy') as rec:
+                ...
+                rec['attrs']['count'] = 10
+
+        Args:
+            name: 阶段名
+            **attrs: 附加属性（数量、关键词等）
+        """
+        stack = self._stack()
+        record = {
+            'name': name,
+            'parent': stack[-1]['name'] if stack else None,
+            'depth': len(stack),
+            'started_at': datetime.now().isoformat(timespec='milliseconds'),
+            'duration_ms': None,
+            'attrs': dict(attrs),
+            'error': None,
+        }
+        self._emit('start', record)
+        stack.append(record)
+        start = time.perf_counter()
+        try:
+            yield record
+        except BaseException as e:
+            record['error'] = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            record['duration_ms'] = round((time.perf_counter() - start) * 1000, 3)
+            stack.pop()
+            self.records.append(record)
+            self._emit('end', record)
+
+    def _emit(self, event: str, record: Dict):
+        for hook in self.hooks:
+            try:
+                hook(event, record)
+            except Exception:
+                # 钩子异常不影响主流程
+                pass
+
+    def export(self) -> List[Dict]:
+        """返回所有记录的副本（可直接JSON序列化）"""
+        return [dict(r, attrs=dict(r['attrs'])) for r in self.records]
+
+    def summary(self) -> Dict[str, Dict]:
+        """按阶段名聚合：调用次数、总耗时、最大耗时"""
+        result: Dict[str, Dict] = {}
+        for r in self.records:
+            s = result.setdefault(r['name'], {'count': 0, 'total_ms': 0.0, 'max_ms': 0.0})
+            s['count'] += 1
+            s['total_ms'] = round(s['total_ms'] + r['duration_ms'], 3)
+            s['max_ms'] = max(s['max_ms'], r['duration_ms'])
+        return result
+
+    def clear(self):
+        """清空记录"""
+        self.records.clear()
+
+
+def traced(name: Optional[str] = None):
+    """
+    方法装饰器：用实例的 self.tracer 记录整个方法的耗时
+
+    返回值为列表时，记录其长度到 attrs['count']
+    """
+    def decorator(func):
+        span_name = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(self, *args, **kwargs):
+            with self.tracer.span(span_name) as record:
+                result = func(self, *args, **kwargs)
+                if isinstance(result, list):
+                    record['attrs']['count'] = len(result)
+                return result
+        return wrapper
+    return decorator
+
+
+class SamplingProfiler:
+    """纯Python采样剖析器：后台线程定时抓取目标线程调用栈，输出折叠栈（flamegraph格式）"""
+
+    def __init__(self, interval: float = 0.005, thread_id: Optional[int] = None):
+        self.interval = interval
+        self.thread_id = thread_id or threading.get_ident()
+        self.samples: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}:{frame.f_lineno}")
+                frame = frame.f_back
+            if stack:
+                self.samples[';'.join(reversed(stack))] += 1
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='sampling-profiler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+
+    def dump(self, path: str):
+        """写出折叠栈文件，每行: frame1;frame2;... count"""
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in self.samples.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+def _prune_profiles(output_dir: str, keep: int):
+    """只保留最新的 keep 个剖析文件"""
+    if keep <= 0:
+        return
+    paths = [os.path.join(output_dir, name) for name in os.listdir(output_dir)
+             if name.endswith(('.prof', '.folded'))]
+    paths.sort(key=os.path.getmtime)
+    for path in paths[:-keep]:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+@contextmanager
+def profile_capture(mode: Optional[str], output_dir: str = 'profiles',
+                    label: str = 'analyze', keep: int = 0) -> Iterator[Dict]:
+    """
+    按需抓取单次调用的剖析文件
+
+    Args:
+        mode: 'cprofile' / 'sampling'，None 表示不剖析
+        output_dir: 输出目录
+        label: 文件名前缀
+        keep: 目录里最多保留的剖析文件数（写完后删掉最旧的），0 表示不清理
+
+    Yields:
+        信息字典，结束后其中 'path' 为写出的文件路径
+    """
+    info: Dict = {'mode': mode, 'path': None}
+    if not mode:
+        yield info
+        return
+    if mode not in PROFILE_MODES:
+        raise ValueError(f"不支持的剖析模式: {mode}（可选: {', '.join(PROFILE_MODES)}）")
+
+    os.makedirs(output_dir, exist_ok=True)
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S_%f')
+    safe_label = ''.join(ch if ch.isalnum() or ch in '-_' else '_' for ch in label)[:40]
+
+    if mode == 'cprofile':
+        profiler = cProfile.Profile()
+        path = os.path.join(output_dir, f"{safe_label}_{timestamp}.prof")
+        profiler.enable()
+        try:
+            yield info
+        finally:
+            profiler.disable()
+            profiler.dump_stats(path)
+            info['path'] = os.path.abspath(path)
+            _prune_profiles(output_dir, keep)
+    else:
+        sampler = SamplingProfiler()
+        path = os.path.join(output_dir, f"{safe_label}_{timestamp}.folded")
+        sampler.start()
+        try:
+            yield info
+        finally:
+            sampler.stop()
+            sampler.dump(path)
+            info['path'] = os.path.abspath(path)
+            _prune_profiles(output_dir, keep)
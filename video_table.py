@@ -0,0 +1,364 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+紧凑的列式视频表
+功能：每个视频原本是约25个键的 dict（还嵌套 hot_reasons、trend_points 两个列表），
+      大批量合并时每条要占几KB。VideoTable 按列存储：数值用定宽 NumPy 数组，
+      频道/日期/趋势标签等重复字符串做字典编码，爆红原因标签和趋势曲线点拼成一维缓冲区
+      加偏移量，url/缩略图等可由视频ID推出的字段不存；行视图用 __slots__，
+      对现有代码保持 dict 式访问（video['view_count']、.get()、.items()）
+"""
+
+import sys
+from collections.abc import Mapping
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+import numpy as np
+
+# 定宽数值列
+NUMERIC_COLUMNS = {
+    'days_since_published': np.int32,
+    'duration_seconds': np.int32,
+    'view_count': np.int64,
+    'like_count': np.int64,
+    'comment_count': np.int64,
+    'engagement_rate': np.float64,
+    'heat_score': np.float64,
+    'revenue_low': np.float64,
+    'revenue_high': np.float64,
+    'revenue_mid': np.float64,
+    'avg_daily_views': np.float64,
+    'trend_score': np.float64,
+}
+# 重复度高的字符串：字典编码（int32 编码 + 去重后的取值表）
+CATEGORY_COLUMNS = ('channel_title', 'channel_id', 'published_at', 'duration', 'trend_label')
+# 其余字段（video_id、title、description 等每行不同的字符串，以及不认识的字段）存为普通列表
+# 列表列：一维缓冲区 + 偏移量（标签类再做字典编码）
+TAG_LIST_COLUMNS = ('hot_reasons',)
+INT_LIST_COLUMNS = ('trend_points',)
+# 可由同一行其他字段推出的列；建表时逐行校验，全部吻合才不存
+DERIVED_COLUMNS: Dict[str, Callable[[Mapping], Any]] = {
+    'url': lambda row: f"https://www.youtube.com/watch?v={row['video_id']}",
+    'thumbnail': lambda row: f"https://i.ytimg.com/vi/{row['video_id']}/hqdefault.jpg",
+    'hot_reasons_text': lambda row: '; '.join(row['hot_reasons'][:4]),
+}
+
+_MISSING = object()
+
+
+class _NumericColumn:
+    def __init__(self, values: np.ndarray):
+        self.values = values
+        self._cast = float if values.dtype.kind == 'f' else int
+
+    def get(self, index: int):
+        return self._cast(self.values[index])
+
+    def set(self, index: int, value):
+        self.values[index] = value
+
+    def take(self, indices: np.ndarray) -> '_NumericColumn':
+        return _NumericColumn(self.values[indices])
+
+    def nbytes(self) -> int:
+        return self.values.nbytes
+
+
+class _CategoryColumn:
+    def __init__(self, codes: np.ndarray, categories: List):
+        self.codes = codes
+        self.categories = categories
+        self._lookup = {value: code for code, value in enumerate(categories)}
+
+    @classmethod
+    def build(cls, values: Iterable, count: int) -> '_CategoryColumn':
+        lookup: Dict = {}
+        codes = np.fromiter((lookup.setdefault(v, len(lookup)) for v in values), dtype=np.int32, count=count)
+        return cls(codes, list(lookup))
+
+    def get(self, index: int):
+        return self.categories[self.codes[index]]
+
+    def set(self, index: int, value):
+        code = self._lookup.get(value)
+        if code is None:
+            code = self._lookup[value] = len(self.categories)
+            self.categories.append(value)
+        self.codes[index] = code
+
+    def take(self, indices: np.ndarray) -> '_CategoryColumn':
+        return _CategoryColumn(self.codes[indices], self.categories)
+
+    def nbytes(self) -> int:
+        return self.codes.nbytes + _list_nbytes(self.categories)
+
+
+class _ObjectColumn:
+    """普通 Python 列表（行间不同的字符串，或不认识/类型不符的字段）"""
+
+    def __init__(self, values: List):
+        self.values = values
+
+    def get(self, index: int):
+        return self.values[index]
+
+    def set(self, index: int, value):
+        self.values[index] = value
+
+    def take(self, indices: np.ndarray) -> '_ObjectColumn':
+        values = self.values
+        return _ObjectColumn([values[i] for i in indices.tolist()])
+
+    def nbytes(self) -> int:
+        return _list_nbytes(self.values)
+
+
+class _ListColumn:
+    """变长列表：所有元素拼成一维数组，第 i 行是 flat[offsets[i]:offsets[i+1]]"""
+
+    def __init__(self, flat: np.ndarray, offsets: np.ndarray, vocab: Optional[List[str]] = None):
+        self.flat = flat
+        self.offsets = offsets
+        self.vocab = vocab
+
+    @classmethod
+    def build(cls, lists: List[List], tags: bool) -> '_ListColumn':
+        lengths = np.fromiter((len(x) for x in lists), dtype=np.int64, count=len(lists))
+        offsets = np.zeros(len(lists) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        total = int(offsets[-1])
+        items = (item for x in lists for item in x)
+        if not tags:
+            return cls(np.fromiter(items, dtype=np.int64, count=total), offsets)
+        lookup: Dict[str, int] = {}
+        flat = np.fromiter((lookup.setdefault(t, len(lookup)) for t in items), dtype=np.uint16, count=total)
+        return cls(flat, offsets, list(lookup))
+
+    def get(self, index: int) -> List:
+        values = self.flat[self.offsets[index]:self.offsets[index + 1]].tolist()
+        if self.vocab is None:
+            return values
+        vocab = self.vocab
+        return [vocab[code] for code in values]
+
+    def take(self, indices: np.ndarray) -> '_ListColumn':
+        starts = self.offsets[indices]
+        lengths = self.offsets[indices + 1] - starts
+        offsets = np.zeros(len(indices) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        gather = np.repeat(starts - offsets[:-1], lengths) + np.arange(offsets[-1])
+        return _ListColumn(self.flat[gather], offsets, self.vocab)
+
+    def nbytes(self) -> int:
+        return self.flat.nbytes + self.offsets.nbytes + (_list_nbytes(self.vocab) if self.vocab else 0)
+
+
+class _DerivedColumn:
+    def __init__(self, func: Callable[[Mapping], Any]):
+        self.func = func
+        self.table: Optional['VideoTable'] = None
+
+    def get(self, index: int):
+        return self.func(VideoRow(self.table, index))
+
+    def take(self, indices: np.ndarray) -> '_DerivedColumn':
+        return _DerivedColumn(self.func)
+
+    def nbytes(self) -> int:
+        return 0
+
+
+def _allowed_types(dtype) -> tuple:
+    """整数列只收 int（避免浮点被截断），浮点列收 int/float"""
+    return (int, float) if np.dtype(dtype).kind == 'f' else (int,)
+
+
+def _list_nbytes(values: List) -> int:
+    """列表容器 + 其中不重复的字符串（数值等小对象按 getsizeof 计）"""
+    seen = set()
+    total = sys.getsizeof(values)
+    for value in values:
+        if value is _MISSING or id(value) in seen:
+            continue
+        seen.add(id(value))
+        total += sys.getsizeof(value)
+    return total
+
+
+class VideoRow(Mapping):
+    """一行的轻量视图：只保存表和行号，按需从列中取值"""
+
+    __slots__ = ('_table', '_index')
+
+    def __init__(self, table: 'VideoTable', index: int):
+        self._table = table
+        self._index = index
+
+    def __getitem__(self, key: str):
+        column = self._table._columns.get(key)
+        if column is None:
+            raise KeyError(key)
+        value = column.get(self._index)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key: str, value):
+        self._table.set(self._index, key, value)
+
+    def __iter__(self):
+        for key, column in self._table._columns.items():
+            if not isinstance(column, _ObjectColumn) or column.values[self._index] is not _MISSING:
+                yield key
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def __contains__(self, key) -> bool:
+        column = self._table._columns.get(key)
+        return column is not None and (not isinstance(column, _ObjectColumn)
+                                       or column.values[self._index] is not _MISSING)
+
+    def __repr__(self) -> str:
+        return f"VideoRow({self.to_dict()!r})"
+
+    def to_dict(self) -> Dict:
+        return {key: self[key] for key in self}
+
+
+class VideoTable:
+    """列式视频表，按行号或行视图访问"""
+
+    def __init__(self, columns: Dict[str, Any], length: int):
+        self._columns = columns
+        self._length = length
+        for column in columns.values():
+            if isinstance(column, _DerivedColumn):
+                column.table = self
+
+    @classmethod
+    def from_dicts(cls, videos: List[Dict]) -> 'VideoTable':
+        """由视频 dict 列表建表；不认识或类型不符的字段退回普通列表存储"""
+        n = len(videos)
+        keys: Dict[str, None] = {}
+        for video in videos:
+            if len(video) != len(keys) or any(k not in keys for k in video):
+                keys.update(dict.fromkeys(video))
+        columns: Dict[str, Any] = {}
+        derived = []
+        for key in keys:
+            values = [v.get(key, _MISSING) for v in videos]
+            complete = all(value is not _MISSING for value in values)
+            column = None
+            if complete:
+                try:
+                    if key in NUMERIC_COLUMNS:
+                        if all(type(value) in _allowed_types(NUMERIC_COLUMNS[key]) for value in values):
+                            column = _NumericColumn(np.array(values, dtype=NUMERIC_COLUMNS[key]))
+                    elif key in CATEGORY_COLUMNS:
+                        column = _CategoryColumn.build(values, n)
+                    elif key in TAG_LIST_COLUMNS or key in INT_LIST_COLUMNS:
+                        tags = key in TAG_LIST_COLUMNS
+                        item_type = str if tags else int
+                        if all(type(value) is list and all(type(item) is item_type for item in value)
+                               for value in values):
+                            column = _ListColumn.build(values, tags=tags)
+                    elif key in DERIVED_COLUMNS:
+                        derived.append((key, values))
+                        continue
+                except (TypeError, ValueError, OverflowError):
+                    column = None
+            columns[key] = column or _ObjectColumn(values)
+
+        table = cls(columns, n)
+        for key, values in derived:
+            func = DERIVED_COLUMNS[key]
+            try:
+                matches = all(func(video) == value for video, value in zip(videos, values))
+            except (KeyError, TypeError):
+                matches = False
+            column = _DerivedColumn(func) if matches else _ObjectColumn(values)
+            if isinstance(column, _DerivedColumn):
+                column.table = table
+            columns[key] = column
+        # 恢复原始键顺序
+        table._columns = {key: columns[key] for key in keys}
+        return table
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __getitem__(self, index: int) -> VideoRow:
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError(index)
+        return VideoRow(self, index)
+
+    def __iter__(self):
+        for index in range(self._length):
+            yield VideoRow(self, index)
+
+    def keys(self) -> List[str]:
+        return list(self._columns)
+
+    def column(self, name: str) -> np.ndarray:
+        """数值列的 NumPy 数组（直接引用，不复制）；非数值列转成数组返回"""
+        column = self._columns[name]
+        if isinstance(column, _NumericColumn):
+            return column.values
+        if isinstance(column, _CategoryColumn):
+            return np.array(column.categories, dtype=object)[column.codes]
+        return np.array([column.get(i) for i in range(self._length)], dtype=object)
+
+    def take(self, indices) -> 'VideoTable':
+        """按行号取子表（如筛选/排序结果）"""
+        indices = np.asarray(indices, dtype=np.int64)
+        return VideoTable({key: column.take(indices) for key, column in self._columns.items()}, len(indices))
+
+    def set(self, index: int, key: str, value):
+        """写入一个值；列表列、可推导列或类型不符时该列退回普通列表"""
+        column = self._columns.get(key)
+        if column is None:
+            column = self._columns[key] = _ObjectColumn([_MISSING] * self._length)
+        elif not isinstance(column, (_NumericColumn, _CategoryColumn, _ObjectColumn)) or (
+                isinstance(column, _NumericColumn)
+                and type(value) not in _allowed_types(column.values.dtype.type)):
+            column = self._materialize(key)
+        column.set(index, value)
+
+    def _materialize(self, key: str) -> _ObjectColumn:
+        column = self._columns[key]
+        values = [column.get(i) for i in range(self._length)]
+        # 其他可推导列可能依赖这一列，先固化
+        for other, derived in list(self._columns.items()):
+            if isinstance(derived, _DerivedColumn) and other != key:
+                self._columns[other] = _ObjectColumn([derived.get(i) for i in range(self._length)])
+        column = self._columns[key] = _ObjectColumn(values)
+        return column
+
+    def to_dicts(self) -> List[Dict]:
+        return [row.to_dict() for row in self]
+
+    def nbytes(self) -> int:
+        """列存储占用的字节数（数组 + 列表容器 + 其中的字符串）"""
+        return sum(column.nbytes() for column in self._columns.values()) + sys.getsizeof(self._columns)
+
+
+def dicts_nbytes(videos: List[Dict]) -> int:
+    """dict 列表的深度占用（同一对象只算一次），用于和 VideoTable.nbytes 对比"""
+    seen = set()
+    total = sys.getsizeof(videos)
+    stack: List[Any] = list(videos)
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen:
+            continue
+        seen.add(id(obj))
+        total += sys.getsizeof(obj)
+        if isinstance(obj, dict):
+            stack.extend(obj.keys())
+            stack.extend(obj.values())
+        elif isinstance(obj, (list, tuple)):
+            stack.extend(obj)
+    return total
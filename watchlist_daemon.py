@@ -0,0 +1,322 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+关注列表守护进程
+功能：长期运行，维护关键词和频道的关注列表，定期发现新视频；
+      按视频趋势自适应安排统计刷新（爆发期频繁、缓慢期很少），
+      把到期的刷新凑满50个ID一批调用 videos.list，状态持久化到JSON，重启后继续
+
+运行:
+    python watchlist_daemon.py --add-keyword "life hacks" --add-channel https://www.youtube.com/@TEDEd
+    python watchlist_daemon.py                 # 按已保存的关注列表常驻运行
+    python watchlist_daemon.py --once          # 只执行一轮（适合cron）
+"""
+
+import argparse
+import json
+import os
+import signal
+import sys
+import time
+from typing import Callable, Dict, List, Optional
+
+from youtube_analyzer import YouTubeAnalyzer
+
+DEFAULT_STATE_FILE = 'watchlist_state.json'
+BATCH_SIZE = 50
+
+# 各趋势标签的基础刷新间隔（秒）
+BASE_INTERVALS = {
+    '爆发期': 15 * 60,
+    '高速增长': 30 * 60,
+    '稳定增长': 2 * 3600,
+    '平稳': 6 * 3600,
+    '缓慢': 24 * 3600,
+}
+MIN_INTERVAL = 10 * 60
+MAX_INTERVAL = 48 * 3600
+
+# 关键词（search.list 100配额）和频道（最多3配额）的重新发现间隔（秒）
+KEYWORD_DISCOVERY_INTERVAL = 6 * 3600
+CHANNEL_DISCOVERY_INTERVAL = 3 * 3600
+
+# 发布超过该天数的视频不再跟踪
+MAX_TRACK_DAYS = 30
+# 保留的播放量快照条数
+HISTORY_LENGTH = 12
+
+
+def next_interval(label: str, prev_interval: Optional[float], observed_rate: Optional[float],
+                  expected_rate: Optional[float]) -> float:
+    """
+    计算下一次刷新间隔
+
+    以趋势标签的基础间隔为起点；实际增速明显高于预期时缩短，几乎不增长时放长
+
+    Args:
+        label: 趋势标签
+        prev_interval: 上一次使用的间隔
+        observed_rate: 两次刷新间实测的每秒播放增量
+        expected_rate: 按日均播放推算的每秒播放增量
+    """
+    interval = BASE_INTERVALS.get(label, BASE_INTERVALS['平稳'])
+    if prev_interval and observed_rate is not None and expected_rate:
+        ratio = observed_rate / expected_rate
+        if ratio >= 1.5:
+            interval = min(interval, prev_interval * 0.5)
+        elif ratio <= 0.2:
+            interval = max(interval, prev_interval * 1.5)
+    return float(min(MAX_INTERVAL, max(MIN_INTERVAL, interval)))
+
+
+class WatchlistDaemon:
+    """关注列表调度器"""
+
+    def __init__(self, analyzer: YouTubeAnalyzer, state_file: str = DEFAULT_STATE_FILE,
+                 quota_per_hour: int = 1000, clock: Callable[[], float] = time.time):
+        """
+        Args:
+            analyzer: 分析器（复用其搜索、频道、详情接口和容错层）
+            state_file: 状态文件路径
+            quota_per_hour: 每小时最多消耗的配额单位
+            clock: 时间函数（测试时可替换）
+        """
+        self.analyzer = analyzer
+        self.state_file = state_file
+        self.quota_per_hour = quota_per_hour
+        self.clock = clock
+        self.state = self._load()
+        self._stop = False
+
+    # ------------------------------------------------------------------ 状态
+    def _load(self) -> Dict:
+        if os.path.exists(self.state_file):
+            with open(self.state_file, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        else:
+            state = {}
+        state.setdefault('keywords', {})
+        state.setdefault('channels', {})
+        state.setdefault('videos', {})
+        state.setdefault('quota_log', [])
+        state.setdefault('stats', {'refreshed': 0, 'discovered': 0, 'units': 0, 'batches': 0})
+        return state
+
+    def save(self):
+        """原子写入状态文件，进程被杀也不会留下半个文件"""
+        tmp = self.state_file + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(self.state, f, ensure_ascii=False)
+        os.replace(tmp, self.state_file)
+
+    def add_keyword(self, keyword: str):
+        self.state['keywords'].setdefault(keyword, {'last_discovered': 0})
+
+    def add_channel(self, channel: str):
+        self.state['channels'].setdefault(channel, {'last_discovered': 0})
+
+    def remove(self, entry: str):
+        self.state['keywords'].pop(entry, None)
+        self.state['channels'].pop(entry, None)
+
+    # ------------------------------------------------------------------ 配额
+    def _units_last_hour(self, now: float) -> int:
+        log = [e for e in self.state['quota_log'] if now - e[0] < 3600]
+        self.state['quota_log'] = log
+        return sum(units for _, units in log)
+
+    def _spend(self, now: float, units: int):
+        self.state['quota_log'].append([now, units])
+        self.state['stats']['units'] += units
+
+    def _budget(self, now: float) -> int:
+        return max(0, self.quota_per_hour - self._units_last_hour(now))
+
+    # ------------------------------------------------------------------ 发现
+    def discover(self, now: Optional[float] = None) -> int:
+        """
+        对到期的关键词/频道重新拉取视频ID，新ID加入跟踪（立即到期）
+
+        预算内到期的关键词一起搜索、频道一起拉取（分析器开启批量模式时合并往返）
+        """
+        now = self.clock() if now is None else now
+        keywords, channels = [], []
+        for keyword, meta in self.state['keywords'].items():
+            if now - meta['last_discovered'] < KEYWORD_DISCOVERY_INTERVAL or self._budget(now) < 100:
+                continue
+            self._spend(now, 100)
+            keywords.append(keyword)
+        for channel, meta in self.state['channels'].items():
+            if now - meta['last_discovered'] < CHANNEL_DISCOVERY_INTERVAL or self._budget(now) < 3:
+                continue
+            self._spend(now, 3)
+            channels.append(channel)
+
+        found = 0
+        if keywords:
+            for keyword, ids in self.analyzer.search_many(keywords, 50).items():
+                self.state['keywords'][keyword]['last_discovered'] = now
+                found += self._track(ids, now, f"keyword:{keyword}")
+        if channels:
+            for channel, ids in self.analyzer.get_channels_videos(channels, 50).items():
+                self.state['channels'][channel]['last_discovered'] = now
+                found += self._track(ids, now, f"channel:{channel}")
+        self.state['stats']['discovered'] += found
+        return found
+
+    def _track(self, video_ids: List[str], now: float, source: str) -> int:
+        new = 0
+        for vid in video_ids:
+            if vid not in self.state['videos']:
+                self.state['videos'][vid] = {'source': source, 'next_due': now, 'interval': None,
+                                             'history': [], 'latest': None}
+                new += 1
+        return new
+
+    # ------------------------------------------------------------------ 刷新
+    def plan_batches(self, now: Optional[float] = None) -> List[List[str]]:
+        """
+        挑出要刷新的视频并打包成50个一批
+
+        到期的视频按逾期程度优先；最后一批不满50时，用即将到期的视频补满（同样的1单位配额，更多新鲜度）
+        """
+        now = self.clock() if now is None else now
+        videos = self.state['videos']
+        order = sorted(videos, key=lambda vid: videos[vid]['next_due'])
+        due = [vid for vid in order if videos[vid]['next_due'] <= now]
+        max_batches = self._budget(now)
+        if not due or max_batches <= 0:
+            return []
+        n_batches = min(max_batches, -(-len(due) // BATCH_SIZE))
+        selected = order[:n_batches * BATCH_SIZE]
+        return [selected[i:i + BATCH_SIZE] for i in range(0, len(selected), BATCH_SIZE)]
+
+    def refresh(self, now: Optional[float] = None) -> int:
+        """执行一轮刷新，返回刷新到的视频数"""
+        now = self.clock() if now is None else now
+        refreshed = 0
+        batches = self.plan_batches(now)
+        # 所有批次一次交给分析器（批量模式下合并成尽量少的往返）
+        selected = [vid for batch in batches for vid in batch]
+        results = {}
+        if selected:
+            results = {v['video_id']: v for v in self.analyzer.get_video_details(selected)}
+            self._spend(now, len(batches))
+        self.state['stats']['batches'] += len(batches)
+        for vid in selected:
+            video = results.get(vid)
+            if video is None:
+                if not any(e.get('video_ids') and vid in e['video_ids'] for e in self.analyzer.errors):
+                    self.state['videos'].pop(vid, None)  # 视频已删除/私密
+                continue
+            self._update(vid, video, now)
+            refreshed += 1
+        self.analyzer.errors = []
+        self.state['stats']['refreshed'] += refreshed
+        return refreshed
+
+    def _update(self, vid: str, video: Dict, now: float):
+        entry = self.state['videos'][vid]
+        if video['days_since_published'] > MAX_TRACK_DAYS:
+            self.state['videos'].pop(vid, None)
+            return
+        history = entry['history']
+        observed = None
+        if history:
+            last_time, last_views = history[-1]
+            if now > last_time:
+                observed = (video['view_count'] - last_views) / (now - last_time)
+        history.append([now, video['view_count']])
+        del history[:-HISTORY_LENGTH]
+        expected = video['avg_daily_views'] / 86400
+        entry['interval'] = next_interval(video['trend_label'], entry['interval'], observed, expected)
+        entry['next_due'] = now + entry['interval']
+        entry['latest'] = {
+            'title': video['title'],
+            'channel_title': video['channel_title'],
+            'view_count': video['view_count'],
+            'heat_score': video['heat_score'],
+            'trend_label': video['trend_label'],
+            'engagement_rate': video['engagement_rate'],
+            'checked_at': now,
+        }
+
+    # ------------------------------------------------------------------ 主循环
+    def tick(self) -> Dict:
+        """执行一轮：发现 → 刷新 → 保存"""
+        now = self.clock()
+        discovered = self.discover(now)
+        refreshed = self.refresh(now)
+        self.save()
+        return {'discovered': discovered, 'refreshed': refreshed,
+                'tracked': len(self.state['videos']), 'units_last_hour': self._units_last_hour(now)}
+
+    def seconds_until_next(self) -> float:
+        now = self.clock()
+        times = [v['next_due'] for v in self.state['videos'].values()]
+        times += [m['last_discovered'] + KEYWORD_DISCOVERY_INTERVAL for m in self.state['keywords'].values()]
+        times += [m['last_discovered'] + CHANNEL_DISCOVERY_INTERVAL for m in self.state['channels'].values()]
+        if not times:
+            return 60.0
+        return max(1.0, min(min(times) - now, 300.0))
+
+    def stop(self, *_):
+        self._stop = True
+
+    def run(self):
+        """常驻运行，SIGINT/SIGTERM 时保存状态后退出"""
+        signal.signal(signal.SIGINT, self.stop)
+        signal.signal(signal.SIGTERM, self.stop)
+        print(f"👀 关注列表守护进程已启动: {len(self.state['keywords'])} 个关键词, "
+              f"{len(self.state['channels'])} 个频道, {len(self.state['videos'])} 个跟踪中的视频")
+        while not self._stop:
+            summary = self.tick()
+            print(f"[{time.strftime('%H:%M:%S')}] 新发现 {summary['discovered']} | 刷新 {summary['refreshed']} | "
+                  f"跟踪 {summary['tracked']} | 近1小时配额 {summary['units_last_hour']}", flush=True)
+            deadline = time.time() + self.seconds_until_next()
+            while not self._stop and time.time() < deadline:
+                time.sleep(min(1.0, deadline - time.time()))
+        self.save()
+        print("💾 状态已保存，退出")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="YouTube关注列表守护进程")
+    parser.add_argument("--state", default=DEFAULT_STATE_FILE, help="状态文件路径")
+    parser.add_argument("--add-keyword", action="append", default=[], help="添加关注关键词")
+    parser.add_argument("--add-channel", action="append", default=[], help="添加关注频道")
+    parser.add_argument("--remove", action="append", default=[], help="移除关键词或频道")
+    parser.add_argument("--quota-per-hour", type=int, default=1000, help="每小时配额上限")
+    parser.add_argument("--once", action="store_true", help="只执行一轮")
+    parser.add_argument("--batch-requests", action="store_true",
+                        help="批量模式：多个关键词/频道/详情批次的调用合并成一次HTTP往返")
+    args = parser.parse_args()
+
+    api_key = os.getenv('YOUTUBE_API_KEY')
+    if not api_key and os.path.exists('config.json'):
+        with open('config.json', 'r', encoding='utf-8') as f:
+            api_key = json.load(f).get('youtube_api_key')
+    if not api_key:
+        print("⚠️ 请先设置 YOUTUBE_API_KEY 或 config.json")
+        return 1
+
+    analyzer = YouTubeAnalyzer(api_key, quiet=True, batch_requests=args.batch_requests)
+    daemon = WatchlistDaemon(analyzer, state_file=args.state,
+                             quota_per_hour=args.quota_per_hour)
+    for keyword in args.add_keyword:
+        daemon.add_keyword(keyword)
+    for channel in args.add_channel:
+        daemon.add_channel(channel)
+    for entry in args.remove:
+        daemon.remove(entry)
+    daemon.save()
+
+    if args.once:
+        print(daemon.tick())
+    else:
+        daemon.run()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -6,10 +6,24 @@
 """
 import json
 import os
-from typing import Any, Dict
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, Mapping, Optional, Tuple
 from flask import Flask, jsonify, render_template, request
 
-from youtube_analyzer import YouTubeAnalyzer
+from admission import DEFAULT_REQUEST_QUOTA_CAP, Rejected, admission_from_config
+from http_transport import transport_from_config
+from key_pool import load_key_pool, quota_cost
+from local_index import DEFAULT_INDEX_PATH, LocalIndex
+from resilience import CIRCUIT_OPEN, QUOTA
+from result_store import ResultStore
+from run_history import DEFAULT_HISTORY_PATH, RunHistory, query_params
+from search_cache import DEFAULT_FRESHNESS, DEFAULT_SEARCH_CACHE_PATH, SearchCache
+from scoring_rules import load_strategies
+from thumbnails import DEFAULT_CACHE_DIR, ThumbnailFetcher
+from tracing import PROFILE_MODES, profile_capture
+from youtube_analyzer import DURATION_CLASSES, YouTubeAnalyzer
 
 app = Flask(__name__, template_folder="templates", static_folder="static")
 
@@ -33,16 +47,50 @@ SUGGESTIONS = CONFIG.get("search_keywords_suggestions", [
 ])
 
 
-def _get_api_key() -> str:
-    env_key = os.getenv("YOUTUBE_API_KEY")
-    if env_key:
-        return env_key
-    return CONFIG.get("youtube_api_key", "")
+# 进程内共享的密钥池（YOUTUBE_API_KEYS / config.json youtube_api_keys，兼容单个密钥）
+KEY_POOL = load_key_pool(CONFIG)
+
+# 连接池 HTTP 传输：所有请求、线程和密钥共用长连接（config.json 的 http_pool_maxsize 等，0 用 httplib2）
+TRANSPORT = transport_from_config(CONFIG)
+
+# 本地视频索引：每次分析解析到的视频都会写入，input_type=local 直接查询（不消耗配额）
+LOCAL_INDEX = LocalIndex(CONFIG.get("local_index_path", DEFAULT_INDEX_PATH))
+
+# 评分策略（config.json 的 scoring_rules / scoring_rules_file / scoring_strategies），请求参数 strategy 选择
+STRATEGIES = load_strategies(CONFIG)
+
+# 缩略图下载器：进程内共享连接池与磁盘缓存
+THUMBNAIL_FETCHER = ThumbnailFetcher(cache_dir=CONFIG.get("thumbnail_cache_dir", DEFAULT_CACHE_DIR))
+
+# 运行历史：同一查询与上一次运行对比，only_new=1 只返回新上榜的视频
+RUN_HISTORY = RunHistory(CONFIG.get("run_history_path", DEFAULT_HISTORY_PATH))
+
+# search.list 结果缓存：新鲜期内同样的关键词/地区/语言/时长搜索直接复用（持久化，跨进程重启）
+SEARCH_CACHE = SearchCache(CONFIG.get("search_cache_path", DEFAULT_SEARCH_CACHE_PATH),
+                           freshness=CONFIG.get("search_cache_ttl", DEFAULT_FRESHNESS))
+
+# 查询结果列式缓存：同一查询只改筛选门槛时直接在内存中重新筛选，不调用API
+RESULT_STORE = ResultStore(max_entries=CONFIG.get("result_cache_entries", 64),
+                           ttl=CONFIG.get("result_cache_ttl", 15 * 60))
+
+# 准入控制：按客户端/调用方密钥限流，全局并发闸门 + 短队列，过载时快速返回 429/503
+ADMISSION = admission_from_config(CONFIG)
+
+# 单个请求最多花费的配额单位（0 不限），超出后返回已获取的部分结果
+REQUEST_QUOTA_CAP = CONFIG.get("request_quota_cap", DEFAULT_REQUEST_QUOTA_CAP) or None
+
+# 按需剖析：默认只对带已登记调用方密钥（client_api_keys）的请求开放；allow_profiling 为 true 时对所有人开放。
+# 同一时间只剖析一个请求（多个 cProfile 会话不能并存），目录里只保留最新的 profile_keep 个文件
+ALLOW_PROFILING = bool(CONFIG.get("allow_profiling", False))
+PROFILE_KEEP = int(CONFIG.get("profile_keep", 20))
+PROFILE_LOCK = threading.Lock()
 
 
 # 打印启动信息
 print("-" * 40)
-if os.getenv("YOUTUBE_API_KEY"):
+if KEY_POOL is not None and len(KEY_POOL) > 1:
+    print(f"✅ Using API key pool with {len(KEY_POOL)} keys")
+elif os.getenv("YOUTUBE_API_KEY"):
     print("✅ Using API Key from Environment Variable")
 elif CONFIG.get("youtube_api_key"):
     print("✅ Using API Key from config.json")
@@ -69,37 +117,108 @@ def _parse_float(value: str, default: float) -> float:
         return default
 
 
+def _parse_list(value: str, default: list) -> list:
+    items = [v.strip() for v in (value or "").split(",") if v.strip()]
+    return items or list(default)
+
+
+def _fanout_options(args: Mapping[str, str]) -> Dict[str, Any]:
+    """扇出搜索的网格参数（逗号分隔的地区/语言/时长分类 + 时间窗口与切片）"""
+    return {
+        "regions": _parse_list(args.get("regions"), _get_setting("fanout_regions", ["US"])),
+        "languages": _parse_list(args.get("languages"), _get_setting("fanout_languages", ["en"])),
+        "durations": _parse_list(args.get("durations"), _get_setting("fanout_durations", ["medium"])),
+        "window_days": _parse_int(args.get("window_days"), _get_setting("fanout_window_days", 14)),
+        "slice_days": _parse_int(args.get("slice_days"), _get_setting("fanout_slice_days", 0)),
+        "quota_budget": _parse_int(args.get("quota_budget"), _get_setting("fanout_quota_budget", 2000)),
+    }
+
+
+def render_index() -> str:
+    """首页 HTML（Flask 与 ASGI 入口共用同一份渲染结果）"""
+    with app.app_context():
+        return render_template("index.html")
+
+
 @app.route("/")
 def index():
-    return render_template("index.html")
+    return render_index()
 
 
-@app.route("/api/analyze", methods=["GET"])
-def api_analyze():
-    api_key = _get_api_key()
-    if not api_key:
-        return jsonify({"error": "Missing API key. Set YOUTUBE_API_KEY or config.json"}), 400
-
-    input_type = request.args.get("input_type", "keyword")
-    input_value = request.args.get("value", "").strip()
+@contextmanager
+def _profiled(mode: Optional[str], label: str) -> Iterator[Dict]:
+    """剖析一次分析（调用方已拿到 PROFILE_LOCK），结束后释放锁"""
+    try:
+        with profile_capture(mode, output_dir=_get_setting("profile_dir", "profiles"), label=label,
+                             keep=PROFILE_KEEP) as prof:
+            yield prof
+    finally:
+        if mode:
+            PROFILE_LOCK.release()
+
+
+def analyze_request(args: Mapping[str, str],
+                    caller_key: Optional[str] = None) -> Tuple[Dict[str, Any], int, Dict[str, str]]:
+    """
+    /api/analyze 的处理逻辑（与网页框架无关，Flask 与 ASGI 入口共用）
+
+    Args:
+        args: 查询参数
+        caller_key: 已登记的调用方密钥（ADMISSION.identify 的结果），未登记为 None
+
+    Returns:
+        (响应体, 状态码, 额外响应头)
+    """
+    input_type = args.get("input_type", "keyword")
+    if KEY_POOL is None and input_type != "local":
+        return {"error": "Missing API key. Set YOUTUBE_API_KEY or config.json"}, 400, {}
+
+    input_value = args.get("value", "").strip()
     if not input_value:
-        return jsonify({"error": "参数 value 不能为空"}), 400
-
-    max_results = _parse_int(request.args.get("max_results"), _get_setting("default_max_results", 30))
-    min_views = _parse_int(request.args.get("min_views"), _get_setting("min_views", 50000))
-    min_engagement = _parse_float(request.args.get("min_engagement"), _get_setting("min_engagement_rate", 2.0))
-    max_days = _parse_int(request.args.get("max_days"), _get_setting("max_days_since_published", 14))
-    min_duration = _parse_int(request.args.get("min_duration"), _get_setting("min_duration_seconds", 60))
-    max_duration = _parse_int(request.args.get("max_duration"), _get_setting("max_duration_seconds", 900))
-    cpm_low = _parse_float(request.args.get("cpm_low"), _get_setting("cpm_low", 2.0))
-    cpm_high = _parse_float(request.args.get("cpm_high"), _get_setting("cpm_high", 4.0))
+        return {"error": "参数 value 不能为空"}, 400, {}
+
+    max_results = _parse_int(args.get("max_results"), _get_setting("default_max_results", 30))
+    if REQUEST_QUOTA_CAP and input_type == "keyword":
+        # 搜索每页50条花100配额、详情每50条1配额：max_results 压到单请求上限负担得起的页数
+        per_page = quota_cost("search.list") + quota_cost("videos.list")
+        max_results = min(max_results, max(1, REQUEST_QUOTA_CAP // per_page) * 50)
+    min_views = _parse_int(args.get("min_views"), _get_setting("min_views", 50000))
+    min_engagement = _parse_float(args.get("min_engagement"), _get_setting("min_engagement_rate", 2.0))
+    max_days = _parse_int(args.get("max_days"), _get_setting("max_days_since_published", 14))
+    min_duration = _parse_int(args.get("min_duration"), _get_setting("min_duration_seconds", 60))
+    max_duration = _parse_int(args.get("max_duration"), _get_setting("max_duration_seconds", 900))
+    cpm_low = _parse_float(args.get("cpm_low"), _get_setting("cpm_low", 2.0))
+    cpm_high = _parse_float(args.get("cpm_high"), _get_setting("cpm_high", 4.0))
+    dedup = args.get("dedup", str(_get_setting("dedup", False))).lower() in ("1", "true", "yes")
+    thumbnails = args.get("thumbnails", str(_get_setting("thumbnails", False))).lower() in ("1", "true", "yes")
+    comments_top_k = _parse_int(args.get("comments"), _get_setting("comments_top_k", 0))
+    only_new = args.get("only_new", "").lower() in ("1", "true", "yes")
+    refresh = args.get("refresh", "").lower() in ("1", "true", "yes")
+    profile_mode = args.get("profile") or None
+    if profile_mode and profile_mode not in PROFILE_MODES:
+        return {"error": f"profile 仅支持: {', '.join(PROFILE_MODES)}"}, 400, {}
+    if profile_mode and not (ALLOW_PROFILING or caller_key):
+        return {"error": "剖析仅对已登记的调用方密钥开放"}, 403, {}
+    strategy = args.get("strategy") or ("default" if "default" in STRATEGIES else None)
+    if strategy and strategy not in STRATEGIES:
+        return {"error": f"strategy 仅支持: {', '.join(STRATEGIES) or '（未配置）'}"}, 400, {}
 
     analyzer = YouTubeAnalyzer(
-        api_key,
+        None,
+        key_pool=KEY_POOL,
+        local_index=LOCAL_INDEX,
+        thumbnail_fetcher=THUMBNAIL_FETCHER,
+        rule_engine=STRATEGIES.get(strategy) if strategy else None,
+        run_history=RUN_HISTORY,
+        search_cache=None if refresh else SEARCH_CACHE,
+        transport=TRANSPORT,
+        batch_requests=CONFIG.get("batch_requests", False),
+        quota_limit=REQUEST_QUOTA_CAP,
         cpm_low=cpm_low,
         cpm_high=cpm_high,
         default_language=_get_setting("language", "en"),
-        default_region_code=_get_setting("region_code", "US")
+        default_region_code=_get_setting("region_code", "US"),
+        quiet=_get_setting("quiet", False)
     )
 
     # 这里禁止导出Excel，保持响应快速
@@ -110,29 +229,90 @@ def api_analyze():
             len(v) == 24 and all(ch.isalnum() or ch in "-_" for ch in v)
         )
         if not is_valid:
-            return jsonify({"error": "请输入有效的频道URL或ID（例如 https://www.youtube.com/@xxxx 或 https://www.youtube.com/channel/UC... 或 24位频道ID）"}), 400
-
-    results = analyzer.analyze(
-        input_type=input_type,
-        input_value=input_value,
-        max_results=max_results,
-        min_views=min_views,
-        min_engagement=min_engagement,
-        export=False,
-        language=request.args.get("language") or _get_setting("language", "en"),
-        region=request.args.get("region") or _get_setting("region_code", "US")
-    )
-
-    # 再次按前端参数过滤时长范围（analyze内部已按默认值过滤，但这里尊重前端传入覆盖）
-    filtered = [
-        v for v in results
-        if min_duration <= v.get("duration_seconds", 0) <= max_duration
-        and v.get("days_since_published", 9999) <= max_days
-    ]
-
-    return jsonify({
-        "count": len(filtered),
-        "items": filtered,
+            return {"error": "请输入有效的频道URL或ID（例如 https://www.youtube.com/@xxxx 或 https://www.youtube.com/channel/UC... 或 24位频道ID）"}, 400, {}
+
+    fanout = None
+    if input_type == "fanout":
+        fanout = _fanout_options(args)
+        if REQUEST_QUOTA_CAP:
+            # 扇出按预算裁掉最旧的子查询，比执行到一半撞上单请求上限更可控
+            fanout["quota_budget"] = min(fanout["quota_budget"], REQUEST_QUOTA_CAP)
+        if any(d not in DURATION_CLASSES for d in fanout["durations"]):
+            return {"error": f"durations 仅支持: {', '.join(DURATION_CLASSES)}"}, 400, {}
+
+    language = args.get("language") or _get_setting("language", "en")
+    region = args.get("region") or _get_setting("region_code", "US")
+    # 缓存键只包含决定抓取结果的参数，门槛类参数变化时命中缓存（local 查询本身不耗配额，不缓存）
+    cache_key = None
+    if input_type != "local":
+        cache_key = RESULT_STORE.key(input_type=input_type, input_value=input_value, max_results=max_results,
+                                     language=language, region=region, fanout=fanout, strategy=strategy,
+                                     cpm_low=cpm_low, cpm_high=cpm_high)
+    cached = RESULT_STORE.get(cache_key) if cache_key and not refresh else None
+
+    if profile_mode and not PROFILE_LOCK.acquire(blocking=False):
+        return {"error": "已有剖析在进行，请稍后重试"}, 429, {"Retry-After": "1"}
+    with _profiled(profile_mode, label=input_value) as prof:
+        if cached is not None:
+            # 区间查询 + 按热度重排；缩略图走磁盘缓存、去重是纯计算，评论按本次请求的 comments 重新抽样
+            with analyzer.tracer.span("result_store.query"):
+                results = cached.query(min_views=min_views, min_engagement=min_engagement, max_days=max_days,
+                                       min_duration=min_duration, max_duration=max_duration)
+            if thumbnails:
+                analyzer.enrich_thumbnails(results)
+            if dedup:
+                results = analyzer.dedup_videos(results)
+            if comments_top_k:
+                analyzer.sample_comments(results, top_k=comments_top_k)
+            # 只对比、不记录：调门槛不算一次新的运行
+            results = analyzer.compare_with_history(
+                results, query_params(input_type, input_value, max_results=max_results, min_views=min_views,
+                                      min_engagement=min_engagement, max_days=max_days,
+                                      min_duration=min_duration, max_duration=max_duration,
+                                      language=language, region=region, fanout=fanout, dedup=dedup),
+                only_new=only_new, record=False)
+        else:
+            results = analyzer.analyze(
+                input_type=input_type,
+                input_value=input_value,
+                max_results=max_results,
+                min_views=min_views,
+                min_engagement=min_engagement,
+                export=False,
+                language=language,
+                region=region,
+                max_days=max_days,
+                min_duration=min_duration,
+                max_duration=max_duration,
+                fanout=fanout,
+                dedup=dedup,
+                thumbnails=thumbnails,
+                comments_top_k=comments_top_k,
+                only_new=only_new
+            )
+            # 不完整的结果不缓存，下次重新抓取
+            if cache_key and analyzer.last_videos and not analyzer.errors:
+                RESULT_STORE.put(cache_key, analyzer.last_videos)
+
+    # 配额耗尽/熔断且没有任何结果：快速返回503，提示重试时间
+    blocking = [e for e in analyzer.errors if e["kind"] in (QUOTA, CIRCUIT_OPEN)]
+    if not results and blocking:
+        headers = {}
+        retry_at = blocking[-1].get("retry_at")
+        if retry_at:
+            wait = (datetime.fromisoformat(retry_at) - datetime.now(timezone.utc)).total_seconds()
+            headers["Retry-After"] = str(max(1, int(wait)))
+        return {"error": "YouTube API 配额已用尽或暂时不可用", "errors": analyzer.errors}, 503, headers
+
+    return {
+        "count": len(results),
+        "items": results,
+        "partial": bool(analyzer.errors),
+        "cached": cached is not None,
+        "errors": analyzer.errors,
+        "timings": analyzer.tracer.export(),
+        "profile": os.path.basename(prof["path"]) if prof["path"] else None,
+        "quota": {"spent": analyzer.quota_spent, "cap": REQUEST_QUOTA_CAP},
         "params": {
             "input_type": input_type,
             "input_value": input_value,
@@ -143,9 +323,29 @@ def api_analyze():
             "min_duration": min_duration,
             "max_duration": max_duration,
             "cpm_low": cpm_low,
-            "cpm_high": cpm_high
-        }
-    })
+            "cpm_high": cpm_high,
+            "fanout": fanout,
+            "dedup": dedup,
+            "thumbnails": thumbnails,
+            "comments": comments_top_k,
+            "strategy": strategy,
+            "only_new": only_new
+        },
+        "fanout_stats": analyzer.last_fanout_stats or None,
+        "comment_stats": analyzer.last_comment_stats or None,
+        "diff": analyzer.last_diff or None
+    }, 200, {}
+
+
+@app.route("/api/analyze", methods=["GET"])
+def api_analyze():
+    client, api_key = ADMISSION.identify(request.headers, request.remote_addr, request.args)
+    try:
+        with ADMISSION.admit(client, api_key):
+            body, status, headers = analyze_request(request.args, api_key)
+    except Rejected as e:
+        body, status, headers = e.response()
+    return jsonify(body), status, headers
 
 
 @app.route("/api/suggestions", methods=["GET"])
@@ -156,6 +356,38 @@ def api_suggestions():
     })
 
 
+@app.route("/api/keys/usage", methods=["GET"])
+def api_key_usage():
+    """各API密钥的配额用量与健康状态（密钥已脱敏）"""
+    if KEY_POOL is None:
+        return jsonify({"keys": []})
+    return jsonify({"keys": KEY_POOL.usage()})
+
+
+@app.route("/api/rules/stats", methods=["GET"])
+def api_rule_stats():
+    """各评分策略的规则命中数与求值耗时（进程内累计）"""
+    return jsonify({"strategies": [engine.report() for engine in STRATEGIES.values()]})
+
+
+@app.route("/api/search-cache/stats", methods=["GET"])
+def api_search_cache_stats():
+    """搜索缓存命中次数与节省的配额"""
+    return jsonify(SEARCH_CACHE.stats())
+
+
+@app.route("/api/admission/stats", methods=["GET"])
+def api_admission_stats():
+    """准入控制的执行/排队数与限流、过载拒绝计数"""
+    return jsonify(ADMISSION.stats())
+
+
+@app.route("/api/transport/stats", methods=["GET"])
+def api_transport_stats():
+    """API调用的连接复用率与单次调用耗时"""
+    return jsonify(TRANSPORT.stats() if TRANSPORT is not None else {"transport": "httplib2"})
+
+
 @app.route("/health")
 def health():
     return {"status": "ok"}
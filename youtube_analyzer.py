@@ -9,11 +9,30 @@ import os
 import json
 import re
 import sys
-from datetime import datetime, timedelta
-from typing import List, Dict, Optional
+import argparse
+import itertools
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Iterator, List, Dict, Optional, Tuple, Union
 import pandas as pd
 from googleapiclient.discovery import build
-from googleapiclient.errors import HttpError
+from googleapiclient.http import BatchHttpRequest
+
+from comments import CommentStats
+from dedup import collapse_duplicates
+from http_transport import PooledTransport
+from key_pool import ApiKeyPool, quota_cost
+from local_index import DEFAULT_INDEX_PATH, LocalIndex
+from resilience import (BUDGET, CIRCUIT_OPEN, QUOTA, RETRYABLE, ApiCallError, CircuitBreaker, RetryPolicy,
+                        breaker_for, call_with_retry, classify_error)
+from run_history import RunHistory, query_key, query_params
+from search_cache import PAGE_SIZE, SearchCache
+from scoring_rules import DEFAULT_RULES, RuleEngine
+from thumbnails import ThumbnailFetcher, enrich_thumbnails
+from tracing import PROFILE_MODES, Tracer, profile_capture, traced
 
 # 确保控制台输出使用UTF-8，避免emoji打印报错
 try:
@@ -24,11 +43,92 @@ try:
 except Exception:
     pass
 
+# search.list 的 videoDuration 取值：short <4分钟, medium 4-20分钟, long >20分钟（由API按时长过滤）
+DURATION_CLASSES = ('short', 'medium', 'long', 'any')
+
+# 多路结果融合（RRF）的平滑常数
+RRF_K = 60
+
+# 批量模式下每个 BatchHttpRequest 最多打包的子请求数
+BATCH_LIMIT = 50
+
+# analyze_iter 中待抓详情的ID页队列长度（每页最多50个ID，决定流式分析的内存上限）
+ITER_QUEUE_PAGES = 4
+# 提前结束时最多等翻页线程多久（秒）；线程卡在慢调用/退避重试里时不再等，它放下当前页后自行退出
+ITER_STOP_WAIT = 1.0
+_PAGES_DONE = object()
+
+# Excel 导出的基本列（字段名, 中文列名）
+EXPORT_COLUMNS = [
+    ('heat_score', '热度指数'), ('title', '视频标题'), ('view_count', '播放量'),
+    ('like_count', '点赞数'), ('comment_count', '评论数'), ('engagement_rate', '互动率(%)'),
+    ('revenue_mid', '预估收益(中值$)'), ('revenue_low', '预估收益(低$)'), ('revenue_high', '预估收益(高$)'),
+    ('hot_reasons_text', '爆红原因'), ('avg_daily_views', '日均播放'), ('trend_label', '趋势标签'),
+    ('channel_title', '频道名称'), ('published_at', '发布日期'), ('days_since_published', '发布天数'),
+    ('duration', '时长'), ('url', '视频链接'), ('video_id', '视频ID'),
+]
+
+# 导出列宽（按列字母）
+EXPORT_COLUMN_WIDTHS = {
+    'A': 12,  # 热度指数
+    'B': 50,  # 视频标题
+    'C': 12,  # 播放量
+    'D': 10,  # 点赞数
+    'E': 10,  # 评论数
+    'F': 12,  # 互动率
+    'G': 20,  # 频道名称
+    'H': 12,  # 发布日期
+    'I': 10,  # 发布天数
+    'J': 10,  # 时长
+    'K': 40,  # 视频链接
+    'L': 15,  # 视频ID
+}
+
+# 与运行历史对比后附加的导出列（字段名, 中文列名）
+HISTORY_COLUMNS = [
+    ('is_new', '是否新增'),
+    ('previous_rank', '上次排名'),
+    ('rank_change', '排名变化'),
+]
+
+# 评论抽样后附加的导出列（字段名, 中文列名）
+COMMENT_COLUMNS = [
+    ('comment_sample_size', '评论样本数'),
+    ('comment_question_ratio', '评论提问比例'),
+    ('comment_languages', '评论语言'),
+    ('comment_top_terms', '评论高频词'),
+]
+
+
+def export_columns(fields) -> List[tuple]:
+    """导出列：基本列 + 结果里实际存在的运行历史 / 评论列"""
+    fields = set(fields)
+    return EXPORT_COLUMNS + [(col, name) for col, name in HISTORY_COLUMNS + COMMENT_COLUMNS if col in fields]
+
+
+def _rfc3339(dt: datetime) -> str:
+    """search.list 要求的时间格式"""
+    return dt.strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
 class YouTubeAnalyzer:
     """YouTube视频分析器"""
     
     def __init__(self, api_key: str, cpm_low: float = 2.0, cpm_high: float = 4.0,
-                 default_language: str = "en", default_region_code: str = "US"):
+                 default_language: str = "en", default_region_code: str = "US",
+                 quiet: bool = False, tracer: Optional[Tracer] = None,
+                 youtube=None, api_endpoint: Optional[str] = None,
+                 retry_policy: Optional[RetryPolicy] = None,
+                 breaker: Optional[CircuitBreaker] = None,
+                 key_pool: Optional[ApiKeyPool] = None,
+                 local_index: Optional[LocalIndex] = None,
+                 thumbnail_fetcher: Optional[ThumbnailFetcher] = None,
+                 rule_engine: Optional[RuleEngine] = None,
+                 run_history: Optional[RunHistory] = None,
+                 search_cache: Optional[SearchCache] = None,
+                 transport: Optional[PooledTransport] = None,
+                 batch_requests: bool = False,
+                 quota_limit: Optional[int] = None):
         """
         初始化分析器
         
@@ -36,62 +136,507 @@ class YouTubeAnalyzer:
             api_key: YouTube Data API v3 密钥
             cpm_low: 预估每千次播放CPM下限（美元）
             cpm_high: 预估每千次播放CPM上限（美元）
+            quiet: 静默模式，关闭控制台输出
+            tracer: 阶段耗时追踪器（不传则内部新建）
+            youtube: 注入的API服务对象（测试/基准用桩，不传则用 googleapiclient 构建）
+            api_endpoint: API根地址（默认官方地址；可指向本地模拟服务器，也可用环境变量 YOUTUBE_API_ENDPOINT）
+            retry_policy: 重试策略（默认指数退避+抖动，最多4次）
+            breaker: 熔断器（默认按API key在进程内共享）
+            key_pool: 多密钥轮换池（传入后每次调用路由到最健康的密钥，api_key 可为空）
+            local_index: 本地视频索引（传入后每批解析的视频都会写入，并支持 input_type='local' 查询）
+            thumbnail_fetcher: 缩略图下载器（缩略图去重时使用，不传则按需新建）
+            rule_engine: 配置驱动的评分规则引擎（传入后按页重算热度、趋势和爆红原因）
+            run_history: 运行历史（传入后每次分析与同一查询的上一次运行对比，支持只看新增）
+            search_cache: search.list 结果缓存（传入后新鲜期内同样的搜索直接复用，不消耗配额）
+            transport: 连接池 HTTP 传输（替代默认的 httplib2，所有线程和密钥共用长连接）
+            batch_requests: 批量模式（互不依赖的 videos / channels / playlistItems / search 调用
+                            用 BatchHttpRequest 打包，一次HTTP往返执行多个）
+            quota_limit: 该分析器最多花费的配额单位（网页服务每个请求一个分析器，即单请求上限），
+                         超出后的调用不再发出，记为 budget 错误并返回部分结果；None 不限
         """
+        if not api_key and key_pool is not None:
+            api_key = key_pool.keys[0]
         self.api_key = api_key
-        self.youtube = build('youtube', 'v3', developerKey=api_key)
+        self.key_pool = key_pool
+        self.local_index = local_index
+        self.thumbnail_fetcher = thumbnail_fetcher
+        self.rule_engine = rule_engine
+        self.run_history = run_history
+        self.search_cache = search_cache
+        self.transport = transport
+        self.batch_requests = batch_requests
+        self.quota_limit = quota_limit
+        self.quota_spent = 0
+        self._quota_lock = threading.Lock()
+        self.quiet = quiet
+        self.tracer = tracer or Tracer()
+        self.api_endpoint = api_endpoint or os.getenv('YOUTUBE_API_ENDPOINT') or None
+        self._injected_service = youtube is not None
+        self._local = threading.local()  # googleapiclient 服务对象非线程安全，按线程缓存
+        # 没有密钥时（如只查本地索引）不构建服务对象
+        self.youtube = youtube if youtube is not None else (self._service_for(api_key) if api_key else None)
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.breaker = breaker or breaker_for(api_key)
+        self.errors: List[Dict] = []  # 本次分析中失败的调用（部分结果的错误标记）
+        self.last_fanout_stats: Dict = {}
+        self.last_comment_stats: Dict = {}
+        self.last_iter_stats: Dict = {}
+        self.last_diff: Dict = {}
+        self.last_videos: List[Dict] = []  # 最近一次分析筛选前的完整结果（供结果缓存按新门槛重新筛选）
         self.videos_data = []
         self.cpm_low = cpm_low
         self.cpm_high = cpm_high
-        self.hot_keywords = [
-            'hack', 'hacks', 'diy', 'tips', 'trick', 'tricks', 'challenge', 'viral',
-            'recipe', 'cook', 'cooking', 'air fryer', 'slime', 'asmr', 'shortcut',
-            'easy', 'fast', 'quick', 'life', 'tiktok', 'shorts'
-        ]
+        self.hot_keywords = list(DEFAULT_RULES['keywords']['hot_keywords'])
         self.trend_window_days = 14
         self.default_language = default_language
         self.default_region_code = default_region_code
+
+    def _log(self, *args, **kwargs):
+        """控制台输出（静默模式下不输出）"""
+        if not self.quiet:
+            print(*args, **kwargs)
+
+    def _service_for(self, key: str):
+        """按密钥构建（并按线程缓存）API服务对象；注入的服务对象对所有密钥共用"""
+        if self._injected_service:
+            return self.youtube
+        services = getattr(self._local, 'services', None)
+        if services is None:
+            services = self._local.services = {}
+        service = services.get(key)
+        if service is None:
+            client_options = {'api_endpoint': self.api_endpoint} if self.api_endpoint else None
+            service = build('youtube', 'v3', developerKey=key, client_options=client_options,
+                            http=self.transport)
+            services[key] = service
+        return service
+
+    def _execute(self, make_request: Callable, method: str) -> Dict:
+        """
+        执行一次API调用（经过重试与熔断；配置了密钥池时按密钥轮换）
+
+        Args:
+            make_request: 接收服务对象、返回请求对象的函数，如 lambda yt: yt.videos().list(...)
+            method: 接口名（如 'videos.list'），用于追踪与配额计算
+
+        Raises:
+            ApiCallError: 分类后的最终失败
+        """
+        with self.tracer.span('api_call', method=method) as record:
+            try:
+                self._charge(quota_cost(method))
+                if self.key_pool is None:
+                    service = self._service_for(self.api_key)
+                    return call_with_retry(lambda: make_request(service).execute(),
+                                           breaker=self.breaker, policy=self.retry_policy)
+                return self._execute_with_pool(make_request, method, record)
+            except ApiCallError as e:
+                record['attrs']['error_kind'] = e.kind
+                raise
+
+    def _charge(self, cost: int):
+        """调用前记账；超出 quota_limit 时抛出 budget 错误（每个逻辑调用计一次，退避重试不重复计）"""
+        with self._quota_lock:
+            if self.quota_limit is not None and self.quota_spent + cost > self.quota_limit:
+                raise ApiCallError(BUDGET, f"request quota cap {self.quota_limit} reached "
+                                           f"(spent {self.quota_spent}, next call costs {cost})",
+                                   reason='requestQuotaCap')
+            self.quota_spent += cost
+
+    def _execute_with_pool(self, make_request: Callable, method: str, record: Dict) -> Dict:
+        """从密钥池取最健康的密钥执行；某个密钥配额耗尽/熔断时换下一个密钥"""
+        cost = quota_cost(method)
+        last_error: Optional[ApiCallError] = None
+        for _ in range(len(self.key_pool)):
+            key = self.key_pool.acquire(cost)
+            record['attrs']['key_index'] = self.key_pool.keys.index(key)
+            service = self._service_for(key)
+            try:
+                response = call_with_retry(lambda: make_request(service).execute(),
+                                           breaker=breaker_for(key), policy=self.retry_policy)
+            except ApiCallError as e:
+                self.key_pool.record_failure(key, e, cost)
+                if e.kind not in (QUOTA, CIRCUIT_OPEN):
+                    raise
+                last_error = e
+                continue
+            self.key_pool.record_success(key, cost)
+            return response
+        raise last_error
+
+    def _new_batch(self, service) -> BatchHttpRequest:
+        """批量请求对象（服务对象默认的批量地址固定为官方地址，自定义 API 地址时改指向它的 /batch）"""
+        if self.api_endpoint:
+            return BatchHttpRequest(batch_uri=self.api_endpoint.rstrip('/') + '/batch')
+        return service.new_batch_http_request()
+
+    def _execute_many(self, calls: List[Tuple[Callable, str]]) -> List[Union[Dict, ApiCallError]]:
+        """
+        执行多个互不依赖的API调用，按顺序返回每个调用的响应或 ApiCallError
+
+        批量模式下每 BATCH_LIMIT 个调用打包成一次HTTP往返，子请求各自回调、各自分类错误；
+        可重试的子请求（限流/5xx，配置了多个密钥时还有配额耗尽/熔断）退避后重新打包。
+        未开启批量模式或注入了桩服务时逐个执行
+
+        Args:
+            calls: (make_request, method) 列表，含义同 _execute
+        """
+        if not self.batch_requests or self._injected_service or len(calls) <= 1:
+            results = []
+            for make_request, method in calls:
+                try:
+                    results.append(self._execute(make_request, method))
+                except ApiCallError as e:
+                    results.append(e)
+            return results
+
+        retryable = RETRYABLE
+        if self.key_pool is not None and len(self.key_pool) > 1:
+            retryable = RETRYABLE + (QUOTA, CIRCUIT_OPEN)
+        results: List = [None] * len(calls)
+        pending = []
+        for i, (_, method) in enumerate(calls):
+            try:
+                self._charge(quota_cost(method))
+                pending.append(i)
+            except ApiCallError as e:
+                results[i] = e
+        for attempt in range(self.retry_policy.max_attempts):
+            if attempt:
+                self.retry_policy.sleep(self.retry_policy.delay(attempt - 1))
+            for start in range(0, len(pending), BATCH_LIMIT):
+                self._send_batch(calls, pending[start:start + BATCH_LIMIT], results)
+            pending = [i for i in pending if isinstance(results[i], ApiCallError) and results[i].kind in retryable]
+            if not pending:
+                break
+        return results
+
+    def _send_batch(self, calls: List[Tuple[Callable, str]], indices: List[int], results: List):
+        """把一组调用打包成一个 BatchHttpRequest 执行，响应或错误按下标写回 results"""
+        costs = {i: quota_cost(calls[i][1]) for i in indices}
+        with self.tracer.span('api_call', method='batch', size=len(indices)) as record:
+            key = None
+            try:
+                key = self.key_pool.acquire(sum(costs.values())) if self.key_pool is not None else self.api_key
+                breaker = breaker_for(key) if self.key_pool is not None else self.breaker
+                breaker.allow()
+            except ApiCallError as e:
+                record['attrs']['error_kind'] = e.kind
+                if self.key_pool is not None and key is not None:
+                    self.key_pool.release(key, sum(costs.values()))
+                for i in indices:
+                    results[i] = e
+                return
+            if self.key_pool is not None:
+                record['attrs']['key_index'] = self.key_pool.keys.index(key)
+            service = self._service_for(key)
+            settled = set()
+
+            def callback(request_id: str, response: Dict, exception: Optional[Exception]):
+                i = int(request_id)
+                settled.add(i)
+                if exception is None:
+                    results[i] = response
+                    breaker.record_success()
+                    if self.key_pool is not None:
+                        self.key_pool.record_success(key, costs[i])
+                    return
+                error = classify_error(exception)
+                results[i] = error
+                breaker.record_failure(error)
+                if self.key_pool is not None:
+                    self.key_pool.record_failure(key, error, costs[i])
+
+            batch = self._new_batch(service)
+            for i in indices:
+                batch.add(calls[i][0](service), callback=callback, request_id=str(i))
+            try:
+                batch.execute()
+            except Exception as e:  # 整个往返失败（网络、批量端点错误）：组内调用都按同一错误处理
+                error = classify_error(e)
+                record['attrs']['error_kind'] = error.kind
+                breaker.record_failure(error)
+                if self.key_pool is not None:
+                    self.key_pool.record_failure(key, error, 0)
+                    # 回调没结算到的子请求（整个往返失败时通常是全部）归还预留
+                    self.key_pool.release(key, sum(c for i, c in costs.items() if i not in settled))
+                for i in indices:
+                    results[i] = error
+
+    def _record_error(self, error: ApiCallError, stage: str, **extra):
+        """记录失败调用，调用方继续返回已获取的部分结果"""
+        self.errors.append(error.to_marker(stage, **extra))
         
+    @traced()
     def search_videos(self, keyword: str, max_results: int = 50,
                       language: Optional[str] = None,
-                      region: Optional[str] = None) -> List[str]:
+                      region: Optional[str] = None,
+                      video_duration: Optional[str] = "medium",
+                      published_after: Optional[datetime] = None,
+                      published_before: Optional[datetime] = None) -> List[str]:
         """
         根据关键词搜索视频（针对欧美地区热门内容）
         
         Args:
             keyword: 搜索关键词
-            max_results: 返回结果数量（最多50）
+            max_results: 返回结果数量（超过50时自动翻页，每页消耗100配额）
+            language: 相关语言（relevanceLanguage）
+            region: 地区代码（regionCode）
+            video_duration: 时长分类 short/medium/long，'any' 或 None 表示不限
+            published_after: 发布时间下限（默认最近14天）
+            published_before: 发布时间上限
             
         Returns:
             视频ID列表
         """
+        video_ids = []
         try:
-            # 搜索最近14天内的视频（更新鲜的内容）
-            published_after = (datetime.now() - timedelta(days=14)).isoformat() + 'Z'
+            params = self._search_params(keyword, language, region, video_duration,
+                                         published_after, published_before)
+            for page in self._iter_search_pages(params, max_results):
+                video_ids.extend(page)
+            self._log(f"✅ 找到 {len(video_ids)} 个欧美地区相关视频")
+            return video_ids
             
+        except ApiCallError as e:
+            self._log(f"❌ 搜索失败: {e}")
+            self._record_error(e, 'search_videos', keyword=keyword)
+            # 撞上单请求配额上限时保留已翻到的页
+            return video_ids if e.kind == BUDGET else []
+
+    def _search_params(self, keyword: str, language: Optional[str] = None, region: Optional[str] = None,
+                       video_duration: Optional[str] = "medium",
+                       published_after: Optional[datetime] = None,
+                       published_before: Optional[datetime] = None) -> Dict:
+        """search.list 的查询参数"""
+        # 默认搜索最近14天内的视频（更新鲜的内容）
+        params = {
+            "part": "id",
+            "q": keyword,
+            "type": "video",
+            "order": "viewCount",
+            "publishedAfter": _rfc3339(published_after or datetime.now(timezone.utc) - timedelta(days=14)),
+            "regionCode": (region or self.default_region_code),
+        }
+        if video_duration and video_duration != 'any':
+            params["videoDuration"] = video_duration
+        if published_before:
+            params["publishedBefore"] = _rfc3339(published_before)
+        lang = language or self.default_language
+        if lang:
+            params["relevanceLanguage"] = lang
+        return params
+
+    def _iter_search_pages(self, params: Dict, max_results: int) -> Iterator[List[str]]:
+        """
+        执行 search.list 并按 nextPageToken 翻页，每页产出一批视频ID，直到凑够 max_results
+
+        配置了搜索缓存时按规范化参数逐页查缓存，未命中才调用API并写回缓存
+        """
+        cache = self.search_cache
+        if cache is not None:
+            params = cache.canonical(params)
+        collected = 0
+        page_token = None
+        page_no = 0
+        while collected < max_results:
+            cached = cache.get(params, page_no) if cache is not None else None
+            if cached is not None:
+                ids, page_token = cached
+            else:
+                page = dict(params, maxResults=PAGE_SIZE if cache is not None else min(50, max_results - collected))
+                if page_token:
+                    page["pageToken"] = page_token
+                response = self._execute(lambda yt: yt.search().list(**page), 'search.list')
+                ids = [item['id']['videoId'] for item in response.get('items', [])]
+                page_token = response.get('nextPageToken')
+                if cache is not None:
+                    cache.put(params, page_no, ids, page_token)
+            ids = ids[:max_results - collected]
+            collected += len(ids)
+            yield ids
+            if not page_token:
+                break
+            page_no += 1
+
+    def _search_ids(self, params: Dict, max_results: int) -> List[str]:
+        """执行 search.list 并翻页，直到凑够 max_results"""
+        return [vid for page in self._iter_search_pages(params, max_results) for vid in page]
+
+    def _list_pages_many(self, resource: str, param_list: List[Dict], max_results: int,
+                         extract: Callable[[Dict], str],
+                         cache: Optional[SearchCache] = None) -> List[Tuple[List[str], Optional[ApiCallError]]]:
+        """
+        多个互不依赖的分页列表一起翻页：每一轮把所有还没翻完的列表的下一页交给 _execute_many
+        （批量模式下同一轮的请求一次往返），返回每个列表的 (ID列表, 错误)；出错的列表保留已翻到的页
+
+        Args:
+            resource: 'search' 或 'playlistItems'
+            extract: 从一条 item 取出视频ID
+            cache: 搜索缓存（只用于 search，规则同 _iter_search_pages）
+        """
+        states = [{'params': cache.canonical(params) if cache is not None else params, 'ids': [],
+                   'token': None, 'page': 0, 'error': None, 'done': max_results <= 0} for params in param_list]
+
+        def advance(state: Dict, ids: List[str], token: Optional[str]):
+            state['ids'].extend(ids[:max_results - len(state['ids'])])
+            state['token'] = token
+            state['page'] += 1
+            state['done'] = not token or len(state['ids']) >= max_results
+
+        while True:
+            calls, waiting = [], []
+            for state in states:
+                if state['done']:
+                    continue
+                cached = cache.get(state['params'], state['page']) if cache is not None else None
+                if cached is not None:
+                    advance(state, *cached)
+                    continue
+                page = dict(state['params'],
+                            maxResults=PAGE_SIZE if cache is not None else min(50, max_results - len(state['ids'])))
+                if state['token']:
+                    page['pageToken'] = state['token']
+                calls.append((lambda yt, page=page: getattr(yt, resource)().list(**page), f"{resource}.list"))
+                waiting.append(state)
+            if not calls:
+                if all(state['done'] for state in states):
+                    break
+                continue
+            for state, response in zip(waiting, self._execute_many(calls)):
+                if isinstance(response, ApiCallError):
+                    state.update(error=response, done=True)
+                    continue
+                ids = [extract(item) for item in response.get('items', [])]
+                token = response.get('nextPageToken')
+                if cache is not None:
+                    cache.put(state['params'], state['page'], ids, token)
+                advance(state, ids, token)
+        return [(state['ids'], state['error']) for state in states]
+
+    @traced()
+    def search_many(self, keywords: List[str], max_results: int = 50,
+                    language: Optional[str] = None,
+                    region: Optional[str] = None,
+                    video_duration: Optional[str] = "medium") -> Dict[str, List[str]]:
+        """
+        多个关键词一起搜索（参数同 search_videos），批量模式下各关键词同一页的请求打包在一次往返里
+
+        Returns:
+            关键词 → 视频ID列表（失败的关键词记录错误标记，保留已翻到的页）
+        """
+        param_list = [self._search_params(keyword, language, region, video_duration) for keyword in keywords]
+        pages = self._list_pages_many('search', param_list, max_results, lambda item: item['id']['videoId'],
+                                      self.search_cache)
+        results = {}
+        for keyword, (ids, error) in zip(keywords, pages):
+            if error is not None:
+                self._log(f"❌ 搜索失败 {keyword}: {error}")
+                self._record_error(error, 'search_videos', keyword=keyword)
+            results[keyword] = ids
+        self._log(f"✅ {len(keywords)} 个关键词共找到 {sum(len(ids) for ids in results.values())} 个视频")
+        return results
+
+    @traced()
+    def fanout_search(self, keyword: str,
+                      regions: Optional[List[str]] = None,
+                      languages: Optional[List[str]] = None,
+                      durations: Optional[List[str]] = None,
+                      window_days: int = 14,
+                      slice_days: int = 0,
+                      max_results_per_query: int = 50,
+                      max_workers: int = 8,
+                      quota_budget: Optional[int] = 5000) -> List[str]:
+        """
+        扇出搜索：关键词 × 地区 × 语言 × 时长分类 × 时间切片，并发执行后去重，按多路排名融合（RRF）
+
+        单次查询最多约500条结果且只覆盖一个地区/语言/时长，扇出后能覆盖 Shorts、长视频和其他市场。
+
+        Args:
+            keyword: 搜索关键词
+            regions: 地区代码列表（默认分析器默认地区）
+            languages: 语言列表（默认分析器默认语言）
+            durations: 时长分类列表 short/medium/long/any（默认 medium）
+            window_days: 总时间窗口（天）
+            slice_days: 时间切片长度（天），0 表示不切片
+            max_results_per_query: 每个子查询最多结果数
+            max_workers: 并发数
+            quota_budget: 本次扇出的配额上限（单位），超出的子查询（最旧的时间切片优先）不执行；None 不限
+
+        Returns:
+            去重后按融合排名排序的视频ID列表
+        """
+        regions = regions or [self.default_region_code]
+        languages = languages or [self.default_language]
+        durations = durations or ['medium']
+        for d in durations:
+            if d not in DURATION_CLASSES:
+                raise ValueError(f"无效的时长分类: {d}（可选: {', '.join(DURATION_CLASSES)}）")
+
+        # 时间切片（最新的切片排在前面，预算不足时优先保留）
+        now = datetime.now(timezone.utc)
+        window_days = max(1, window_days)
+        step = slice_days if 0 < slice_days < window_days else window_days
+        slices = []
+        for start in range(0, window_days, step):
+            end = min(start + step, window_days)
+            slices.append((now - timedelta(days=end), now - timedelta(days=start) if start else None))
+
+        queries = list(itertools.product(slices, regions, languages, durations))
+        cost_per_query = quota_cost('search.list') * max(1, -(-max_results_per_query // 50))
+        planned = len(queries)
+        if quota_budget is not None and planned * cost_per_query > quota_budget:
+            queries = queries[:max(0, quota_budget // cost_per_query)]
+            self._log(f"⚠️ 配额预算 {quota_budget} 只够执行 {len(queries)}/{planned} 个子查询")
+            self.errors.append({
+                'stage': 'fanout_search', 'kind': BUDGET, 'status': None, 'reason': 'quotaBudget',
+                'message': f"skipped {planned - len(queries)} sub-queries over budget {quota_budget}",
+            })
+
+        def run(query):
+            (after, before), region, language, duration = query
             params = {
                 "part": "id",
                 "q": keyword,
                 "type": "video",
                 "order": "viewCount",
-                "maxResults": max_results,
-                "publishedAfter": published_after,
-                "regionCode": (region or self.default_region_code),
-                "videoDuration": "medium"
+                "publishedAfter": _rfc3339(after),
+                "regionCode": region,
             }
-            lang = language or self.default_language
-            if lang:
-                params["relevanceLanguage"] = lang
-            request = self.youtube.search().list(**params)
-            response = request.execute()
-            
-            video_ids = [item['id']['videoId'] for item in response.get('items', [])]
-            print(f"✅ 找到 {len(video_ids)} 个欧美地区相关视频")
-            return video_ids
-            
-        except HttpError as e:
-            print(f"❌ 搜索失败: {e}")
-            return []
+            if before:
+                params["publishedBefore"] = _rfc3339(before)
+            if language:
+                params["relevanceLanguage"] = language
+            if duration != 'any':
+                params["videoDuration"] = duration
+            try:
+                return self._search_ids(params, max_results_per_query)
+            except ApiCallError as e:
+                self._record_error(e, 'fanout_search', keyword=keyword, region=region,
+                                   language=language, duration=duration,
+                                   published_after=params["publishedAfter"])
+                return []
+
+        scores: Dict[str, float] = {}
+        hits = 0
+        with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+            for ids in pool.map(run, queries):
+                hits += len(ids)
+                for rank, vid in enumerate(ids):
+                    scores[vid] = scores.get(vid, 0.0) + 1.0 / (RRF_K + rank + 1)
+
+        ranked = sorted(scores, key=scores.get, reverse=True)
+        self.last_fanout_stats = {
+            'queries_planned': planned,
+            'queries_run': len(queries),
+            'max_quota_units': len(queries) * cost_per_query,
+            'hits': hits,
+            'unique_ids': len(ranked),
+        }
+        self._log(f"✅ 扇出搜索 {len(queries)} 个子查询，命中 {hits} 次，去重后 {len(ranked)} 个视频")
+        return ranked
     
+    @traced()
     def get_channel_videos(self, channel_url: str, max_results: int = 50) -> List[str]:
         """
         获取频道的视频列表
@@ -103,51 +648,114 @@ class YouTubeAnalyzer:
         Returns:
             视频ID列表
         """
+        video_ids = [vid for page in self._iter_channel_pages(channel_url, max_results) for vid in page]
+        self._log(f"✅ 从频道获取 {len(video_ids)} 个视频")
+        return video_ids
+
+    @traced()
+    def get_channels_videos(self, channel_urls: List[str], max_results: int = 50) -> Dict[str, List[str]]:
+        """
+        多个频道一起获取视频列表（参数同 get_channel_videos）
+
+        @handle 解析、uploads 播放列表查询（channels.list 一次最多50个ID）和各频道同一页的
+        playlistItems.list 各自合并执行，批量模式下每一步只需一次往返
+
+        Returns:
+            频道URL → 视频ID列表（无效/失败的频道为空列表或已翻到的部分）
+        """
+        channel_ids = {url: None for url in channel_urls}
+        handles = {url: url.split('@')[-1].split('/')[0] for url in channel_ids if '@' in url}
+        lookups = self._execute_many([
+            (lambda yt, handle=handle: yt.channels().list(part="id", forHandle=handle), 'channels.list')
+            for handle in handles.values()])
+        for (url, handle), response in zip(handles.items(), lookups):
+            if isinstance(response, ApiCallError):
+                self._record_error(response, '_extract_channel_id', handle=handle)
+            elif response.get('items'):
+                channel_ids[url] = response['items'][0]['id']
+        for url in channel_ids:
+            channel_ids[url] = channel_ids[url] or self._parse_channel_id(url)
+
+        unique_ids = list(dict.fromkeys(cid for cid in channel_ids.values() if cid))
+        chunks = [unique_ids[i:i + 50] for i in range(0, len(unique_ids), 50)]
+        uploads = {}
+        responses = self._execute_many([
+            (lambda yt, ids=ids: yt.channels().list(part="contentDetails", id=','.join(ids), maxResults=50),
+             'channels.list') for ids in chunks])
+        for ids, response in zip(chunks, responses):
+            if isinstance(response, ApiCallError):
+                self._log(f"❌ 获取频道视频失败: {response}")
+                self._record_error(response, 'get_channel_videos', channel_ids=ids)
+                continue
+            for item in response.get('items', []):
+                uploads[item['id']] = item['contentDetails']['relatedPlaylists']['uploads']
+
+        urls = [url for url, cid in channel_ids.items() if cid in uploads]
+        pages = self._list_pages_many('playlistItems',
+                                      [{'part': 'contentDetails', 'playlistId': uploads[channel_ids[url]]}
+                                       for url in urls],
+                                      max_results, lambda item: item['contentDetails']['videoId'])
+        results = {url: [] for url in channel_urls}
+        for url, (ids, error) in zip(urls, pages):
+            if error is not None:
+                self._log(f"❌ 获取频道视频分页失败: {error}")
+                self._record_error(error, 'get_channel_videos', channel=url, collected=len(ids))
+            results[url] = ids
+        self._log(f"✅ 从 {len(channel_urls)} 个频道获取 {sum(len(ids) for ids in results.values())} 个视频")
+        return results
+
+    def _iter_channel_pages(self, channel_url: str, max_results: int = 50) -> Iterator[List[str]]:
+        """翻页读取频道 uploads 播放列表，每页产出一批视频ID；失败记录错误标记后停止（已产出的页保留）"""
         try:
             # 提取频道ID
             channel_id = self._extract_channel_id(channel_url)
             if not channel_id:
-                print("❌ 无效的频道URL")
-                return []
+                self._log("❌ 无效的频道URL")
+                return
             
             # 获取频道的uploads播放列表
-            request = self.youtube.channels().list(
+            response = self._execute(lambda yt: yt.channels().list(
                 part="contentDetails",
                 id=channel_id
-            )
-            response = request.execute()
+            ), 'channels.list')
             
             if not response.get('items'):
-                print("❌ 找不到该频道")
-                return []
+                self._log("❌ 找不到该频道")
+                return
             
             uploads_playlist_id = response['items'][0]['contentDetails']['relatedPlaylists']['uploads']
+        except ApiCallError as e:
+            self._log(f"❌ 获取频道视频失败: {e}")
+            self._record_error(e, 'get_channel_videos', channel=channel_url)
+            return
             
-            # 获取播放列表中的视频
-            video_ids = []
-            next_page_token = None
-            
-            while len(video_ids) < max_results:
-                request = self.youtube.playlistItems().list(
+        # 获取播放列表中的视频
+        collected = 0
+        next_page_token = None
+        
+        while collected < max_results:
+            page_size = min(50, max_results - collected)
+            try:
+                response = self._execute(lambda yt: yt.playlistItems().list(
                     part="contentDetails",
                     playlistId=uploads_playlist_id,
-                    maxResults=min(50, max_results - len(video_ids)),
+                    maxResults=page_size,
                     pageToken=next_page_token
-                )
-                response = request.execute()
-                
-                video_ids.extend([item['contentDetails']['videoId'] for item in response.get('items', [])])
-                
-                next_page_token = response.get('nextPageToken')
-                if not next_page_token:
-                    break
+                ), 'playlistItems.list')
+            except ApiCallError as e:
+                # 已翻到的页保留，作为部分结果返回
+                self._log(f"❌ 获取频道视频分页失败: {e}")
+                self._record_error(e, 'get_channel_videos', channel=channel_url,
+                                   page_token=next_page_token, collected=collected)
+                return
             
-            print(f"✅ 从频道获取 {len(video_ids)} 个视频")
-            return video_ids
+            ids = [item['contentDetails']['videoId'] for item in response.get('items', [])]
+            collected += len(ids)
+            yield ids
             
-        except HttpError as e:
-            print(f"❌ 获取频道视频失败: {e}")
-            return []
+            next_page_token = response.get('nextPageToken')
+            if not next_page_token:
+                break
     
     def _extract_channel_id(self, channel_url: str) -> Optional[str]:
         """提取频道ID"""
@@ -155,16 +763,20 @@ class YouTubeAnalyzer:
         if '@' in channel_url:
             username = channel_url.split('@')[-1].split('/')[0]
             try:
-                request = self.youtube.channels().list(
+                response = self._execute(lambda yt: yt.channels().list(
                     part="id",
                     forHandle=username
-                )
-                response = request.execute()
+                ), 'channels.list')
                 if response.get('items'):
                     return response['items'][0]['id']
-            except:
-                pass
+            except ApiCallError as e:
+                self._record_error(e, '_extract_channel_id', handle=username)
         
+        return self._parse_channel_id(channel_url)
+
+    @staticmethod
+    def _parse_channel_id(channel_url: str) -> Optional[str]:
+        """不调用API，直接从 channel/ID 格式的URL或裸ID中取出频道ID"""
         # 匹配 channel/ID 格式
         match = re.search(r'channel/([a-zA-Z0-9_-]+)', channel_url)
         if match:
@@ -176,6 +788,7 @@ class YouTubeAnalyzer:
         
         return None
     
+    @traced()
     def get_video_details(self, video_ids: List[str]) -> List[Dict]:
         """
         获取视频详细信息
@@ -189,27 +802,53 @@ class YouTubeAnalyzer:
         videos_details = []
         
         # YouTube API限制每次最多50个视频
-        for i in range(0, len(video_ids), 50):
-            batch_ids = video_ids[i:i+50]
-            
-            try:
-                request = self.youtube.videos().list(
-                    part="snippet,statistics,contentDetails",
-                    id=','.join(batch_ids)
-                )
-                response = request.execute()
-                
-                for item in response.get('items', []):
-                    video_info = self._parse_video_data(item)
-                    videos_details.append(video_info)
-                    
-            except HttpError as e:
-                print(f"❌ 获取视频详情失败: {e}")
-                continue
+        chunks = [video_ids[i:i+50] for i in range(0, len(video_ids), 50)]
+        if self.batch_requests and len(chunks) > 1:
+            # 批量模式：所有批次打包成尽量少的往返
+            responses = self._execute_many([self._details_call(ids) for ids in chunks])
+            for ids, response in zip(chunks, responses):
+                videos_details.extend(self._handle_details(ids, response))
+        else:
+            for ids in chunks:
+                videos_details.extend(self._fetch_details_batch(ids))
         
-        print(f"✅ 成功获取 {len(videos_details)} 个视频的详细信息")
+        self._log(f"✅ 成功获取 {len(videos_details)} 个视频的详细信息")
         return videos_details
     
+    def _fetch_details_batch(self, batch_ids: List[str]) -> List[Dict]:
+        """抓取并解析一批（最多50个）视频详情，写入本地索引；失败时记录错误标记并返回空列表"""
+        try:
+            response = self._execute(*self._details_call(batch_ids))
+        except ApiCallError as e:
+            response = e
+        return self._handle_details(batch_ids, response)
+
+    def _details_call(self, batch_ids: List[str]) -> Tuple[Callable, str]:
+        return (lambda yt: yt.videos().list(
+            part="snippet,statistics,contentDetails",
+            id=','.join(batch_ids)
+        ), 'videos.list')
+
+    def _handle_details(self, batch_ids: List[str], response: Union[Dict, ApiCallError]) -> List[Dict]:
+        """解析一批视频详情响应（或记录它的错误）"""
+        if isinstance(response, ApiCallError):
+            # 该批次标记失败，其余批次继续（熔断后会快速失败，不再发请求）
+            self._log(f"❌ 获取视频详情失败: {response}")
+            self._record_error(response, 'get_video_details', video_ids=batch_ids)
+            return []
+        items = response.get('items', [])
+        
+        with self.tracer.span('_parse_video_data', count=len(items)):
+            batch_videos = [self._parse_video_data(item) for item in items]
+        if self.rule_engine is not None:
+            with self.tracer.span('rule_engine', count=len(batch_videos)):
+                self.rule_engine.apply(batch_videos)
+        
+        if self.local_index is not None:
+            with self.tracer.span('local_index.add', count=len(batch_videos)):
+                self.local_index.add(batch_videos)
+        return batch_videos
+    
     def _parse_video_data(self, item: Dict) -> Dict:
         """解析视频数据"""
         snippet = item['snippet']
@@ -261,6 +900,7 @@ class YouTubeAnalyzer:
             'video_id': item['id'],
             'title': snippet['title'],
             'channel_title': snippet['channelTitle'],
+            'channel_id': snippet.get('channelId', ''),
             'published_at': published_at.strftime('%Y-%m-%d'),
             'days_since_published': days_since_published,
             'duration': duration,
@@ -434,6 +1074,7 @@ class YouTubeAnalyzer:
 
         return reasons
     
+    @traced()
     def filter_videos(self, 
                      videos: List[Dict],
                      min_views: int = 50000,
@@ -466,10 +1107,149 @@ class YouTubeAnalyzer:
         # 按热度排序
         filtered.sort(key=lambda x: x['heat_score'], reverse=True)
         
-        print(f"✅ 筛选出 {len(filtered)} 个适合搬运的视频")
-        print(f"   (时长: {min_duration//60}-{max_duration//60}分钟, 播放量≥{min_views:,}, 互动率≥{min_engagement}%)")
+        self._log(f"✅ 筛选出 {len(filtered)} 个适合搬运的视频")
+        self._log(f"   (时长: {min_duration//60}-{max_duration//60}分钟, 播放量≥{min_views:,}, 互动率≥{min_engagement}%)")
         return filtered
     
+    @traced()
+    def enrich_thumbnails(self, videos: List[Dict]) -> List[Dict]:
+        """
+        并发下载缩略图，计算感知哈希并标记视觉重复（换标题的同一视频）
+        
+        Args:
+            videos: 视频列表（原地补充 thumbnail_hash / visual_group）
+            
+        Returns:
+            同一个视频列表
+        """
+        if self.thumbnail_fetcher is None:
+            self.thumbnail_fetcher = ThumbnailFetcher()
+        groups = enrich_thumbnails(videos, self.thumbnail_fetcher)
+        self._log(f"🖼️ 缩略图: {len(videos)} 张，发现 {groups} 组视觉重复")
+        return videos
+    
+    @traced()
+    def dedup_videos(self, videos: List[Dict]) -> List[Dict]:
+        """
+        合并近重复/重传视频（MinHash + LSH，近似线性时间）
+        
+        Args:
+            videos: 视频列表
+            
+        Returns:
+            每簇保留热度最高的一条，附 duplicate_count / duplicate_ids
+        """
+        unique = collapse_duplicates(videos)
+        self._log(f"🧬 合并近重复视频: {len(videos)} → {len(unique)}")
+        return unique
+    
+    @traced()
+    def sample_comments(self, videos: List[Dict], top_k: int = 10, per_video: int = 100,
+                        max_workers: int = 4, quota_budget: int = 50) -> List[Dict]:
+        """
+        并发抽样排名靠前视频的评论串，流式统计词法指标（不保存评论原文）
+        
+        Args:
+            videos: 已排序的视频列表（前 top_k 条原地补充 comment_stats 及 comment_* 导出字段）
+            top_k: 抽样的视频数
+            per_video: 每个视频最多抽样的评论串数（每页最多100条，每页1配额）
+            max_workers: 并发视频数
+            quota_budget: 本阶段最多消耗的配额单位，用完后不再翻页
+            
+        Returns:
+            被抽样的视频
+        """
+        targets = videos[:top_k]
+        spent = {'units': 0}
+        lock = threading.Lock()
+        
+        def reserve() -> bool:
+            with lock:
+                if spent['units'] + quota_cost('commentThreads.list') > quota_budget:
+                    return False
+                spent['units'] += quota_cost('commentThreads.list')
+                return True
+        
+        def sample(video: Dict) -> CommentStats:
+            stats = CommentStats()
+            token = None
+            while stats.total < per_video and reserve():
+                try:
+                    response = self._execute(lambda yt: yt.commentThreads().list(
+                        part="snippet",
+                        videoId=video['video_id'],
+                        maxResults=min(100, per_video - stats.total),
+                        order="relevance",
+                        textFormat="plainText",
+                        pageToken=token
+                    ), 'commentThreads.list')
+                except ApiCallError as e:
+                    # 评论关闭（403 commentsDisabled）等情况只影响这个视频
+                    self._record_error(e, 'sample_comments', video_id=video['video_id'])
+                    break
+                for item in response.get('items', []):
+                    comment = item['snippet']['topLevelComment']['snippet']
+                    stats.add(comment.get('textOriginal') or comment.get('textDisplay', ''),
+                              int(comment.get('likeCount', 0)))
+                token = response.get('nextPageToken')
+                if not token:
+                    break
+            return stats
+        
+        if targets:
+            with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(targets)))) as pool:
+                all_stats = list(pool.map(sample, targets))
+        else:
+            all_stats = []
+        
+        for video, stats in zip(targets, all_stats):
+            summary = stats.to_dict()
+            video['comment_stats'] = summary
+            video['comment_sample_size'] = summary['sample_size']
+            video['comment_question_ratio'] = summary['question_ratio']
+            video['comment_languages'] = ', '.join(f"{lang} {share:.0%}" for lang, share in summary['languages'].items())
+            video['comment_top_terms'] = ', '.join(summary['top_terms'])
+        
+        self.last_comment_stats = {
+            'videos': len(targets),
+            'comments': sum(s.total for s in all_stats),
+            'quota_units': spent['units'],
+            'quota_budget': quota_budget,
+        }
+        self._log(f"💬 抽样 {len(targets)} 个视频的 {self.last_comment_stats['comments']} 条评论，"
+                  f"消耗配额 {spent['units']}")
+        return targets
+    
+    @traced()
+    def compare_with_history(self, videos: List[Dict], params: Dict, only_new: bool = False,
+                             record: bool = True) -> List[Dict]:
+        """
+        与同一查询（params 见 run_history.query_params）的上一次运行对比，结果写入 self.last_diff
+
+        Args:
+            videos: 本次结果（按排名顺序），原地补充 is_new / previous_rank / rank_change
+            only_new: 只保留新上榜的视频
+            record: 是否把本次结果存为新的一次运行（不完整的结果不应记录）
+        """
+        key = query_key(params)
+        diff = self.run_history.diff(key, videos)
+        if record:
+            self.run_history.record(key, params, videos)
+        self.last_diff = {
+            'previous_run': diff['previous_run'],
+            'new': len(diff['new_ids']),
+            'dropped': len(diff['dropped_ids']),
+            'dropped_ids': diff['dropped_ids'],
+            'movers': diff['movers'],
+        }
+        if diff['previous_run']:
+            self._log(f"🆕 与上次运行（{diff['previous_run']['created_at']}）相比: 新增 {len(diff['new_ids'])}，"
+                      f"下榜 {len(diff['dropped_ids'])}，大幅变动 {len(diff['movers'])}")
+        if only_new:
+            videos = [v for v in videos if v['is_new']]
+        return videos
+
+    @traced()
     def export_to_excel(self, videos: List[Dict], filename: str = None):
         """
         导出到Excel
@@ -479,7 +1259,7 @@ class YouTubeAnalyzer:
             filename: 输出文件名
         """
         if not videos:
-            print("⚠️ 没有数据可导出")
+            self._log("⚠️ 没有数据可导出")
             return
         
         if filename is None:
@@ -492,25 +1272,10 @@ class YouTubeAnalyzer:
         # 创建DataFrame
         df = pd.DataFrame(videos)
         
-        # 重新排列列顺序
-        column_order = [
-            'heat_score', 'title', 'view_count', 'like_count', 'comment_count',
-            'engagement_rate', 'revenue_mid', 'revenue_low', 'revenue_high',
-            'hot_reasons_text',
-            'avg_daily_views', 'trend_label',
-            'channel_title', 'published_at', 'days_since_published',
-            'duration', 'url', 'video_id'
-        ]
-        df = df[column_order]
-        
-        # 重命名列为中文
-        df.columns = [
-            '热度指数', '视频标题', '播放量', '点赞数', '评论数',
-            '互动率(%)', '预估收益(中值$)', '预估收益(低$)', '预估收益(高$)',
-            '爆红原因', '日均播放', '趋势标签',
-            '频道名称', '发布日期', '发布天数',
-            '时长', '视频链接', '视频ID'
-        ]
+        # 重新排列列顺序，重命名列为中文
+        columns = export_columns(df.columns)
+        df = df[[col for col, _ in columns]]
+        df.columns = [name for _, name in columns]
         
         # 导出Excel
         with pd.ExcelWriter(filename, engine='openpyxl') as writer:
@@ -520,29 +1285,123 @@ class YouTubeAnalyzer:
             worksheet = writer.sheets['视频分析']
             
             # 设置列宽
-            column_widths = {
-                'A': 12,  # 热度指数
-                'B': 50,  # 视频标题
-                'C': 12,  # 播放量
-                'D': 10,  # 点赞数
-                'E': 10,  # 评论数
-                'F': 12,  # 互动率
-                'G': 20,  # 频道名称
-                'H': 12,  # 发布日期
-                'I': 10,  # 发布天数
-                'J': 10,  # 时长
-                'K': 40,  # 视频链接
-                'L': 15,  # 视频ID
-            }
-            
-            for col, width in column_widths.items():
+            for col, width in EXPORT_COLUMN_WIDTHS.items():
                 worksheet.column_dimensions[col].width = width
         
         abs_path = os.path.abspath(filename)
-        print(f"✅ 数据已导出到: {abs_path}")
+        self._log(f"✅ 数据已导出到: {abs_path}")
         return abs_path
     
-    def analyze(self, 
+    def analyze_iter(self,
+                     input_type: str,
+                     input_value: str,
+                     max_results: int = 50,
+                     min_views: int = 50000,
+                     min_engagement: float = 2.0,
+                     language: Optional[str] = None,
+                     region: Optional[str] = None,
+                     max_days: int = 14,
+                     min_duration: int = 60,
+                     max_duration: int = 900,
+                     queue_pages: int = ITER_QUEUE_PAGES) -> Iterator[Dict]:
+        """
+        流式分析：后台线程翻页发现视频ID（搜索 / 频道 uploads），每拿到一页就交给详情抓取，
+        解析、评分、筛选后逐条产出
+
+        ID页放在有界队列里，详情处理跟不上时翻页线程会等待，内存只与 queue_pages 有关，
+        不随频道视频总数增长。产出顺序为发现顺序（不做全局热度排序），
+        去重/缩略图/评论等需要完整结果的步骤请用 analyze()。
+        统计（首条结果耗时、页数、抓取/产出数）见 self.last_iter_stats。
+
+        Args:
+            input_type: 'keyword' 或 'channel'（'fanout' / 'local' 退回 analyze 后逐条产出）
+            其余参数同 analyze()
+            queue_pages: 待处理ID页队列长度
+        """
+        filters = dict(min_views=min_views, min_engagement=min_engagement, max_days=max_days,
+                       min_duration=min_duration, max_duration=max_duration)
+        if input_type in ('fanout', 'local'):
+            yield from self.analyze(input_type, input_value, max_results=max_results, export=False,
+                                    language=language, region=region, **filters)
+            return
+        if input_type == 'keyword':
+            params = self._search_params(input_value, language, region)
+            pages, stage = self._iter_search_pages(params, max_results), 'search_videos'
+        elif input_type == 'channel':
+            pages, stage = self._iter_channel_pages(input_value, max_results), None
+        else:
+            self._log("❌ 无效的输入类型")
+            return
+
+        self.errors = []
+        started = time.perf_counter()
+        stats = {'pages': 0, 'ids': 0, 'fetched': 0, 'yielded': 0, 'first_result_s': None}
+        self.last_iter_stats = stats
+        pending: queue.Queue = queue.Queue(maxsize=max(1, queue_pages))
+        stop = threading.Event()
+        failure: List[BaseException] = []
+
+        def put(item) -> bool:
+            while not stop.is_set():
+                try:
+                    pending.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def produce():
+            try:
+                for page in pages:
+                    if not put(page):
+                        return
+            except ApiCallError as e:
+                # 频道翻页自己记录错误；搜索翻页失败在这里记录（消费端已经结束时不再记）
+                if not stop.is_set():
+                    self._log(f"❌ 搜索失败: {e}")
+                    self._record_error(e, stage, keyword=input_value)
+            except BaseException as e:  # 交给消费端重新抛出
+                failure.append(e)
+            finally:
+                put(_PAGES_DONE)
+
+        producer = threading.Thread(target=produce, name='analyze_iter-pages', daemon=True)
+        producer.start()
+        seen = set()
+        # span 包住整个消费过程（装饰器只能计到生成器对象的创建）
+        with self.tracer.span('analyze_iter') as record:
+            try:
+                while True:
+                    page = pending.get()
+                    if page is _PAGES_DONE:
+                        break
+                    stats['pages'] += 1
+                    ids = [vid for vid in page if vid not in seen]
+                    seen.update(ids)
+                    stats['ids'] += len(ids)
+                    if not ids:
+                        continue
+                    videos = self._fetch_details_batch(ids)
+                    stats['fetched'] += len(videos)
+                    for video in videos:
+                        if (video['view_count'] >= min_views
+                                and video['engagement_rate'] >= min_engagement
+                                and video['days_since_published'] <= max_days
+                                and min_duration <= video['duration_seconds'] <= max_duration):
+                            if stats['first_result_s'] is None:
+                                stats['first_result_s'] = round(time.perf_counter() - started, 4)
+                            stats['yielded'] += 1
+                            yield video
+                if failure:
+                    raise failure[0]
+            finally:
+                stop.set()
+                producer.join(timeout=ITER_STOP_WAIT)
+                stats['elapsed_s'] = round(time.perf_counter() - started, 4)
+                record['attrs']['count'] = stats['yielded']
+
+    @traced()
+    def analyze(self,
                 input_type: str,
                 input_value: str,
                 max_results: int = 50,
@@ -550,78 +1409,155 @@ class YouTubeAnalyzer:
                 min_engagement: float = 2.0,
                 export: bool = True,
                 language: Optional[str] = None,
-                region: Optional[str] = None) -> List[Dict]:
+                region: Optional[str] = None,
+                max_days: int = 14,
+                min_duration: int = 60,
+                max_duration: int = 900,
+                fanout: Optional[Dict] = None,
+                dedup: bool = False,
+                thumbnails: bool = False,
+                comments_top_k: int = 0,
+                only_new: bool = False) -> List[Dict]:
         """
         完整分析流程
         
         Args:
-            input_type: 输入类型 ('keyword' 或 'channel')
-            input_value: 搜索关键词或频道URL
-            max_results: 最多分析视频数
+            input_type: 输入类型 ('keyword'、'channel'、'fanout' 或 'local')
+            input_value: 搜索关键词或频道URL（local 模式为本地全文检索词）
+            max_results: 最多分析视频数（fanout 模式下为每个子查询的结果数）
             min_views: 最低播放量筛选
             min_engagement: 最低互动率筛选
             export: 是否导出Excel
+            max_days: 最多发布天数
+            min_duration: 最短时长（秒）
+            max_duration: 最长时长（秒）
+            fanout: fanout 模式的网格参数，即 fanout_search 的关键字参数
+                    （regions / languages / durations / window_days / slice_days / max_workers / quota_budget）
+            dedup: 是否合并近重复/重传视频（每簇保留热度最高的一条）
+            thumbnails: 是否下载缩略图计算感知哈希，标记视觉重复（与 dedup 同用时一并合并）
+            comments_top_k: 对排名前K的结果抽样评论并统计（0 表示不抽样）
+            only_new: 只返回（并导出）上一次同样查询之后新上榜的视频（需要 run_history）
             
         Returns:
             分析结果列表
         """
-        print(f"\n{'='*60}")
-        print(f"🎬 YouTube视频热度分析工具")
-        print(f"{'='*60}\n")
+        self.errors = []
+        self.last_videos = []
+        self._log(f"\n{'='*60}")
+        self._log(f"🎬 YouTube视频热度分析工具")
+        self._log(f"{'='*60}\n")
+        
+        # 本地索引查询：条件下推到 SQLite，不调用API、不消耗配额
+        if input_type == 'local':
+            if self.local_index is None:
+                self._log("❌ 未配置本地索引")
+                return []
+            self._log(f"🗂️ 正在查询本地索引...")
+            with self.tracer.span('local_index.search'):
+                videos = self.local_index.search(input_value, min_views=min_views,
+                                                 min_engagement=min_engagement, max_days=max_days,
+                                                 min_duration=min_duration, max_duration=max_duration,
+                                                 limit=max_results)
+            filtered_videos = self.filter_videos(videos, min_views, min_engagement, max_days,
+                                                 min_duration, max_duration)
+            if thumbnails:
+                self.enrich_thumbnails(filtered_videos)
+            if dedup:
+                filtered_videos = self.dedup_videos(filtered_videos)
+            if comments_top_k:
+                self.sample_comments(filtered_videos, top_k=comments_top_k)
+            if export and filtered_videos:
+                self.export_to_excel(filtered_videos)
+            self._log(f"✅ 本地索引命中 {len(filtered_videos)} 个视频（未消耗配额）")
+            return filtered_videos
         
         # 1. 获取视频ID
-        print(f"📺 正在获取视频列表...")
+        self._log(f"📺 正在获取视频列表...")
         if input_type == 'keyword':
             video_ids = self.search_videos(input_value, max_results, language=language, region=region)
         elif input_type == 'channel':
             video_ids = self.get_channel_videos(input_value, max_results)
+        elif input_type == 'fanout':
+            options = dict(fanout or {})
+            options.setdefault('max_results_per_query', max_results)
+            video_ids = self.fanout_search(input_value, **options)
         else:
-            print("❌ 无效的输入类型")
+            self._log("❌ 无效的输入类型")
             return []
         
         if not video_ids:
-            print("❌ 未找到视频")
+            self._log("❌ 未找到视频")
             return []
         
         # 2. 获取视频详情
-        print(f"\n📊 正在获取视频详细数据...")
+        self._log(f"\n📊 正在获取视频详细数据...")
         videos = self.get_video_details(video_ids)
         
         if not videos:
-            print("❌ 获取视频详情失败")
+            self._log("❌ 获取视频详情失败")
             return []
+        # 存副本：后面的去重、缩略图、评论抽样与历史对比会原地给视频补字段，缓存里只留抓取+评分的结果
+        self.last_videos = [dict(v) for v in videos]
         
         # 3. 筛选适合搬运的视频
-        print(f"\n🔍 正在筛选适合搬运的视频...")
-        print(f"   筛选条件: 播放量≥{min_views:,}, 互动率≥{min_engagement}%, 14天内发布, 时长1-15分钟")
-        filtered_videos = self.filter_videos(videos, min_views, min_engagement)
+        self._log(f"\n🔍 正在筛选适合搬运的视频...")
+        self._log(f"   筛选条件: 播放量≥{min_views:,}, 互动率≥{min_engagement}%, {max_days}天内发布, "
+                  f"时长{min_duration}-{max_duration}秒")
+        filtered_videos = self.filter_videos(videos, min_views, min_engagement, max_days,
+                                             min_duration, max_duration)
+        if thumbnails:
+            self.enrich_thumbnails(filtered_videos)
+        if dedup:
+            filtered_videos = self.dedup_videos(filtered_videos)
+        if comments_top_k:
+            self.sample_comments(filtered_videos, top_k=comments_top_k)
+        if self.run_history is not None:
+            params = query_params(input_type, input_value, max_results=max_results, min_views=min_views,
+                                  min_engagement=min_engagement, max_days=max_days, min_duration=min_duration,
+                                  max_duration=max_duration, language=language, region=region,
+                                  fanout=fanout, dedup=dedup)
+            filtered_videos = self.compare_with_history(filtered_videos, params, only_new=only_new,
+                                                        record=not self.errors)
         
         # 4. 显示Top 10
-        print(f"\n🏆 Top 10 热门视频:")
-        print(f"{'-'*60}")
+        self._log(f"\n🏆 Top 10 热门视频:")
+        self._log(f"{'-'*60}")
         for i, video in enumerate(filtered_videos[:10], 1):
-            print(f"{i}. [{video['heat_score']:.0f}分] {video['title'][:40]}...")
-            print(f"   📈 {video['view_count']:,}播放 | 👍 {video['like_count']:,} | 💬 {video['comment_count']:,}")
-            print(f"   💰 预估收益: ${video['revenue_mid']:,} (低:${video['revenue_low']:,} - 高:${video['revenue_high']:,})")
-            print(f"   ⭐ 爆红原因: {', '.join(video.get('hot_reasons', [])[:3])}")
-            print(f"   📊 趋势: {video.get('trend_label')} | 日均 {video.get('avg_daily_views'):,} 播放")
-            print(f"   🔗 {video['url']}\n")
+            self._log(f"{i}. [{video['heat_score']:.0f}分] {video['title'][:40]}...")
+            self._log(f"   📈 {video['view_count']:,}播放 | 👍 {video['like_count']:,} | 💬 {video['comment_count']:,}")
+            self._log(f"   💰 预估收益: ${video['revenue_mid']:,} (低:${video['revenue_low']:,} - 高:${video['revenue_high']:,})")
+            self._log(f"   ⭐ 爆红原因: {', '.join(video.get('hot_reasons', [])[:3])}")
+            self._log(f"   📊 趋势: {video.get('trend_label')} | 日均 {video.get('avg_daily_views'):,} 播放")
+            self._log(f"   🔗 {video['url']}\n")
         
         # 5. 导出Excel
         if export and filtered_videos:
-            print(f"\n💾 正在导出数据...")
+            self._log(f"\n💾 正在导出数据...")
             self.export_to_excel(filtered_videos)
         
-        print(f"\n{'='*60}")
-        print(f"✅ 分析完成! 共找到 {len(filtered_videos)} 个适合搬运的欧美热门视频")
-        print(f"💡 提示: 这些视频在欧美地区受欢迎，时长适中，适合本地化后搬运到小红书/抖音")
-        print(f"{'='*60}\n")
+        self._log(f"\n{'='*60}")
+        self._log(f"✅ 分析完成! 共找到 {len(filtered_videos)} 个适合搬运的欧美热门视频")
+        if self.errors:
+            self._log(f"⚠️ 有 {len(self.errors)} 次API调用失败，结果可能不完整")
+        self._log(f"💡 提示: 这些视频在欧美地区受欢迎，时长适中，适合本地化后搬运到小红书/抖音")
+        self._log(f"{'='*60}\n")
         
         return filtered_videos
 
 
 def main():
-    """主程序"""
+    """主程序（带子命令时转交非交互命令行 cli.py）"""
+    if len(sys.argv) > 1 and sys.argv[1] in ('keyword', 'channel', 'local', 'batch'):
+        from cli import main as cli_main
+        sys.exit(cli_main(sys.argv[1:]))
+
+    parser = argparse.ArgumentParser(description="YouTube欧美热门视频分析工具")
+    parser.add_argument("--quiet", action="store_true", help="静默模式，不输出分析过程")
+    parser.add_argument("--profile", choices=PROFILE_MODES, help="抓取本次分析的剖析文件")
+    parser.add_argument("--profile-dir", default="profiles", help="剖析文件输出目录")
+    parser.add_argument("--index", default=None, help="本地视频索引路径（默认 video_index.db，设为空字符串则不建索引）")
+    args = parser.parse_args()
+
     print("""
     ╔══════════════════════════════════════════════════════════╗
     ║       YouTube欧美热门视频分析工具 v2.0                    ║
@@ -651,25 +1587,42 @@ def main():
         if not api_key:
             return
     
-    analyzer = YouTubeAnalyzer(api_key)
+    index_path = DEFAULT_INDEX_PATH if args.index is None else args.index
+    analyzer = YouTubeAnalyzer(api_key, quiet=args.quiet,
+                               local_index=LocalIndex(index_path) if index_path else None)
     
     # 交互式选择
     print("\n请选择分析模式:")
     print("1. 按关键词搜索")
     print("2. 分析指定频道")
+    print("3. 查询本地索引（不消耗配额）")
     
-    choice = input("\n请输入选项 (1/2): ").strip()
+    choice = input("\n请输入选项 (1/2/3): ").strip()
     
     if choice == '1':
-        keyword = input("请输入搜索关键词 (英文): ").strip()
-        if keyword:
-            analyzer.analyze('keyword', keyword, max_results=50)
+        input_type = 'keyword'
+        input_value = input("请输入搜索关键词 (英文): ").strip()
     elif choice == '2':
-        channel_url = input("请输入频道URL或ID: ").strip()
-        if channel_url:
-            analyzer.analyze('channel', channel_url, max_results=50)
+        input_type = 'channel'
+        input_value = input("请输入频道URL或ID: ").strip()
+    elif choice == '3' and analyzer.local_index is not None:
+        input_type = 'local'
+        input_value = input("请输入检索词: ").strip()
     else:
         print("❌ 无效的选项")
+        return
+
+    if not input_value:
+        return
+
+    with profile_capture(args.profile, output_dir=args.profile_dir, label=input_value) as prof:
+        analyzer.analyze(input_type, input_value, max_results=50)
+
+    print("⏱️ 阶段耗时:")
+    for name, stat in analyzer.tracer.summary().items():
+        print(f"   {name}: {stat['total_ms']:.1f}ms ({stat['count']}次)")
+    if prof['path']:
+        print(f"🔬 剖析文件已保存: {prof['path']}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,314 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+YouTube Data API 离线桩
+功能：不联网、不需要API密钥，回放录制的响应或按需生成合成数据，
+      可直接注入 YouTubeAnalyzer(api_key, youtube=stub)，用于测试与基准
+"""
+
+import io
+import json
+import random
+import threading
+import zlib
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+TITLE_WORDS = [
+    'easy', 'life', 'hacks', 'cooking', 'tips', 'diy', 'challenge', 'quick',
+    'recipe', 'home', 'workout', 'review', 'tutorial', 'asmr', 'crafts', 'pet'
+]
+CHANNEL_COUNT = 500
+# 合成评论模板（混合多种语言和提问）
+COMMENT_TEMPLATES = [
+    "This {w} trick is amazing", "Does this {w} really work?", "Me encanta este {w}, muy bueno",
+    "Que legal esse {w}, muito bom", "这个{w}太实用了", "I tried the {w} and it worked for me",
+    "Where can I buy the {w}?", "The {w} {w2} part is the best", "lol the {w} at the end",
+    "Can you make a {w2} video next?",
+]
+# 每个视频最多生成的评论串数
+MAX_STUB_COMMENTS = 300
+# 相邻这么多个视频共用同一张缩略图（只是编码质量不同），模拟换标题重传
+THUMBNAIL_GROUP = 2
+
+
+def video_id_for(index: int) -> str:
+    """合成视频ID（11位，与真实ID同长）"""
+    return f"v{index:010d}"
+
+
+def index_for(video_id: str) -> Optional[int]:
+    """合成视频ID还原为序号，非合成ID返回None"""
+    if len(video_id) == 11 and video_id[0] == 'v' and video_id[1:].isdigit():
+        return int(video_id[1:])
+    return None
+
+
+def _mix(index: int, seed: int) -> int:
+    """廉价确定性哈希（同一序号每次生成相同数据）"""
+    h = (index * 2654435761 + seed * 40503) & 0xFFFFFFFF
+    h ^= h >> 15
+    h = (h * 2246822519) & 0xFFFFFFFF
+    h ^= h >> 13
+    return h
+
+
+def synthetic_video_item(index: int, seed: int = 0, now: Optional[datetime] = None) -> Dict:
+    """
+    生成一条与 videos.list 返回结构一致的合成视频数据
+
+    Args:
+        index: 视频序号
+        seed: 随机种子
+        now: 参考时间（发布时间相对它往前推）
+    """
+    h = _mix(index, seed)
+    now = now or datetime.now()
+    days = 1 + h % 30
+    views = 1000 + (h % 2000) * (h % 997)
+    likes = views * (1 + h % 60) // 1000
+    comments = views * (1 + (h >> 7) % 20) // 10000
+    seconds = 30 + (h >> 3) % 1500
+    words = [TITLE_WORDS[(h >> s) % len(TITLE_WORDS)] for s in (2, 6, 10, 14)]
+    channel = (h >> 5) % CHANNEL_COUNT
+    vid = video_id_for(index)
+    return {
+        'kind': 'youtube#video',
+        'id': vid,
+        'snippet': {
+            'publishedAt': (now - timedelta(days=days, hours=1)).strftime('%Y-%m-%dT%H:%M:%SZ'),
+            'channelId': f"UC{channel:022d}",
+            'title': f"{' '.join(words).title()} #{index}",
+            'description': f"Synthetic video {index} about {' '.join(words)}",
+            'channelTitle': f"Channel {channel}",
+            'thumbnails': {'high': {'url': f"https://i.ytimg.com/vi/{vid}/hqdefault.jpg"}},
+        },
+        'statistics': {
+            'viewCount': str(views),
+            'likeCount': str(likes),
+            'commentCount': str(comments),
+        },
+        'contentDetails': {
+            'duration': f"PT{seconds // 3600}H{(seconds % 3600) // 60}M{seconds % 60}S"
+            if seconds >= 3600 else f"PT{seconds // 60}M{seconds % 60}S",
+        },
+    }
+
+
+def synthetic_comment_thread(video_id: str, position: int, seed: int = 0) -> Dict:
+    """生成一条与 commentThreads.list 返回结构一致的合成评论串"""
+    h = _mix((index_for(video_id) or 0) * 1009 + position, seed)
+    text = COMMENT_TEMPLATES[h % len(COMMENT_TEMPLATES)].format(
+        w=TITLE_WORDS[(h >> 4) % len(TITLE_WORDS)], w2=TITLE_WORDS[(h >> 9) % len(TITLE_WORDS)])
+    return {
+        'kind': 'youtube#commentThread',
+        'id': f"c{video_id}{position:05d}",
+        'snippet': {
+            'videoId': video_id,
+            'totalReplyCount': h % 5,
+            'topLevelComment': {'snippet': {
+                'textDisplay': text,
+                'textOriginal': text,
+                'likeCount': (h >> 12) % 500,
+            }},
+        },
+    }
+
+
+def synthetic_thumbnail(index: int, seed: int = 0, size=(480, 360)) -> bytes:
+    """
+    生成合成缩略图（JPEG）：同组视频画面相同、编码质量不同，不同组画面完全不同
+
+    需要 Pillow
+    """
+    from PIL import Image
+
+    rng = random.Random(_mix(index // THUMBNAIL_GROUP, seed))
+    grid = Image.new('RGB', (8, 6))
+    grid.putdata([(rng.randrange(256), rng.randrange(256), rng.randrange(256)) for _ in range(48)])
+    buf = io.BytesIO()
+    grid.resize(size, Image.BILINEAR).save(buf, format='JPEG', quality=90 if index % 2 == 0 else 60)
+    return buf.getvalue()
+
+
+class StubRequest:
+    """模拟 googleapiclient 的 HttpRequest，只支持 execute()"""
+
+    def __init__(self, service: 'StubYouTube', method: str, params: Dict):
+        self.service = service
+        self.method = method
+        self.params = params
+
+    def execute(self, num_retries: int = 0) -> Dict:
+        with self.service.lock:
+            self.service.calls[self.method] += 1
+        return self.service.respond(self.method, self.params)
+
+
+class _StubResource:
+    def __init__(self, service: 'StubYouTube', name: str):
+        self._service = service
+        self._name = name
+
+    def list(self, **params) -> StubRequest:
+        return StubRequest(self._service, f"{self._name}.list", params)
+
+
+class StubYouTube:
+    """
+    合成数据桩：语料为 corpus_size 个视频，序号即排名
+
+    - search.list 按查询条件（地区/语言/时长/时间窗）确定性地选一段语料分页返回，
+      不同子查询结果部分重叠，便于测试扇出去重
+    - channels.list 所有频道都指向同一个包含全部语料的 uploads 播放列表
+    - playlistItems.list 按 pageToken（偏移量）分页
+    - videos.list 根据ID即时生成数据，不预先占用内存
+    - commentThreads.list 每个视频最多 MAX_STUB_COMMENTS 条合成评论，按 pageToken 分页
+    """
+
+    def __init__(self, corpus_size: int = 1000, seed: int = 0, now: Optional[datetime] = None):
+        self.corpus_size = corpus_size
+        self.seed = seed
+        self.now = now or datetime.now()
+        self.calls: Counter = Counter()
+        self.lock = threading.Lock()
+
+    def search(self):
+        return _StubResource(self, 'search')
+
+    def videos(self):
+        return _StubResource(self, 'videos')
+
+    def channels(self):
+        return _StubResource(self, 'channels')
+
+    def playlistItems(self):
+        return _StubResource(self, 'playlistItems')
+
+    def commentThreads(self):
+        return _StubResource(self, 'commentThreads')
+
+    def _page(self, params: Dict, limit: int, page_cap: int = 50):
+        offset = int(params.get('pageToken') or 0)
+        count = max(0, min(int(params.get('maxResults', 5)), page_cap, limit - offset))
+        next_offset = offset + count
+        return range(offset, next_offset), (str(next_offset) if next_offset < limit else None)
+
+    def _search_shift(self, params: Dict) -> int:
+        """同一查询条件总是落在同一段语料上；默认条件（美区/英语/中等时长）从序号0开始"""
+        parts = [params.get('q', ''), params.get('regionCode', 'US'), params.get('relevanceLanguage', 'en'),
+                 params.get('videoDuration', 'medium'), str(params.get('publishedBefore', ''))[:10]]
+        if parts[1:] == ['US', 'en', 'medium', '']:
+            return 0
+        return zlib.crc32('|'.join(parts[1:]).encode('utf-8')) % max(1, self.corpus_size)
+
+    def respond(self, method: str, params: Dict) -> Dict:
+        if method == 'search.list':
+            indexes, token = self._page(params, min(self.corpus_size, 500))
+            shift = self._search_shift(params)
+            response = {'items': [{'id': {'kind': 'youtube#video',
+                                          'videoId': video_id_for((i + shift) % self.corpus_size)}}
+                                  for i in indexes]}
+        elif method == 'videos.list':
+            items = []
+            for vid in str(params.get('id', '')).split(','):
+                index = index_for(vid)
+                if index is not None and index < self.corpus_size:
+                    items.append(synthetic_video_item(index, self.seed, self.now))
+            return {'items': items}
+        elif method == 'channels.list':
+            channel_ids = str(params.get('id') or f"UC{0:022d}").split(',')
+            return {'items': [{
+                'id': channel_id,
+                'contentDetails': {'relatedPlaylists': {'uploads': 'UU' + channel_id[2:]}},
+            } for channel_id in channel_ids]}
+        elif method == 'playlistItems.list':
+            indexes, token = self._page(params, self.corpus_size)
+            response = {'items': [{'contentDetails': {'videoId': video_id_for(i)}} for i in indexes]}
+        elif method == 'commentThreads.list':
+            video_id = params.get('videoId', '')
+            index = index_for(video_id)
+            total = 0
+            if index is not None and index < self.corpus_size:
+                total = min(MAX_STUB_COMMENTS, int(synthetic_video_item(index, self.seed, self.now)
+                                                   ['statistics']['commentCount']))
+            indexes, token = self._page(params, total, page_cap=100)
+            response = {'items': [synthetic_comment_thread(video_id, i, self.seed) for i in indexes]}
+        else:
+            raise NotImplementedError(method)
+        if token:
+            response['nextPageToken'] = token
+        return response
+
+
+def _params_key(method: str, params: Dict) -> str:
+    clean = {k: v for k, v in params.items() if k not in ('key', 'publishedAfter')}
+    return method + ' ' + json.dumps(clean, sort_keys=True, ensure_ascii=False)
+
+
+class FixtureYouTube(StubYouTube):
+    """
+    录制回放桩：按方法+参数精确匹配录制的响应；匹配不到时按该方法的录制顺序轮流回放
+
+    录制文件格式: {"records": [{"method": "videos.list", "params": {...}, "response": {...}}, ...]}
+    """
+
+    def __init__(self, path: str):
+        super().__init__(corpus_size=0)
+        with open(path, 'r', encoding='utf-8') as f:
+            records = json.load(f).get('records', [])
+        self._exact: Dict[str, Dict] = {}
+        self._by_method: Dict[str, List[Dict]] = {}
+        for rec in records:
+            self._exact[_params_key(rec['method'], rec['params'])] = rec['response']
+            self._by_method.setdefault(rec['method'], []).append(rec['response'])
+
+    def respond(self, method: str, params: Dict) -> Dict:
+        exact = self._exact.get(_params_key(method, params))
+        if exact is not None:
+            return exact
+        responses = self._by_method.get(method)
+        if not responses:
+            return {'items': []}
+        return responses[(self.calls[method] - 1) % len(responses)]
+
+
+class _RecordingRequest:
+    def __init__(self, recorder: 'RecordingYouTube', method: str, params: Dict, request):
+        self._recorder = recorder
+        self._method = method
+        self._params = params
+        self._request = request
+
+    def execute(self, num_retries: int = 0) -> Dict:
+        response = self._request.execute(num_retries=num_retries)
+        self._recorder.records.append({'method': self._method, 'params': self._params, 'response': response})
+        return response
+
+
+class _RecordingResource:
+    def __init__(self, recorder: 'RecordingYouTube', name: str):
+        self._recorder = recorder
+        self._name = name
+
+    def list(self, **params):
+        request = getattr(self._recorder.service, self._name)().list(**params)
+        return _RecordingRequest(self._recorder, f"{self._name}.list", params, request)
+
+
+class RecordingYouTube:
+    """包装真实服务对象，把每次响应记录下来，save() 后可用 FixtureYouTube 回放"""
+
+    def __init__(self, service):
+        self.service = service
+        self.records: List[Dict] = []
+
+    def __getattr__(self, name):
+        if name in ('search', 'videos', 'channels', 'playlistItems', 'commentThreads'):
+            return lambda: _RecordingResource(self, name)
+        return getattr(self.service, name)
+
+    def save(self, path: str):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'records': self.records}, f, ensure_ascii=False, indent=2)